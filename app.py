@@ -1,16 +1,216 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import (Flask, render_template, request, redirect, url_for, flash, session, g,
+                   has_request_context, before_render_template, template_rendered, Response,
+                   stream_with_context)
 from flask_sqlalchemy import SQLAlchemy
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached, object_session
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, time
-from functools import wraps
+from werkzeug.serving import WSGIRequestHandler, make_server
+from itsdangerous import BadSignature, URLSafeSerializer
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from email.header import Header
+from email.mime.text import MIMEText
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter, OrderedDict, defaultdict, deque, namedtuple
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache, partial, wraps
+from math import ceil
+from time import monotonic, perf_counter, sleep
+from xml.sax.saxutils import escape as xml_escape
+import asyncio
+import base64
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import smtplib
+import sqlite3
+import sys
+import threading
+import tracemalloc
+import urllib.request
+import zipfile
+import click
+
+try:
+    import resource  # RSS o'lchash uchun (Windowsda mavjud emas)
+except ImportError:
+    resource = None
+
+try:
+    import orjson  # JSON API uchun tezroq serializatsiya (ixtiyoriy)
+except ImportError:
+    orjson = None
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///oquv_markaz.db'
+
+# ============= SOZLAMALAR =============
+# Barcha sozlamalar muhit o'zgaruvchilaridan o'qiladi (.env.example ga qarang)
+
+def database_url():
+    url = os.environ.get('DATABASE_URL', 'sqlite:///oquv_markaz.db')
+    # Heroku uslubidagi 'postgres://' manzillarini SQLAlchemy tushunmaydi
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_sozlamalari(url):
+    """SQLAlchemy engine/pool sozlamalari; SQLite va PostgreSQL uchun bir xil"""
+    options = {'pool_pre_ping': True}
+    # Xotiradagi SQLite bazasi bitta ulanishda ishlaydi, pool o'lchami kerak emas
+    if url.startswith('sqlite') and (url in ('sqlite://', 'sqlite:///') or ':memory:' in url):
+        return options
+    options.update(
+        pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    )
+    return options
+
+def cheklov_limiti(qiymat):
+    """'soni/soniya' -> (so'rovlar soni, oyna soniyalarda)"""
+    soni, oyna = qiymat.split('/')
+    return int(soni), int(oyna)
+
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here-change-in-production')
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_sozlamalari(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # millisekund
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),  # manfiy qiymat - KiB (64 MB)
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),  # bayt (256 MB)
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+app.config['JADVAL_INDEKS_TTL'] = int(os.environ.get('JADVAL_INDEKS_TTL', 300))  # soniya, 0 - cheksiz
+app.config['PAROL_XESH_USULI'] = os.environ.get('PAROL_XESH_USULI', 'scrypt:32768:8:1')  # werkzeug usuli va narxi
+app.config['PAROL_XESH_ISHCHILARI'] = int(os.environ.get('PAROL_XESH_ISHCHILARI') or os.cpu_count() or 1)
+app.config['PAROL_XESH_NAVBATI'] = int(os.environ.get('PAROL_XESH_NAVBATI', 32))  # ishchilarni kutayotganlar chegarasi
+app.config['PAROL_XESH_KUTISH'] = float(os.environ.get('PAROL_XESH_KUTISH', 2))  # soniya, navbat to'la bo'lsa
+app.config['IMPORT_JARAYONLARI'] = int(os.environ.get('IMPORT_JARAYONLARI') or os.cpu_count() or 1)  # parol xeshlash
+app.config['HAFTALIK_JADVAL_KESH_HAJMI'] = int(os.environ.get('HAFTALIK_JADVAL_KESH_HAJMI', 2000))  # guruh/mentor/xona soni
+app.config['INSTRUMENTATSIYA'] = os.environ.get('INSTRUMENTATSIYA', '0') == '1'
+app.config['N_PLUS_1_CHEGARASI'] = int(os.environ.get('N_PLUS_1_CHEGARASI', 10))  # bir xil SQL takrori
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # /metrics uchun Bearer token
+app.config['STATISTIKA_KESH'] = None  # get/set/delete interfeysli umumiy kesh (masalan, Redis o'rami)
+app.config['STATISTIKA_KESH_TTL'] = 60  # soniya
+app.config['PROFIL_KESH_TTL'] = int(os.environ.get('PROFIL_KESH_TTL', 30))  # soniya
+app.config['PROFIL_KESH_HAJMI'] = int(os.environ.get('PROFIL_KESH_HAJMI', 10000))  # foydalanuvchilar soni
+app.config['FRAGMENT_KESH_MB'] = float(os.environ.get('FRAGMENT_KESH_MB', 32))  # jarayon ichidagi HTML fragmentlar xotirasi
+app.config['FRAGMENT_KESH'] = None  # get/set interfeysli umumiy kesh (masalan, Redis o'rami)
+app.config['FRAGMENT_KESH_TTL'] = int(os.environ.get('FRAGMENT_KESH_TTL', 3600))  # soniya, faqat umumiy keshda
+app.config['CHEKLOVLAR'] = {  # POST so'rovlari cheklovlari: nomi -> (soni, oyna)
+    'login_ip': cheklov_limiti(os.environ.get('CHEKLOV_LOGIN_IP', '30/60')),
+    'login_username': cheklov_limiti(os.environ.get('CHEKLOV_LOGIN_USERNAME', '10/300')),
+    'register_ip': cheklov_limiti(os.environ.get('CHEKLOV_REGISTER_IP', '10/3600')),
+    'yozilish_user': cheklov_limiti(os.environ.get('CHEKLOV_YOZILISH', '20/60')),
+}
+app.config['NAVBAT_QOIDALARI'] = [nomi.strip() for nomi in os.environ.get('NAVBAT_QOIDALARI', '').split(',')
+                                   if nomi.strip()]  # ariza ustuvorligi qoidalari, masalan 'qayta_ariza'
+app.config['VAZIFA_ISHCHILARI'] = int(os.environ.get('VAZIFA_ISHCHILARI', 1))  # jarayon ichidagi ishchilar, 0 - faqat vazifa-ishchisi
+app.config['VAZIFA_BOLAK'] = int(os.environ.get('VAZIFA_BOLAK', 500))  # bitta tranzaksiyada yoziladigan qatorlar
+app.config['VAZIFA_URINISHLAR'] = int(os.environ.get('VAZIFA_URINISHLAR', 3))
+app.config['VAZIFA_KECHIKISH'] = float(os.environ.get('VAZIFA_KECHIKISH', 5))  # soniya, har urinishda 2 baravar
+app.config['VAZIFA_QULF_MUDDATI'] = int(os.environ.get('VAZIFA_QULF_MUDDATI', 300))  # soniya, bolaklar orasida uzaytiriladi
+app.config['VAZIFA_SOROV_ORALIGI'] = float(os.environ.get('VAZIFA_SOROV_ORALIGI', 2))  # soniya, bo'sh ishchi navbatni tekshiradi
+app.config['XABAR_KANALLARI'] = [nomi.strip() for nomi in os.environ.get('XABAR_KANALLARI', 'ichki').split(',')
+                                  if nomi.strip()]  # 'ichki', 'email', 'webhook'
+app.config['XABAR_DISPETCHER'] = os.environ.get('XABAR_DISPETCHER', '1') == '1'  # 0 - faqat `flask xabar-dispetcheri`
+app.config['XABAR_PARTIYA'] = int(os.environ.get('XABAR_PARTIYA', 1000))  # bir aylanishda egallanadigan xabarlar
+app.config['XABAR_URINISHLAR'] = int(os.environ.get('XABAR_URINISHLAR', 5))
+app.config['XABAR_KECHIKISH'] = float(os.environ.get('XABAR_KECHIKISH', 10))  # soniya, har urinishda 2 baravar
+app.config['XABAR_QULF_MUDDATI'] = int(os.environ.get('XABAR_QULF_MUDDATI', 120))  # soniya
+app.config['XABAR_SOROV_ORALIGI'] = float(os.environ.get('XABAR_SOROV_ORALIGI', 2))  # soniya
+app.config['XABAR_SMTP'] = os.environ.get('XABAR_SMTP', 'localhost:1025')  # host:port (lokal SMTP, masalan MailHog)
+app.config['XABAR_SMTP_YUBORUVCHI'] = os.environ.get('XABAR_SMTP_YUBORUVCHI', 'noreply@oquvmarkaz.uz')
+app.config['XABAR_EMAIL_PARALLEL'] = int(os.environ.get('XABAR_EMAIL_PARALLEL', 4))  # bir vaqtdagi SMTP ulanishlar
+app.config['XABAR_WEBHOOK_URL'] = os.environ.get('XABAR_WEBHOOK_URL')
+app.config['XABAR_WEBHOOK_PARALLEL'] = int(os.environ.get('XABAR_WEBHOOK_PARALLEL', 4))  # bir vaqtdagi POST so'rovlar
+app.config['XABAR_SAYT_MANZILI'] = os.environ.get('XABAR_SAYT_MANZILI', 'http://localhost:5000')  # email havolalari uchun
+app.config['SSE_MAKS_ULANISHLAR'] = int(os.environ.get('SSE_MAKS_ULANISHLAR', 200))  # jarayon bo'yicha, har biri oqim band qiladi
+app.config['SSE_PING'] = float(os.environ.get('SSE_PING', 15))  # soniya, jim ulanishni ushlab turish va uzilganini aniqlash
+app.config['SSE_BUFER'] = int(os.environ.get('SSE_BUFER', 256))  # qayta ulanganda Last-Event-ID bo'yicha beriladigan hodisalar
+app.config['SSE_TEKSHIRUV_ORALIGI'] = float(os.environ.get('SSE_TEKSHIRUV_ORALIGI', 10))  # soniya, boshqa jarayonlardagi o'zgarishlar
+app.config['SSE_OQIM'] = os.environ.get('SSE_OQIM', 'auto')  # 'auto' - faqat ko'p oqimli serverda, '1' - har doim (gevent), '0' - yo'q
+app.config['SSE_SOROV_ORALIGI'] = float(os.environ.get('SSE_SOROV_ORALIGI', 30))  # soniya, oqimsiz brauzer holatni so'raydi
+app.config['CHEKLOV_OMBORI'] = None  # get/incr interfeysli umumiy ombor (masalan, Redis o'rami)
 
 db = SQLAlchemy(app)
 
+@event.listens_for(Engine, 'connect')
+def _sqlite_pragmalari(dbapi_connection, connection_record):
+    # Har bir yangi SQLite ulanishi uchun: WAL rejimi o'quvchilarni yozuvchilardan
+    # to'smaydi, busy_timeout esa 'database is locked' o'rniga kutishni ta'minlaydi
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for nomi, qiymat in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f'PRAGMA {nomi}={qiymat}')
+    cursor.close()
+
+# ============= PAROL XESHLASH =============
+# Parol xeshlash (scrypt/pbkdf2) CPU ni ko'p talab qiladi. Hisoblash cheklangan
+# ishchi oqimlar hovuzida bajariladi (hashlib GIL ni bo'shatadi), shuning uchun
+# dars boshidagi login to'lqini bir vaqtda faqat PAROL_XESH_ISHCHILARI ta yadroni
+# band qiladi va boshqa so'rovlar CPU olishda davom etadi. Navbat to'lsa so'rov
+# kutib turmaydi - ParolXeshlashBand xatosi (503) bilan darhol rad etiladi.
+
+class ParolXeshlashBand(Exception):
+    """Xeshlash navbati to'la: so'rovni keyinroq qaytarish kerak"""
+
+class ParolXeshlovchi:
+    """Cheklangan ishchilar va navbatli parol xeshlash xizmati"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._joylar = None
+
+    def _tayyorlash(self):
+        with self._lock:
+            if self._pool is None:
+                ishchilar = app.config['PAROL_XESH_ISHCHILARI']
+                self._pool = ThreadPoolExecutor(max_workers=ishchilar, thread_name_prefix='parol-xesh')
+                self._joylar = threading.BoundedSemaphore(ishchilar + app.config['PAROL_XESH_NAVBATI'])
+        return self._pool
+
+    def bajarish(self, funksiya, *args):
+        pool = self._tayyorlash()
+        if not self._joylar.acquire(timeout=app.config['PAROL_XESH_KUTISH']):
+            raise ParolXeshlashBand()
+        try:
+            return pool.submit(funksiya, *args).result()
+        finally:
+            self._joylar.release()
+
+    def xeshlash(self, parol):
+        return self.bajarish(generate_password_hash, parol, app.config['PAROL_XESH_USULI'])
+
+    def tekshirish(self, xesh, parol):
+        return self.bajarish(check_password_hash, xesh, parol)
+
+parol_xeshlovchi = ParolXeshlovchi()
+
+@lru_cache(maxsize=8)
+def _xesh_usuli_belgisi(usul):
+    # 'scrypt' -> 'scrypt:32768:8:1': werkzeug standart parametrlarini to'ldiradi
+    return generate_password_hash('', method=usul).split('$', 1)[0]
+
+def xesh_yangilanishi_kerakmi(xesh):
+    """Xesh joriy PAROL_XESH_USULI bilan yaratilmagan bo'lsa True"""
+    return xesh.split('$', 1)[0] != _xesh_usuli_belgisi(app.config['PAROL_XESH_USULI'])
+
 # ============= MODELS =============
 
 class User(db.Model):
@@ -22,33 +222,34 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = parol_xeshlovchi.xeshlash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return parol_xeshlovchi.tekshirish(self.password_hash, password)
 
 class Talaba(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     ism = db.Column(db.String(100), nullable=False)
     familiya = db.Column(db.String(100), nullable=False)
     telefon = db.Column(db.String(20))
     manzil = db.Column(db.String(200))
     tug_sana = db.Column(db.Date)
-    guruh_id = db.Column(db.Integer, db.ForeignKey('guruh.id'))
+    guruh_id = db.Column(db.Integer, db.ForeignKey('guruh.id'), index=True)
     
     user = db.relationship('User', backref='talaba_profile')
     guruh = db.relationship('Guruh', backref='talabalar')
 
 class Mentor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     ism = db.Column(db.String(100), nullable=False)
     familiya = db.Column(db.String(100), nullable=False)
     telefon = db.Column(db.String(20))
     mutaxassislik = db.Column(db.String(100))
     tajriba_yili = db.Column(db.Integer)
     biografiya = db.Column(db.Text)
+    versiya = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # fragment keshi kaliti uchun
     
     user = db.relationship('User', backref='mentor_profile')
     guruhlar = db.relationship('Guruh', backref='mentor')
@@ -59,6 +260,7 @@ class Fan(db.Model):
     tavsif = db.Column(db.Text)
     davomiyligi = db.Column(db.Integer)  # soatlarda
     narxi = db.Column(db.Float)
+    versiya = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # fragment keshi kaliti uchun
     
     guruhlar = db.relationship('Guruh', backref='fan')
 
@@ -66,11 +268,14 @@ class Guruh(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nomi = db.Column(db.String(100), nullable=False)
     fan_id = db.Column(db.Integer, db.ForeignKey('fan.id'), nullable=False)
-    mentor_id = db.Column(db.Integer, db.ForeignKey('mentor.id'))
+    mentor_id = db.Column(db.Integer, db.ForeignKey('mentor.id'), index=True)
     boshlanish_sana = db.Column(db.Date)
     tugash_sana = db.Column(db.Date)
     max_talabalar = db.Column(db.Integer, default=15)
-    holat = db.Column(db.String(20), default='faol')  # 'faol', 'tugallangan', 'rejalashtirilgan'
+    talabalar_soni = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Talaba.guruh_id bo'yicha hisoblagich
+    holat = db.Column(db.String(20), default='faol', index=True)  # 'faol', 'tugallangan', 'rejalashtirilgan'
+    avtomatik_qabul = db.Column(db.Boolean, nullable=False, default=False, server_default='0')  # navbat bo'yicha qabul
+    versiya = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # fragment keshi kaliti uchun
     
     dars_jadvali = db.relationship('DarsJadvali', backref='guruh', cascade='all, delete-orphan')
 
@@ -82,19 +287,2866 @@ class GuruhAriza(db.Model):
     ariza_sana = db.Column(db.DateTime, default=datetime.utcnow)
     javob_sana = db.Column(db.DateTime)
     izoh = db.Column(db.Text)
+    ustuvorlik = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # navbatda kattasi oldinroq
     
     talaba = db.relationship('Talaba', backref='guruh_arizalari')
     guruh = db.relationship('Guruh', backref='arizalar')
+    
+    __table_args__ = (
+        db.Index('ix_guruh_ariza_talaba_guruh_holat', 'talaba_id', 'guruh_id', 'holat'),
+        db.Index('ix_guruh_ariza_holat_sana', 'holat', 'ariza_sana'),
+        db.Index('ix_guruh_ariza_sana_id', 'ariza_sana', 'id'),  # arizalar_list keyset sahifalash
+    )
+
+# Guruh navbati: navbat_tartibi() bilan bir xil yo'nalishda, navbat boshi saralashsiz o'qiladi
+db.Index('ix_guruh_ariza_navbat', GuruhAriza.guruh_id, GuruhAriza.holat, GuruhAriza.ustuvorlik.desc(),
+         GuruhAriza.ariza_sana, GuruhAriza.id)
+
+class DarsJadvali(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    guruh_id = db.Column(db.Integer, db.ForeignKey('guruh.id'), nullable=False)
+    kun = db.Column(db.String(20), nullable=False)  # 'Dushanba', 'Seshanba', ...
+    boshlanish_vaqti = db.Column(db.Time, nullable=False)
+    tugash_vaqti = db.Column(db.Time, nullable=False)
+    xona = db.Column(db.String(50))
+    holat = db.Column(db.String(20), default='faol')  # 'faol', 'bekor_qilindi'
+    yaratilgan_sana = db.Column(db.DateTime, default=datetime.utcnow)
+    yangilangan_sana = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # haftalik jadval versiyasi
+    
+    __table_args__ = (
+        db.Index('ix_dars_jadvali_guruh_kun_holat', 'guruh_id', 'kun', 'holat'),
+        db.Index('ix_dars_jadvali_xona', 'xona'),
+    )
+
+class IcsHavola(db.Model):
+    """Jadval .ics havolasi versiyasi: oshirilsa eski (tarqalib ketgan) havolalar ishlamay qoladi"""
+    tur = db.Column(db.String(20), primary_key=True)  # JADVAL_TURLARI
+    kalit = db.Column(db.String(50), primary_key=True)  # guruh/mentor id yoki xona nomi
+    versiya = db.Column(db.Integer, nullable=False, default=0)
+
+class Vazifa(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    turi = db.Column(db.String(50), nullable=False)  # VAZIFA_TURLARI kaliti, masalan 'guruh_ochirish'
+    parametrlar = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    kalit = db.Column(db.String(100))  # idempotentlik kaliti: bir xil kalitli faol vazifa bittadan ortiq bo'lmaydi
+    holat = db.Column(db.String(20), nullable=False, default='kutilmoqda')  # 'kutilmoqda', 'bajarilmoqda', 'bajarildi', 'xato'
+    urinishlar = db.Column(db.Integer, nullable=False, default=0)
+    max_urinishlar = db.Column(db.Integer, nullable=False, default=3)
+    jarayon = db.Column(db.Integer, nullable=False, default=0)  # qayta ishlangan qatorlar soni
+    natija = db.Column(db.Text)  # JSON
+    xato = db.Column(db.Text)
+    ishchi = db.Column(db.String(100))  # vazifani egallagan ishchi
+    yaratilgan_sana = db.Column(db.DateTime, default=datetime.utcnow)
+    keyingi_urinish = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    qulf_muddati = db.Column(db.DateTime)  # shu vaqtgacha yakunlanmasa boshqa ishchi oladi
+    boshlangan_sana = db.Column(db.DateTime)
+    tugagan_sana = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_vazifa_holat_navbat', 'holat', 'keyingi_urinish', 'id'),
+        db.Index('ix_vazifa_yaratilgan_sana_id', 'yaratilgan_sana', 'id'),  # vazifalar_list keyset sahifalash
+    )
+
+class Xabarnoma(db.Model):
+    """Ilova ichidagi xabarlar qutisi"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    hodisa = db.Column(db.String(50), nullable=False)  # 'ariza_qabul', 'ariza_rad', 'dars_bekor', 'dars_tiklandi'
+    sarlavha = db.Column(db.String(200), nullable=False)
+    matn = db.Column(db.Text)
+    havola = db.Column(db.String(200))
+    oqilgan = db.Column(db.Boolean, nullable=False, default=False)
+    yaratilgan_sana = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_xabarnoma_user_id', 'user_id', 'id'),
+    )
+
+class ChiquvchiXabar(db.Model):
+    """Xabarlar outboxi: holat o'zgarishi bilan bir tranzaksiyada yoziladi, dispetcher kanallarga yetkazadi"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kanal = db.Column(db.String(20), nullable=False)  # 'ichki', 'email', 'webhook'
+    hodisa = db.Column(db.String(50), nullable=False)
+    sarlavha = db.Column(db.String(200), nullable=False)
+    matn = db.Column(db.Text)
+    havola = db.Column(db.String(200))
+    holat = db.Column(db.String(20), nullable=False, default='kutilmoqda')  # 'kutilmoqda', 'yuborildi', 'xato'
+    urinishlar = db.Column(db.Integer, nullable=False, default=0)
+    keyingi_urinish = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    egasi = db.Column(db.String(100))  # qatorni egallagan dispetcher partiyasi
+    qulf_muddati = db.Column(db.DateTime)
+    xato = db.Column(db.Text)
+    yaratilgan_sana = db.Column(db.DateTime, default=datetime.utcnow)
+    yuborilgan_sana = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_chiquvchi_xabar_navbat', 'holat', 'keyingi_urinish', 'id'),
+        db.Index('ix_chiquvchi_xabar_egasi', 'egasi'),
+    )
+
+VAZIFA_FAOL_HOLATLAR = ('kutilmoqda', 'bajarilmoqda')
+db.Index('ux_vazifa_faol_kalit', Vazifa.kalit, unique=True,
+         sqlite_where=Vazifa.holat.in_(VAZIFA_FAOL_HOLATLAR), postgresql_where=Vazifa.holat.in_(VAZIFA_FAOL_HOLATLAR))
+
+# ============= SO'ROVLAR =============
+# Ro'yxat sahifalari uchun bog'liq ma'lumotlarni oldindan yuklovchi so'rovlar.
+# Shablonlar har bir qator uchun alohida SELECT yubormasligi uchun kerakli
+# munosabatlar JOIN orqali, sonlar esa bitta GROUP BY so'rovi bilan olinadi.
+
+def ariza_options():
+    return (joinedload(GuruhAriza.talaba),
+            joinedload(GuruhAriza.guruh).joinedload(Guruh.fan))
+
+def guruhlar_query():
+    return Guruh.query.options(joinedload(Guruh.fan), joinedload(Guruh.mentor))
+
+def arizalar_query():
+    return GuruhAriza.query.options(*ariza_options())
+
+def talabalar_query():
+    return Talaba.query.options(joinedload(Talaba.guruh), joinedload(Talaba.user))
+
+def guruh_talabalar_soni(guruh_ids=None):
+    """{guruh_id: talabalar soni} lug'ati"""
+    query = db.session.query(Talaba.guruh_id, db.func.count(Talaba.id)).filter(Talaba.guruh_id.isnot(None))
+    if guruh_ids is not None:
+        query = query.filter(Talaba.guruh_id.in_(guruh_ids))
+    return dict(query.group_by(Talaba.guruh_id).all())
+
+def mentor_guruhlar_soni(mentor_ids=None):
+    """{mentor_id: guruhlar soni} lug'ati"""
+    query = db.session.query(Guruh.mentor_id, db.func.count(Guruh.id)).filter(Guruh.mentor_id.isnot(None))
+    if mentor_ids is not None:
+        query = query.filter(Guruh.mentor_id.in_(mentor_ids))
+    return dict(query.group_by(Guruh.mentor_id).all())
+
+def fan_guruhlar_soni(fan_ids=None):
+    """{fan_id: guruhlar soni} lug'ati"""
+    query = db.session.query(Guruh.fan_id, db.func.count(Guruh.id))
+    if fan_ids is not None:
+        query = query.filter(Guruh.fan_id.in_(fan_ids))
+    return dict(query.group_by(Guruh.fan_id).all())
+
+def talaba_ariza_statistikasi(talaba_id, guruh_ids=None):
+    """{guruh_id: (arizalar soni, qabul qilinganmi)} lug'ati - bitta GROUP BY so'rovi"""
+    qabul = db.func.max(db.case((GuruhAriza.holat == 'qabul_qilindi', 1), else_=0))
+    query = (db.session.query(GuruhAriza.guruh_id, db.func.count(GuruhAriza.id), qabul)
+             .filter(GuruhAriza.talaba_id == talaba_id))
+    if guruh_ids is not None:
+        query = query.filter(GuruhAriza.guruh_id.in_(guruh_ids))
+    return {guruh_id: (soni, bool(qabul_qilingan))
+            for guruh_id, soni, qabul_qilingan in query.group_by(GuruhAriza.guruh_id)}
+
+# ============= GURUH SIG'IMI =============
+
+MAX_ARIZALAR = 5  # talaba bitta guruhga yuborishi mumkin bo'lgan arizalar soni
+# Guruh.talabalar_soni hisoblagichi Talaba.guruh_id o'zgargan tranzaksiyaning
+# o'zida shartli UPDATE bilan yangilanadi: bir vaqtda ishlayotgan adminlar
+# guruhni max_talabalar dan oshirib to'ldira olmaydi.
+
+def joy_band_qilish(guruh_id):
+    """Guruhda bo'sh joy bo'lsa uni band qilish. Joy bo'lmasa False qaytaradi."""
+    result = db.session.execute(
+        db.update(Guruh)
+        .where(Guruh.id == guruh_id, Guruh.talabalar_soni < Guruh.max_talabalar)
+        .values(talabalar_soni=Guruh.talabalar_soni + 1)
+    )
+    return result.rowcount == 1
+
+def joy_bosatish(guruh_id):
+    db.session.execute(
+        db.update(Guruh)
+        .where(Guruh.id == guruh_id, Guruh.talabalar_soni > 0)
+        .values(talabalar_soni=Guruh.talabalar_soni - 1)
+    )
+    navbatga_belgilash(guruh_id)
+
+def ariza_qabul_qilish(ariza):
+    """Arizani qabul qilish. Natija: 'qabul_qilindi', 'toldi', 'navbatda' yoki 'korib_chiqilgan'.
+
+    To'lgan avtomatik qabul guruhiga ariza rad etilmaydi, kutish ro'yxatida
+    qoladi (arizalarni_ommaviy_korib_chiqish dagi kabi). Commit chaqiruvchi
+    tomonidan qilinadi.
+    """
+    javob_sana = datetime.utcnow()
+    # Arizani shartli UPDATE bilan egallash: ikki admin bir arizani ikki marta qabul qila olmaydi
+    egallandi = db.session.execute(
+        db.update(GuruhAriza)
+        .where(GuruhAriza.id == ariza.id, GuruhAriza.holat == 'kutilmoqda')
+        .values(holat='qabul_qilindi', javob_sana=javob_sana,
+                izoh='Ariza qabul qilindi va talaba guruhga qo\'shildi')
+    ).rowcount == 1
+    if not egallandi:
+        return 'korib_chiqilgan'
+
+    # Talaba qatori qulflanib, sessiyadagi eski nusxa emas, bazadagi guruhi o'qiladi:
+    # bir talabani ikki guruhga bir vaqtda qabul qilish ikkinchisini kutadi. SQLite da
+    # yuqoridagi UPDATE bazani tranzaksiya oxirigacha yozish uchun qulflagan.
+    talaba = db.session.scalars(
+        db.select(Talaba).where(Talaba.id == ariza.talaba_id)
+        .with_for_update().execution_options(populate_existing=True)
+    ).one()
+    if talaba.guruh_id != ariza.guruh_id:
+        if not joy_band_qilish(ariza.guruh_id):
+            if ariza.guruh.avtomatik_qabul:
+                # Egallash qaytariladi: joy bo'shaganda navbat bo'yicha qabul qilinadi
+                ariza.holat = 'kutilmoqda'
+                ariza.javob_sana = ariza.izoh = None
+                return 'navbatda'
+            ariza.holat = 'qabul_qilinmadi'
+            ariza.izoh = 'Guruh to\'lgan'
+            ariza_xabarlari([ariza.id])
+            return 'toldi'
+        if talaba.guruh_id:
+            joy_bosatish(talaba.guruh_id)
+        talaba.guruh_id = ariza.guruh_id
+    ariza_xabarlari([ariza.id])
+    return 'qabul_qilindi'
+
+MAX_OMMAVIY_ARIZALAR = 5000  # bitta ommaviy amalda ko'rib chiqiladigan arizalar chegarasi
+SQL_BOLAK = 500  # IN (...) ro'yxatlari shu hajmdan oshmaydi
+
+def yozish_qulfini_olish():
+    """Tranzaksiyani darhol yozish rejimida boshlash.
+
+    SQLite'da birinchi yozuv operatsiyasi bazani boshqa yozuvchilar uchun
+    qulflaydi, shuning uchun keyingi o'qishlar poygasiz bo'ladi. PostgreSQL'da
+    qatorlar SELECT ... FOR UPDATE bilan qulflanadi.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(db.update(Guruh).where(db.false()).values(talabalar_soni=Guruh.talabalar_soni))
+
+def _bolaklab_yangilash(model, ids, **values):
+    for i in range(0, len(ids), SQL_BOLAK):
+        db.session.execute(
+            db.update(model).where(model.id.in_(ids[i:i + SQL_BOLAK])).values(**values)
+            .execution_options(synchronize_session=False))
+
+def _bolaklab_case_yangilash(model, column, qiymatlar, ifoda=None):
+    """{id: qiymat} lug'ati bo'yicha bitta UPDATE ... SET column = CASE id ... END"""
+    items = list(qiymatlar.items())
+    for i in range(0, len(items), SQL_BOLAK):
+        bolak = dict(items[i:i + SQL_BOLAK])
+        case = db.case(bolak, value=model.id)
+        db.session.execute(
+            db.update(model).where(model.id.in_(list(bolak))).values({column: ifoda(case) if ifoda else case})
+            .execution_options(synchronize_session=False))
+
+def arizalarni_ommaviy_korib_chiqish(amal, ariza_ids=None, guruh_id=None, limit=None, izoh=None):
+    """Ko'p arizani bitta tranzaksiyada qabul qilish yoki rad etish.
+
+    Arizalar ariza_sana bo'yicha eng eskisidan boshlab ko'rib chiqiladi va
+    ariza_qabul_qilish() dagi qoidalar qo'llanadi. [(ariza_id, natija), ...]
+    qaytaradi; natija: 'qabul_qilindi', 'toldi', 'rad_etildi',
+    'korib_chiqilgan', 'takroriy' yoki 'topilmadi'. Commit chaqiruvchi tomonidan qilinadi.
+    """
+    yozish_qulfini_olish()
+    query = (db.select(GuruhAriza.id, GuruhAriza.holat, GuruhAriza.talaba_id, GuruhAriza.guruh_id,
+                       GuruhAriza.ariza_sana, Talaba.guruh_id.label('talaba_guruh_id'),
+                       Guruh.max_talabalar, Guruh.talabalar_soni, Guruh.avtomatik_qabul)
+             .join(Talaba, GuruhAriza.talaba_id == Talaba.id)
+             .join(Guruh, GuruhAriza.guruh_id == Guruh.id)
+             .order_by(GuruhAriza.ariza_sana, GuruhAriza.id)
+             .with_for_update())
+    if ariza_ids is not None:
+        ariza_ids = list(dict.fromkeys(ariza_ids))[:MAX_OMMAVIY_ARIZALAR]
+        rows = []
+        for i in range(0, len(ariza_ids), SQL_BOLAK):
+            rows.extend(db.session.execute(query.where(GuruhAriza.id.in_(ariza_ids[i:i + SQL_BOLAK]))))
+        rows.sort(key=lambda row: (row.ariza_sana, row.id))
+    else:
+        query = query.where(GuruhAriza.guruh_id == guruh_id, GuruhAriza.holat == 'kutilmoqda')
+        rows = db.session.execute(query.limit(min(limit or MAX_OMMAVIY_ARIZALAR, MAX_OMMAVIY_ARIZALAR))).all()
+
+    natijalar = {}
+    qabul, toldi, rad = [], [], []
+    talaba_guruhlari = {}  # talaba_id -> yangi guruh_id
+    guruh_ozgarishi = Counter()  # guruh_id -> talabalar_soni o'zgarishi
+    bosh_joy = {}
+    for row in rows:
+        ariza_id, talaba_id, ariza_guruh_id, talaba_guruh_id = row.id, row.talaba_id, row.guruh_id, row.talaba_guruh_id
+        if row.holat != 'kutilmoqda':
+            natijalar[ariza_id] = 'korib_chiqilgan'
+            continue
+        if amal == 'rad':
+            rad.append(ariza_id)
+            natijalar[ariza_id] = 'rad_etildi'
+            continue
+        if talaba_id in talaba_guruhlari:
+            # Talaba shu amalda boshqa arizasi orqali qabul qilingan - bu ariza kutishda qoladi
+            natijalar[ariza_id] = 'takroriy'
+            continue
+        if talaba_guruh_id != ariza_guruh_id:
+            bosh_joy.setdefault(ariza_guruh_id, row.max_talabalar - row.talabalar_soni)
+            if bosh_joy[ariza_guruh_id] <= 0:
+                if row.avtomatik_qabul:
+                    natijalar[ariza_id] = 'navbatda'  # joy bo'shaganda navbat bo'yicha qabul qilinadi
+                    continue
+                toldi.append(ariza_id)
+                natijalar[ariza_id] = 'toldi'
+                continue
+            bosh_joy[ariza_guruh_id] -= 1
+            guruh_ozgarishi[ariza_guruh_id] += 1
+            if talaba_guruh_id:
+                guruh_ozgarishi[talaba_guruh_id] -= 1
+                if talaba_guruh_id in bosh_joy:
+                    bosh_joy[talaba_guruh_id] += 1
+            talaba_guruhlari[talaba_id] = ariza_guruh_id
+        else:
+            talaba_guruhlari[talaba_id] = talaba_guruh_id
+        qabul.append(ariza_id)
+        natijalar[ariza_id] = 'qabul_qilindi'
+
+    javob_sana = datetime.utcnow()
+    _bolaklab_yangilash(GuruhAriza, qabul, holat='qabul_qilindi', javob_sana=javob_sana,
+                        izoh='Ariza qabul qilindi va talaba guruhga qo\'shildi')
+    _bolaklab_yangilash(GuruhAriza, toldi, holat='qabul_qilinmadi', javob_sana=javob_sana,
+                        izoh='Guruh to\'lgan')
+    _bolaklab_yangilash(GuruhAriza, rad, holat='qabul_qilinmadi', javob_sana=javob_sana,
+                        izoh=izoh or 'Qabul qilinmadi')
+    _bolaklab_case_yangilash(Talaba, 'guruh_id', talaba_guruhlari)
+    _bolaklab_case_yangilash(Guruh, 'talabalar_soni',
+                             {guruh_id: delta for guruh_id, delta in guruh_ozgarishi.items() if delta},
+                             lambda case: Guruh.talabalar_soni + case)
+    for guruh_id, delta in guruh_ozgarishi.items():
+        if delta < 0:
+            navbatga_belgilash(guruh_id)
+    ariza_xabarlari(qabul + toldi + rad)
+
+    if ariza_ids is not None:
+        return [(ariza_id, natijalar.get(ariza_id, 'topilmadi')) for ariza_id in ariza_ids]
+    return [(row.id, natijalar[row.id]) for row in rows]
+
+# ============= QABUL NAVBATI =============
+# avtomatik_qabul yoqilgan guruhlarda kutilayotgan arizalar guruh bo'yicha
+# navbat: ustuvorlik (kattasi oldin), so'ng ariza_sana va id (FIFO). Bo'sh
+# joylar navbat boshidan bitta tranzaksiyada to'ldiriladi; to'lgan guruhga
+# yuborilgan arizalar kutish ro'yxatida qoladi. Guruhga yangi ariza tushganda,
+# joy bo'shaganda (talaba o'chirilishi, boshqa guruhga o'tishi) yoki sig'im
+# oshirilganda guruh sessiyada belgilanadi va commit oldidan navbat ishlanadi.
+# Barcha guruhlar uchun ommaviy ishlash: `flask navbatni-ishlash` yoki admin tugmasi.
+
+# Ariza yaratilganda ustuvorlikni hisoblovchi qoidalar (NAVBAT_QOIDALARI): nomi -> f(talaba, oldingi arizalar soni)
+USTUVORLIK_QOIDALARI = {
+    'qayta_ariza': lambda talaba, ariza_soni: ariza_soni,  # oldin joy yetmay qolgan talaba oldinroq
+}
+
+def ariza_ustuvorligi(talaba, ariza_soni):
+    return sum(USTUVORLIK_QOIDALARI[nomi](talaba, ariza_soni) for nomi in app.config['NAVBAT_QOIDALARI'])
+
+def navbat_tartibi():
+    return GuruhAriza.ustuvorlik.desc(), GuruhAriza.ariza_sana, GuruhAriza.id
+
+def navbatga_belgilash(guruh_id, session=None):
+    """Guruh navbatini joriy tranzaksiya commit qilinishidan oldin ishlash"""
+    (session or db.session).info.setdefault('navbat_guruhlari', set()).add(guruh_id)
+
+def navbatni_ishlash(guruh_ids=None):
+    """avtomatik_qabul guruhlaridagi bo'sh joylarni navbat boshidagi arizalar bilan to'ldirish.
+
+    guruh_ids=None - barcha guruhlar. Boshqa guruhda o'qiyotgan (yoki shu
+    ishlashda boshqa guruhga qabul qilingan) talabaning arizasi joy egallamaydi
+    va yopiladi. {guruh_id: qabul qilinganlar soni} qaytaradi. Commit
+    chaqiruvchi tomonidan qilinadi.
+    """
+    yozish_qulfini_olish()
+    qabul_soni = Counter()
+    guruh_ids = list(guruh_ids) if guruh_ids is not None else None
+    while True:
+        bosh_guruhlar = (db.select(Guruh.id, Guruh.max_talabalar - Guruh.talabalar_soni)
+                         .where(Guruh.avtomatik_qabul.is_(True), Guruh.talabalar_soni < Guruh.max_talabalar)
+                         .order_by(Guruh.id))
+        guruhlar = []
+        for i in range(0, len(guruh_ids), SQL_BOLAK) if guruh_ids is not None else [None]:
+            query = bosh_guruhlar if i is None else bosh_guruhlar.where(Guruh.id.in_(guruh_ids[i:i + SQL_BOLAK]))
+            guruhlar.extend(db.session.execute(query))
+        # Har bir guruh navbatining boshi ix_guruh_ariza_navbat indeksi bo'yicha LIMIT bilan o'qiladi
+        rows = []
+        for guruh_id, bosh_joy in guruhlar:
+            rows.extend(db.session.execute(
+                db.select(GuruhAriza.id, GuruhAriza.talaba_id, GuruhAriza.guruh_id,
+                          Talaba.guruh_id.label('talaba_guruh_id'))
+                .join(Talaba, Talaba.id == GuruhAriza.talaba_id)
+                .where(GuruhAriza.guruh_id == guruh_id, GuruhAriza.holat == 'kutilmoqda')
+                .order_by(*navbat_tartibi())
+                .limit(bosh_joy)))
+        if not rows:
+            return qabul_soni
+
+        qabul, yopiladi = [], []
+        talaba_guruhlari = {}  # talaba_id -> guruh_id
+        guruh_ozgarishi = Counter()
+        for row in rows:
+            if row.talaba_guruh_id == row.guruh_id:
+                qabul.append(row.id)  # talaba allaqachon shu guruhda - joy egallanmaydi
+            elif row.talaba_guruh_id is not None or row.talaba_id in talaba_guruhlari:
+                yopiladi.append(row.id)
+            else:
+                qabul.append(row.id)
+                talaba_guruhlari[row.talaba_id] = row.guruh_id
+                guruh_ozgarishi[row.guruh_id] += 1
+
+        javob_sana = datetime.utcnow()
+        _bolaklab_yangilash(GuruhAriza, qabul, holat='qabul_qilindi', javob_sana=javob_sana,
+                            izoh='Navbat bo\'yicha qabul qilindi va talaba guruhga qo\'shildi')
+        _bolaklab_yangilash(GuruhAriza, yopiladi, holat='qabul_qilinmadi', javob_sana=javob_sana,
+                            izoh='Talaba boshqa guruhga qabul qilingan')
+        _bolaklab_case_yangilash(Talaba, 'guruh_id', talaba_guruhlari)
+        _bolaklab_case_yangilash(Guruh, 'talabalar_soni', dict(guruh_ozgarishi),
+                                 lambda case: Guruh.talabalar_soni + case)
+        ariza_xabarlari(qabul)
+        qabul_soni.update(guruh_ozgarishi)
+        if sum(guruh_ozgarishi.values()) == len(rows):
+            return qabul_soni
+        # Ba'zi arizalar joy egallamadi - keyingi aylanishda navbatdagilar olinadi
+
+def navbatdagi_orinlar(arizalar):
+    """{ariza_id: navbatdagi o'rni} - avtomatik qabul guruhlaridagi kutilayotgan arizalar uchun"""
+    orinlar = {}
+    for ariza in arizalar:
+        if ariza.holat != 'kutilmoqda' or not ariza.guruh.avtomatik_qabul:
+            continue
+        oldinda = db.or_(GuruhAriza.ustuvorlik > ariza.ustuvorlik,
+                         db.and_(GuruhAriza.ustuvorlik == ariza.ustuvorlik,
+                                 db.tuple_(GuruhAriza.ariza_sana, GuruhAriza.id) < db.tuple_(ariza.ariza_sana, ariza.id)))
+        orinlar[ariza.id] = 1 + db.session.scalar(
+            db.select(db.func.count(GuruhAriza.id))
+            .where(GuruhAriza.guruh_id == ariza.guruh_id, GuruhAriza.holat == 'kutilmoqda', oldinda))
+    return orinlar
+
+@event.listens_for(GuruhAriza, 'after_insert')
+def _ariza_navbatga_tushdi(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and target.holat == 'kutilmoqda':
+        navbatga_belgilash(target.guruh_id, session)
+
+@event.listens_for(Session, 'before_commit')
+def _navbatlarni_ishlash(session):
+    if session.new:
+        session.flush()  # yangi arizalar after_insert orqali belgilanadi
+    guruh_ids = session.info.pop('navbat_guruhlari', None)
+    if guruh_ids and session is db.session():
+        navbatni_ishlash(guruh_ids)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _navbat_belgilarini_tashlash(session, previous_transaction):
+    session.info.pop('navbat_guruhlari', None)
+
+# ============= STATISTIKA KESHI =============
+# Admin dashboard hisoblagichlari xotirada saqlanadi va tegishli modellar
+# o'zgarib, tranzaksiya commit qilinganda keshdan o'chiriladi.
+
+class XotiraKesh:
+    """Jarayon ichidagi oddiy TTL kesh"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, muddat = item
+            if muddat is not None and muddat < monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, timeout=None):
+        muddat = monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (value, muddat)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+_xotira_keshi = XotiraKesh()
+STATISTIKA_KALITI = 'admin_statistika'
+
+def statistika_keshi():
+    return app.config.get('STATISTIKA_KESH') or _xotira_keshi
+
+def admin_statistikasi(yangilash=False):
+    """Dashboard hisoblagichlari: keshdan (yangilash=True bo'lsa keshsiz), bo'lmasa bitta so'rov bilan"""
+    kesh = statistika_keshi()
+    statistika = None if yangilash else kesh.get(STATISTIKA_KALITI)
+    if statistika is None:
+        def soni(model, *shartlar):
+            return db.select(db.func.count(model.id)).where(*shartlar).scalar_subquery()
+        row = db.session.execute(db.select(
+            soni(Talaba).label('talabalar_soni'),
+            soni(Mentor).label('mentorlar_soni'),
+            soni(Guruh).label('guruhlar_soni'),
+            soni(Fan).label('fanlar_soni'),
+            soni(GuruhAriza, GuruhAriza.holat == 'kutilmoqda').label('arizalar_soni'),
+            soni(DarsJadvali, DarsJadvali.holat == 'faol').label('jadvallar_soni'),
+        )).one()
+        statistika = row._asdict()
+        kesh.set(STATISTIKA_KALITI, statistika, timeout=app.config['STATISTIKA_KESH_TTL'])
+    return statistika
+
+# Qaysi o'zgarishlar hisoblagichlarga ta'sir qiladi
+STATISTIKA_HODISALARI = {
+    Talaba: ('after_insert', 'after_delete'),
+    Mentor: ('after_insert', 'after_delete'),
+    Guruh: ('after_insert', 'after_delete'),
+    Fan: ('after_insert', 'after_delete'),
+    GuruhAriza: ('after_insert', 'after_update', 'after_delete'),
+    DarsJadvali: ('after_insert', 'after_update', 'after_delete'),
+}
+
+def _statistika_eskirdi(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['statistika_eskirdi'] = True
+
+for _model, _hodisalar in STATISTIKA_HODISALARI.items():
+    for _hodisa in _hodisalar:
+        event.listen(_model, _hodisa, _statistika_eskirdi)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _ommaviy_ozgarish(orm_execute_state):
+    # db.insert()/db.update()/db.delete() mapper hodisalarini chaqirmaydi. Ommaviy UPDATE qaysi
+    # ustunlarni o'zgartirishi bu yerda tekshirilmaydi: hisoblagich modellaridagi har qanday
+    # ommaviy yozuv (fon vazifalari, talabalar_sonini_hisoblash, ...) keshni eskirtiradi
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in STATISTIKA_HODISALARI and \
+            (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        orm_execute_state.session.info['statistika_eskirdi'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _statistika_keshini_tozalash(session):
+    if session.info.pop('statistika_eskirdi', False):
+        statistika_keshi().delete(STATISTIKA_KALITI)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _statistika_belgisini_tashlash(session, previous_transaction):
+    session.info.pop('statistika_eskirdi', None)
+
+# ============= PROFIL KESHI =============
+# Talaba va mentor sahifalari joriy foydalanuvchi profilidan boshlanadi. Profil
+# so'rov davomida g da bir marta yuklanadi, ustun qiymatlari esa user_id bo'yicha
+# qisqa TTL li LRU keshda saqlanadi. Keshdagi qiymatlardan obyekt SQL siz
+# sessiyaga biriktiriladi (make_transient_to_detached + merge(load=False)), shuning
+# uchun munosabatlar (talaba.guruh) va tahrirlash odatdagidek ishlaydi. Profil
+# o'zgarganda yoki o'chirilganda kalit commit dan keyin keshdan olib tashlanadi;
+# boshqa jarayonlardagi o'zgarishlar TTL o'tgach ko'rinadi.
+
+class ProfilKeshi:
+    """(model nomi, user_id) -> profil ustunlari, TTL li LRU"""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            qiymatlar, muddat = item
+            if muddat < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return qiymatlar
+
+    def set(self, key, qiymatlar):
+        with self._lock:
+            self._data[key] = (qiymatlar, monotonic() + app.config['PROFIL_KESH_TTL'])
+            self._data.move_to_end(key)
+            while len(self._data) > app.config['PROFIL_KESH_HAJMI']:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def tozalash(self):
+        with self._lock:
+            self._data.clear()
+
+profil_keshi = ProfilKeshi()
+PROFIL_MODELLARI = (Talaba, Mentor)
+_PROFIL_YOQ = {}  # profili yo'q foydalanuvchi (masalan, admin) ham keshlanadi
+
+def joriy_profil(model, yangilash=False):
+    """Joriy foydalanuvchining Talaba/Mentor profili yoki None (so'rov ichida bir marta)"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    profillar = g.setdefault('profillar', {})
+    if model in profillar and not yangilash:
+        return profillar[model]
+    kalit = (model.__name__, user_id)
+    qiymatlar = None if yangilash else profil_keshi.get(kalit)
+    if qiymatlar is None:
+        profil = model.query.filter_by(user_id=user_id).first()
+        profil_keshi.set(kalit, {attr.key: getattr(profil, attr.key) for attr in db.inspect(model).column_attrs}
+                         if profil is not None else _PROFIL_YOQ)
+    elif qiymatlar is _PROFIL_YOQ:
+        profil = None
+    else:
+        profil = model(**qiymatlar)
+        make_transient_to_detached(profil)
+        profil = db.session.merge(profil, load=False)
+    profillar[model] = profil
+    return profil
+
+def joriy_talaba(yangilash=False):
+    return joriy_profil(Talaba, yangilash)
+
+def joriy_mentor(yangilash=False):
+    return joriy_profil(Mentor, yangilash)
+
+@event.listens_for(Talaba, 'after_insert')
+@event.listens_for(Talaba, 'after_update')
+@event.listens_for(Talaba, 'after_delete')
+@event.listens_for(Mentor, 'after_insert')
+@event.listens_for(Mentor, 'after_update')
+@event.listens_for(Mentor, 'after_delete')
+def _profil_ozgardi(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('profil_ozgarishlari', set()).add((mapper.class_.__name__, target.user_id))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _profillar_ommaviy_ozgarishi(orm_execute_state):
+    # Ommaviy UPDATE/DELETE (masalan, arizalarni qabul qilishda Talaba.guruh_id) - butun kesh eskiradi
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in PROFIL_MODELLARI:
+            orm_execute_state.session.info['profillar_eskirdi'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _profil_keshini_yangilash(session):
+    if session.info.pop('profillar_eskirdi', False):
+        profil_keshi.tozalash()
+    for kalit in session.info.pop('profil_ozgarishlari', ()):
+        profil_keshi.delete(kalit)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _profil_ozgarishlarini_tashlash(session, previous_transaction):
+    session.info.pop('profil_ozgarishlari', None)
+    session.info.pop('profillar_eskirdi', None)
+
+# ============= FRAGMENT KESHI =============
+# Katalog va ro'yxat sahifalaridagi har bir foydalanuvchi uchun bir xil HTML
+# bo'laklari shablonda {% call fragment('nomi', obyekt, ...) %} bilan keshlanadi.
+# Kalit shablonlar manbasi xeshi, obyektlar id si va versiya ustunidan (oddiy
+# qiymatlar, masalan hisoblagichlar, kalitga o'zicha qo'shiladi) tuziladi:
+# Fan, Mentor va Guruh ORM orqali o'zgarganda versiya bitta UPDATE ichida
+# oshiriladi, shuning uchun eski fragment o'chirilmaydi - shunchaki ishlatilmay
+# qoladi va LRU bilan (FRAGMENT_KESH_MB) chiqib ketadi. Versiya bazada bo'lgani
+# uchun boshqa jarayonlardagi o'zgarishlar ham darhol ko'rinadi va fragmentlarni
+# FRAGMENT_KESH (umumiy kesh) orqali jarayonlar o'rtasida bo'lishish mumkin.
+# Tez-tez o'zgaradigan hisoblagichlar (Guruh.talabalar_soni) versiyani
+# oshirmaydi - ular va foydalanuvchiga bog'liq qismlar fragmentdan tashqarida.
+
+VERSIYALI_MODELLAR = (Fan, Mentor, Guruh)
+VERSIYASIZ_USTUNLAR = {'versiya', 'talabalar_soni'}
+
+@event.listens_for(Fan, 'before_update')
+@event.listens_for(Mentor, 'before_update')
+@event.listens_for(Guruh, 'before_update')
+def _versiyani_oshirish(mapper, connection, target):
+    holat = db.inspect(target)
+    if any(holat.attrs[attr.key].history.has_changes() for attr in mapper.column_attrs
+           if attr.key not in VERSIYASIZ_USTUNLAR):
+        # SQL ifodasi: parallel tahrirlarda ham har biri versiyani oshiradi
+        target.versiya = mapper.class_.versiya + 1
+
+class FragmentKeshi:
+    """Render qilingan HTML fragmentlar: xotira hajmi bo'yicha LRU, ixtiyoriy umumiy kesh va hit/miss hisobi"""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hajm = 0
+        self._shablonlar_xeshi = None
+        self._shablonlar_holati = None  # (nomlar, uptodate funksiyalari) - oxirgi xesh hisoblangandagi
+        self.hisob = defaultdict(Counter)  # fragment nomi -> Counter(hit, umumiy, miss)
+        self.chiqarilgan = 0
+
+    def get(self, kalit):
+        """kalit = (fragment nomi, ...) - jarayon xotirasidan, bo'lmasa umumiy keshdan"""
+        with self._lock:
+            html = self._data.get(kalit)
+            if html is not None:
+                self._data.move_to_end(kalit)
+                self.hisob[kalit[0]]['hit'] += 1
+                return html
+        umumiy = app.config['FRAGMENT_KESH']
+        html = umumiy.get(f'fragment:{kalit!r}') if umumiy is not None else None
+        if html is not None:
+            self._joylash(kalit, html)
+        with self._lock:
+            self.hisob[kalit[0]]['miss' if html is None else 'umumiy'] += 1
+        return html
+
+    def set(self, kalit, html):
+        self._joylash(kalit, html)
+        umumiy = app.config['FRAGMENT_KESH']
+        if umumiy is not None:
+            umumiy.set(f'fragment:{kalit!r}', html, timeout=app.config['FRAGMENT_KESH_TTL'])
+
+    def _joylash(self, kalit, html):
+        hajm = sys.getsizeof(kalit) + sys.getsizeof(html)
+        chegara = app.config['FRAGMENT_KESH_MB'] * 1024 * 1024
+        with self._lock:
+            eski = self._data.pop(kalit, None)
+            if eski is not None:
+                self._hajm -= sys.getsizeof(kalit) + sys.getsizeof(eski)
+            self._data[kalit] = html
+            self._hajm += hajm
+            while self._hajm > chegara and self._data:
+                eski_kalit, eski = self._data.popitem(last=False)
+                self._hajm -= sys.getsizeof(eski_kalit) + sys.getsizeof(eski)
+                self.chiqarilgan += 1
+
+    def shablonlar_xeshi(self):
+        """Barcha shablonlar manbasi xeshi: yangi deploydan keyin umumiy keshdagi eski fragmentlar ishlatilmaydi"""
+        # Shablonlar qayta yuklanadigan (debug) rejimda fayl o'zgarganda qayta hisoblanadi
+        if self._shablonlar_xeshi is None or (app.jinja_env.auto_reload and self._shablonlar_ozgardimi()):
+            xesh = hashlib.sha1()
+            nomlar = sorted(app.jinja_env.list_templates())
+            yangiliklar = []
+            for nomi in nomlar:
+                manba, _, yangimi = app.jinja_env.loader.get_source(app.jinja_env, nomi)
+                xesh.update(manba.encode())
+                yangiliklar.append(yangimi)
+            self._shablonlar_xeshi = xesh.hexdigest()[:8]
+            self._shablonlar_holati = (nomlar, yangiliklar)
+        return self._shablonlar_xeshi
+
+    def _shablonlar_ozgardimi(self):
+        """Shablon qo'shilgan/o'chirilgan yoki fayl vaqti o'zgargan; so'rov ichida bir marta tekshiriladi,
+        so'rovdan tashqarida (CLI benchmark, ishchi) - har chaqiruvda"""
+        if has_request_context():
+            if 'shablonlar_tekshirildi' in g:
+                return False
+            g.shablonlar_tekshirildi = True
+        nomlar, yangiliklar = self._shablonlar_holati
+        return (sorted(app.jinja_env.list_templates()) != nomlar
+                or not all(yangimi is None or yangimi() for yangimi in yangiliklar))
+
+    def holat(self):
+        with self._lock:
+            return {'fragmentlar': len(self._data), 'hajm': self._hajm, 'chiqarilgan': self.chiqarilgan,
+                    'hisob': {nomi: dict(hisob) for nomi, hisob in sorted(self.hisob.items())}}
+
+    def prometheus(self):
+        holat = self.holat()
+        qatorlar = ['# HELP educenter_fragment_cache_total Fragment keshi murojaatlari',
+                    '# TYPE educenter_fragment_cache_total counter']
+        for nomi, hisob in holat['hisob'].items():
+            for natija in ('hit', 'umumiy', 'miss'):
+                qatorlar.append(f'educenter_fragment_cache_total{{fragment="{nomi}",natija="{natija}"}} '
+                                f'{hisob.get(natija, 0)}')
+        qatorlar += ['# HELP educenter_fragment_cache_bytes Keshdagi fragmentlar hajmi',
+                     '# TYPE educenter_fragment_cache_bytes gauge',
+                     f'educenter_fragment_cache_bytes {holat["hajm"]}',
+                     '# HELP educenter_fragment_cache_evictions_total LRU bilan chiqarilgan fragmentlar',
+                     '# TYPE educenter_fragment_cache_evictions_total counter',
+                     f'educenter_fragment_cache_evictions_total {holat["chiqarilgan"]}']
+        return '\n'.join(qatorlar) + '\n'
+
+    def tozalash(self, faqat_hisob=False):
+        with self._lock:
+            self.hisob.clear()
+            self.chiqarilgan = 0
+            if not faqat_hisob:
+                self._data.clear()
+                self._hajm = 0
+
+fragment_keshi = FragmentKeshi()
+
+def _fragment_qismi(qiymat):
+    if isinstance(qiymat, VERSIYALI_MODELLAR):
+        return type(qiymat).__name__, qiymat.id, qiymat.versiya
+    return qiymat  # None, hisoblagichlar va boshqa oddiy qiymatlar
+
+@app.template_global()
+def fragment(nomi, *qismlar, caller):
+    """{% call fragment('nomi', guruh, guruh.fan) %}...{% endcall %} - obyektlar versiyasi bo'yicha keshlangan HTML"""
+    kalit = (nomi, fragment_keshi.shablonlar_xeshi(), *map(_fragment_qismi, qismlar))
+    html = fragment_keshi.get(kalit)
+    if html is None:
+        html = str(caller())
+        fragment_keshi.set(kalit, html)
+    return Markup(html)
+
+# ============= SAHIFALASH =============
+# Keyset (seek) sahifalash: OFFSET o'rniga oxirgi qatorning (saralash ustuni, id)
+# qiymatlaridan keyingi qatorlar olinadi, shuning uchun har bir sahifa jadval
+# hajmidan qat'i nazar bir xil tezlikda ishlaydi.
+
+SAHIFA_HAJMI = 50
+MAX_SAHIFA_HAJMI = 200
+
+class Sahifa:
+    def __init__(self, items, keyingi, sort, yonalish, limit):
+        self.items = items
+        self.keyingi = keyingi  # keyingi sahifa kursori (yoki None)
+        self.sort = sort
+        self.yonalish = yonalish
+        self.limit = limit
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def kursor_yaratish(values):
+    payload = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def kursor_oqish(kursor, columns):
+    """Kursorni qiymatlar ro'yxatiga aylantirish; noto'g'ri kursor uchun None"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(kursor + '=' * (-len(kursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [datetime.fromisoformat(v) if isinstance(col.type, db.DateTime) else v
+                for v, col in zip(values, columns)]
+    except (ValueError, TypeError):
+        return None
+
+def saralash_parametrlari(model, saralash, default_sort, default_yonalish='asc'):
+    """request.args dagi sort/dir: (sort, yonalish, [saralash ustuni, id])"""
+    sort = request.args.get('sort', default_sort)
+    if sort not in saralash:
+        sort = default_sort
+    yonalish = request.args.get('dir', default_yonalish)
+    if yonalish not in ('asc', 'desc'):
+        yonalish = default_yonalish
+    columns = [saralash[sort]]
+    if saralash[sort] is not model.id:
+        columns.append(model.id)
+    return sort, yonalish, columns
+
+def royxat_filtrlari(query, filtrlar):
+    """request.args dagi ruxsat etilgan maydonlar bo'yicha tenglik filtrlari"""
+    for nomi, ustun in filtrlar.items():
+        qiymat = request.args.get(nomi, type=int if isinstance(ustun.type, db.Integer) else str)
+        if qiymat is not None and qiymat != '':
+            query = query.filter(ustun == qiymat)
+    return query
+
+def sahifa_limiti():
+    limit = request.args.get('limit', SAHIFA_HAJMI, type=int)
+    return max(1, min(limit, MAX_SAHIFA_HAJMI))
+
+def kursordan_keyingi(query, columns, yonalish):
+    """request.args dagi after kursoridan keyingi qatorlar, saralash tartibi bilan"""
+    kursor = request.args.get('after')
+    values = kursor_oqish(kursor, columns) if kursor else None
+    if values:
+        key = db.tuple_(*columns) if len(columns) > 1 else columns[0]
+        bound = db.tuple_(*values) if len(columns) > 1 else values[0]
+        query = query.filter(key < bound if yonalish == 'desc' else key > bound)
+    return query.order_by(*[col.desc() if yonalish == 'desc' else col.asc() for col in columns])
+
+def keyset_sahifa(query, model, saralash, default_sort, default_yonalish='asc', filtrlar=None):
+    """So'rovni request.args (filtrlar, sort, dir, limit, after) bo'yicha sahifalash"""
+    sort, yonalish, columns = saralash_parametrlari(model, saralash, default_sort, default_yonalish)
+    limit = sahifa_limiti()
+    if filtrlar:
+        query = royxat_filtrlari(query, filtrlar)
+
+    items = kursordan_keyingi(query, columns, yonalish).limit(limit + 1).all()
+
+    keyingi = None
+    if len(items) > limit:
+        items = items[:limit]
+        keyingi = kursor_yaratish([getattr(items[-1], col.key) for col in columns])
+    return Sahifa(items, keyingi, sort, yonalish, limit)
+
+# Ro'yxat sahifalari va eksport uchun umumiy saralash/filtr ustunlari
+TALABA_SARALASH = {'id': Talaba.id, 'ism': Talaba.ism, 'familiya': Talaba.familiya}
+TALABA_FILTRLARI = {'guruh_id': Talaba.guruh_id}
+GURUH_SARALASH = {'id': Guruh.id, 'nomi': Guruh.nomi}
+GURUH_FILTRLARI = {'holat': Guruh.holat, 'fan_id': Guruh.fan_id, 'mentor_id': Guruh.mentor_id}
+ARIZA_SARALASH = {'ariza_sana': GuruhAriza.ariza_sana, 'id': GuruhAriza.id}
+ARIZA_FILTRLARI = {'holat': GuruhAriza.holat, 'guruh_id': GuruhAriza.guruh_id, 'talaba_id': GuruhAriza.talaba_id}
+VAZIFA_SARALASH = {'yaratilgan_sana': Vazifa.yaratilgan_sana, 'id': Vazifa.id}
+VAZIFA_FILTRLARI = {'holat': Vazifa.holat, 'turi': Vazifa.turi}
+
+# ============= INSTRUMENTATSIYA =============
+# INSTRUMENTATSIYA=1 bo'lsa har bir so'rov uchun SQL soni/vaqti, shablon
+# render vaqti va javob hajmi yig'iladi, Server-Timing sarlavhasida qaytariladi
+# va endpointlar bo'yicha jamlanadi (/admin/instrumentatsiya, /metrics).
+
+class SorovStatistikasi:
+    """Endpointlar bo'yicha jamlangan ko'rsatkichlar (jarayon ichida)"""
+
+    ENG_SEKIN_SONI = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def qayd_qilish(self, endpoint, olchov):
+        with self._lock:
+            item = self.endpoints.setdefault(endpoint, {
+                'sorovlar': 0, 'vaqt': 0.0, 'max_vaqt': 0.0, 'sql_soni': 0, 'sql_vaqti': 0.0,
+                'shablon_vaqti': 0.0, 'hajm': 0, 'n_plus_1': 0, 'eng_sekin': [],
+            })
+            item['sorovlar'] += 1
+            item['vaqt'] += olchov['vaqt']
+            item['max_vaqt'] = max(item['max_vaqt'], olchov['vaqt'])
+            item['sql_soni'] += olchov['sql_soni']
+            item['sql_vaqti'] += olchov['sql_vaqti']
+            item['shablon_vaqti'] += olchov['shablon_vaqti']
+            item['hajm'] += olchov['hajm']
+            item['n_plus_1'] += bool(olchov['n_plus_1'])
+            item['eng_sekin'] = sorted(item['eng_sekin'] + olchov['eng_sekin'],
+                                       reverse=True)[:self.ENG_SEKIN_SONI]
+
+    def hisobot(self):
+        with self._lock:
+            return sorted(((endpoint, dict(item)) for endpoint, item in self.endpoints.items()),
+                          key=lambda pair: pair[1]['vaqt'], reverse=True)
+
+    def prometheus(self):
+        metrikalar = [
+            ('educenter_requests_total', 'So\'rovlar soni', 'sorovlar'),
+            ('educenter_request_seconds_sum', 'So\'rovlarga ketgan umumiy vaqt', 'vaqt'),
+            ('educenter_sql_queries_total', 'SQL so\'rovlar soni', 'sql_soni'),
+            ('educenter_sql_seconds_sum', 'SQL so\'rovlarga ketgan vaqt', 'sql_vaqti'),
+            ('educenter_template_seconds_sum', 'Shablon render vaqti', 'shablon_vaqti'),
+            ('educenter_response_bytes_sum', 'Javoblar hajmi', 'hajm'),
+            ('educenter_n_plus_one_total', 'N+1 aniqlangan so\'rovlar', 'n_plus_1'),
+        ]
+        hisobot = self.hisobot()
+        qatorlar = []
+        for nomi, tavsif, kalit in metrikalar:
+            qatorlar.append(f'# HELP {nomi} {tavsif}')
+            qatorlar.append(f'# TYPE {nomi} counter')
+            for endpoint, item in hisobot:
+                qatorlar.append(f'{nomi}{{endpoint="{endpoint}"}} {item[kalit]}')
+        return '\n'.join(qatorlar) + '\n'
+
+    def tozalash(self):
+        with self._lock:
+            self.endpoints.clear()
+
+sorov_statistikasi = SorovStatistikasi()
+
+def _olchov():
+    """Joriy so'rovning o'lchovlari (instrumentatsiya o'chiq bo'lsa None)"""
+    if not has_request_context():
+        return None
+    return g.get('olchov')
+
+@app.before_request
+def _olchovni_boshlash():
+    if app.config['INSTRUMENTATSIYA']:
+        g.olchov = {'boshlanish': perf_counter(), 'sql': [], 'shablon_vaqti': 0.0}
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _sql_boshlanishi(conn, cursor, statement, parameters, context, executemany):
+    if _olchov() is not None:
+        conn.info.setdefault('sql_boshlanish', []).append(perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _sql_tugashi(conn, cursor, statement, parameters, context, executemany):
+    olchov = _olchov()
+    if olchov is not None and conn.info.get('sql_boshlanish'):
+        olchov['sql'].append((perf_counter() - conn.info['sql_boshlanish'].pop(), statement))
+
+@before_render_template.connect_via(app)
+def _shablon_boshlanishi(sender, template, context, **extra):
+    olchov = _olchov()
+    if olchov is not None:
+        olchov['shablon_boshlanish'] = perf_counter()
+
+@template_rendered.connect_via(app)
+def _shablon_tugashi(sender, template, context, **extra):
+    olchov = _olchov()
+    if olchov is not None and 'shablon_boshlanish' in olchov:
+        olchov['shablon_vaqti'] += perf_counter() - olchov.pop('shablon_boshlanish')
+
+@app.after_request
+def _olchovni_yakunlash(response):
+    olchov = _olchov()
+    if olchov is None:
+        return response
+    vaqt = perf_counter() - olchov['boshlanish']
+    sql_vaqti = sum(davomiylik for davomiylik, _ in olchov['sql'])
+    # Bitta so'rov ichida bir xil SQL ko'p marta takrorlansa - N+1 belgisi
+    takrorlar = Counter(statement for _, statement in olchov['sql'])
+    n_plus_1 = [(statement, soni) for statement, soni in takrorlar.items()
+                if soni > app.config['N_PLUS_1_CHEGARASI']]
+    for statement, soni in n_plus_1:
+        app.logger.warning('N+1 ehtimoli: %s da %d marta: %s', request.endpoint, soni, statement)
+    eng_sekin = sorted(((round(d * 1000, 2), s) for d, s in olchov['sql']), reverse=True)[:3]
+    hajm = 0 if response.is_streamed else (response.calculate_content_length() or 0)
+
+    response.headers['Server-Timing'] = ', '.join([
+        f'sql;dur={sql_vaqti * 1000:.2f};desc="{len(olchov["sql"])} ta SQL"',
+        f'tpl;dur={olchov["shablon_vaqti"] * 1000:.2f}',
+        f'total;dur={vaqt * 1000:.2f}',
+    ])
+    sorov_statistikasi.qayd_qilish(request.endpoint or request.path, {
+        'vaqt': vaqt, 'sql_soni': len(olchov['sql']), 'sql_vaqti': sql_vaqti,
+        'shablon_vaqti': olchov['shablon_vaqti'], 'hajm': hajm, 'n_plus_1': n_plus_1,
+        'eng_sekin': eng_sekin,
+    })
+    return response
+
+# ============= JADVAL KONFLIKTLARI =============
+# Faol darslar (xona, kun) va (mentor, kun) kalitlari bo'yicha boshlanish
+# vaqti tartibida saqlanadi. Yangi dars uchun faqat o'sha kalitdagi oraliqlar
+# bisect bilan tekshiriladi - butun DarsJadvali jadvalini o'qish shart emas.
+# Indeks birinchi murojaatda quriladi va commit qilingan o'zgarishlar bilan
+# yangilanadi; boshqa jarayonlardagi o'zgarishlar uchun TTL o'tgach qayta quriladi.
+
+KUNLAR = ['Dushanba', 'Seshanba', 'Chorshanba', 'Payshanba', 'Juma', 'Shanba', 'Yakshanba']
+# Standart dars vaqtlari va kunlar naqshlari (avtomatik jadval va sinov ma'lumotlari uchun)
+DARS_VAQTLARI = [(time(8, 0), time(9, 30)), (time(10, 0), time(11, 30)), (time(12, 0), time(13, 30)),
+                 (time(14, 0), time(15, 30)), (time(16, 0), time(17, 30)), (time(18, 0), time(19, 30))]
+JUFT_KUNLAR = ['Dushanba', 'Chorshanba', 'Juma']
+TOQ_KUNLAR = ['Seshanba', 'Payshanba', 'Shanba']
+
+def _daqiqa(vaqt):
+    return vaqt.hour * 60 + vaqt.minute
+
+def _xona_kaliti(xona):
+    xona = (xona or '').strip().lower()
+    return xona or None
+
+class JadvalIndeksi:
+    """(xona, kun) va (mentor, kun) bo'yicha oraliqlar indeksi"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._qurilgan = None  # monotonic() vaqti yoki None
+        self.darslar = {}  # jadval_id -> (guruh_id, kun, boshlanish, tugash, xona)
+        self.guruh_mentori = {}  # guruh_id -> mentor_id
+        self._bolimlar = {}  # kalit -> [(boshlanish, tugash, jadval_id), ...] boshlanish bo'yicha tartiblangan
+        self._max_uzunlik = {}  # kalit -> eng uzun oraliq (qidiruvni erta to'xtatish uchun)
+
+    def _kalitlar(self, guruh_id, kun, xona):
+        kalitlar = []
+        xona = _xona_kaliti(xona)
+        if xona:
+            kalitlar.append(('xona', xona, kun))
+        mentor_id = self.guruh_mentori.get(guruh_id)
+        if mentor_id:
+            kalitlar.append(('mentor', mentor_id, kun))
+        return kalitlar
+
+    def _qoshish(self, jadval_id, guruh_id, kun, boshlanish, tugash, xona):
+        self.darslar[jadval_id] = (guruh_id, kun, boshlanish, tugash, xona)
+        for kalit in self._kalitlar(guruh_id, kun, xona):
+            insort(self._bolimlar.setdefault(kalit, []), (boshlanish, tugash, jadval_id))
+            self._max_uzunlik[kalit] = max(self._max_uzunlik.get(kalit, 0), tugash - boshlanish)
+
+    def _olib_tashlash(self, jadval_id):
+        dars = self.darslar.pop(jadval_id, None)
+        if dars is None:
+            return
+        guruh_id, kun, boshlanish, tugash, xona = dars
+        for kalit in self._kalitlar(guruh_id, kun, xona):
+            bolim = self._bolimlar.get(kalit, [])
+            i = bisect_left(bolim, (boshlanish, tugash, jadval_id))
+            if i < len(bolim) and bolim[i] == (boshlanish, tugash, jadval_id):
+                del bolim[i]
+
+    def qurish(self):
+        rows = db.session.execute(
+            db.select(DarsJadvali.id, DarsJadvali.guruh_id, DarsJadvali.kun, DarsJadvali.boshlanish_vaqti,
+                      DarsJadvali.tugash_vaqti, DarsJadvali.xona)
+            .where(DarsJadvali.holat == 'faol')
+        ).all()
+        guruh_mentori = dict(db.session.execute(
+            db.select(Guruh.id, Guruh.mentor_id).where(Guruh.mentor_id.isnot(None))).all())
+        with self._lock:
+            self.darslar, self._bolimlar, self._max_uzunlik = {}, {}, {}
+            self.guruh_mentori = guruh_mentori
+            for jadval_id, guruh_id, kun, boshlanish, tugash, xona in rows:
+                self._qoshish(jadval_id, guruh_id, kun, _daqiqa(boshlanish), _daqiqa(tugash), xona)
+            self._qurilgan = monotonic()
+
+    def tayyorlash(self):
+        ttl = app.config['JADVAL_INDEKS_TTL']
+        if self._qurilgan is None or (ttl and monotonic() - self._qurilgan > ttl):
+            self.qurish()
+
+    def eskirgan_deb_belgilash(self):
+        self._qurilgan = None
+
+    def dars_ozgardi(self, jadval_id, guruh_id, kun, boshlanish, tugash, xona, faol):
+        """Commit qilingan o'zgarishni indeksga qo'llash"""
+        with self._lock:
+            if self._qurilgan is None:
+                return
+            self._olib_tashlash(jadval_id)
+            if faol:
+                self._qoshish(jadval_id, guruh_id, kun, _daqiqa(boshlanish), _daqiqa(tugash), xona)
+
+    def guruh_ozgardi(self, guruh_id, mentor_id):
+        with self._lock:
+            if self._qurilgan is None:
+                return
+            if self.guruh_mentori.get(guruh_id) != mentor_id:
+                if any(dars[0] == guruh_id for dars in self.darslar.values()):
+                    # Guruh darslarining mentor kalitlari o'zgaradi - keyingi murojaatda qayta qurish
+                    self._qurilgan = None
+                elif mentor_id:
+                    self.guruh_mentori[guruh_id] = mentor_id
+                else:
+                    self.guruh_mentori.pop(guruh_id, None)
+
+    def konfliktlar(self, guruh_id, kun, boshlanish_vaqti, tugash_vaqti, xona, istisno=None):
+        """Berilgan dars bilan vaqti ustma-ust tushadigan [(tur, jadval_id), ...]"""
+        self.tayyorlash()
+        boshlanish, tugash = _daqiqa(boshlanish_vaqti), _daqiqa(tugash_vaqti)
+        natija = []
+        with self._lock:
+            for kalit in self._kalitlar(guruh_id, kun, xona):
+                bolim = self._bolimlar.get(kalit, [])
+                eng_erta = boshlanish - self._max_uzunlik.get(kalit, 0)
+                # boshlanishi < tugash bo'lgan oraliqlarni oxiridan ko'rib chiqish
+                i = bisect_left(bolim, (tugash,))
+                while i > 0:
+                    i -= 1
+                    bosh, tug, jadval_id = bolim[i]
+                    if bosh < eng_erta:
+                        break
+                    if tug > boshlanish and jadval_id != istisno and self.darslar[jadval_id][0] != guruh_id:
+                        natija.append((kalit[0], jadval_id))
+        return natija
+
+    def barcha_konfliktlar(self):
+        """Butun jadvaldagi ustma-ust tushgan juftliklar: [(tur, kalit, jadval_id, jadval_id), ...]"""
+        self.tayyorlash()
+        natija = []
+        with self._lock:
+            for kalit, bolim in self._bolimlar.items():
+                faol = []  # (tugash, jadval_id) - hali tugamagan oraliqlar
+                for bosh, tug, jadval_id in bolim:
+                    faol = [(t, j) for t, j in faol if t > bosh]
+                    for _, boshqa_id in faol:
+                        if self.darslar[boshqa_id][0] != self.darslar[jadval_id][0]:
+                            natija.append((kalit[0], kalit[1], kalit[2], boshqa_id, jadval_id))
+                    faol.append((tug, jadval_id))
+        return natija
+
+jadval_indeksi = JadvalIndeksi()
+
+@event.listens_for(DarsJadvali, 'after_insert')
+@event.listens_for(DarsJadvali, 'after_update')
+def _jadval_yozildi(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('jadval_ozgarishlari', []).append(
+            ('dars', target.id, target.guruh_id, target.kun, target.boshlanish_vaqti, target.tugash_vaqti,
+             target.xona, target.holat == 'faol'))
+
+@event.listens_for(DarsJadvali, 'after_delete')
+def _jadval_ochirildi(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('jadval_ozgarishlari', []).append(('dars', target.id, None, None, None, None, None, False))
+
+@event.listens_for(Guruh, 'after_insert')
+@event.listens_for(Guruh, 'after_update')
+def _guruh_yozildi(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        mentor_id = int(target.mentor_id) if target.mentor_id else None
+        session.info.setdefault('jadval_ozgarishlari', []).append(('guruh', target.id, mentor_id))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _jadval_ommaviy_ozgarish(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is DarsJadvali:
+            orm_execute_state.session.info['jadval_eskirdi'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _jadval_indeksini_yangilash(session):
+    if session.info.pop('jadval_eskirdi', False):
+        jadval_indeksi.eskirgan_deb_belgilash()
+    for ozgarish in session.info.pop('jadval_ozgarishlari', []):
+        if ozgarish[0] == 'dars':
+            jadval_indeksi.dars_ozgardi(*ozgarish[1:])
+        else:
+            jadval_indeksi.guruh_ozgardi(*ozgarish[1:])
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _jadval_ozgarishlarini_tashlash(session, previous_transaction):
+    session.info.pop('jadval_ozgarishlari', None)
+    session.info.pop('jadval_eskirdi', None)
+
+def konflikt_tavsifi(konfliktlar):
+    """Konfliktlarni foydalanuvchiga ko'rsatiladigan matnga aylantirish"""
+    jadval_ids = {jadval_id for _, jadval_id in konfliktlar}
+    darslar = {jadval.id: jadval for jadval in
+               DarsJadvali.query.options(joinedload(DarsJadvali.guruh)).filter(DarsJadvali.id.in_(jadval_ids))}
+    qismlar = []
+    for tur, jadval_id in konfliktlar:
+        dars = darslar.get(jadval_id)
+        if dars is None:
+            continue
+        vaqt = f'{dars.boshlanish_vaqti.strftime("%H:%M")}-{dars.tugash_vaqti.strftime("%H:%M")}'
+        if tur == 'xona':
+            qismlar.append(f'{dars.xona} xonasi {dars.guruh.nomi} guruhi bilan band ({vaqt})')
+        else:
+            qismlar.append(f'mentor {dars.guruh.nomi} guruhida dars o\'tadi ({vaqt})')
+    return '; '.join(qismlar)
+
+# ============= HAFTALIK JADVAL =============
+# Guruh, mentor va xona bo'yicha haftalik jadval bir marta SQL'da kunlar va
+# vaqt tartibida yig'iladi va jarayon xotirasida saqlanadi. Har murojaatda
+# faqat arzon versiya so'rovi (darslar soni va eng so'nggi yangilangan_sana)
+# bajariladi: jadval_add/delete/restore yoki guruh o'zgarishi versiyani
+# oshiradi va ko'rinish keyingi murojaatda qayta quriladi. Versiya ETag va
+# Last-Modified sarlavhalari uchun ham ishlatiladi.
+
+HaftalikDars = namedtuple('HaftalikDars', 'id guruh_id guruh_nomi kun boshlanish_vaqti tugash_vaqti xona '
+                                          'boshlanish_sana tugash_sana yaratilgan_sana')
+JADVAL_TURLARI = ('guruh', 'mentor', 'xona')
+
+def _jadval_sharti(query, tur, kalit):
+    if tur == 'guruh':
+        return query.where(DarsJadvali.guruh_id == kalit)
+    if tur == 'mentor':
+        return query.join(Guruh, Guruh.id == DarsJadvali.guruh_id).where(Guruh.mentor_id == kalit)
+    return query.where(DarsJadvali.xona == kalit)
+
+def jadval_versiyasi(tur, kalit):
+    """(darslar soni, oxirgi o'zgarish) - bekor qilingan darslar ham hisobga olinadi"""
+    query = db.select(db.func.count(DarsJadvali.id),
+                      db.func.max(db.func.coalesce(DarsJadvali.yangilangan_sana, DarsJadvali.yaratilgan_sana)))
+    soni, oxirgi = db.session.execute(_jadval_sharti(query, tur, kalit)).one()
+    if isinstance(oxirgi, str):  # SQLite max() ustun turini saqlamaydi
+        oxirgi = datetime.fromisoformat(oxirgi)
+    return soni, oxirgi
+
+class HaftalikJadval:
+    """Bitta guruh, mentor yoki xonaning tayyor haftalik ko'rinishi"""
+
+    def __init__(self, tur, kalit, versiya, darslar):
+        self.tur = tur
+        self.kalit = kalit
+        self.versiya = versiya
+        self.darslar = darslar
+        kunlar = {kun: [] for kun in KUNLAR}
+        for dars in darslar:
+            kunlar.setdefault(dars.kun, []).append(dars)
+        self.kunlar = list(kunlar.items())
+        belgi = json.dumps([tur, kalit, versiya[0], versiya[1].isoformat() if versiya[1] else None])
+        self.etag = hashlib.sha1(belgi.encode()).hexdigest()[:20]
+        self.oxirgi_ozgarish = versiya[1].replace(microsecond=0, tzinfo=timezone.utc) if versiya[1] else None
+
+    @classmethod
+    def qurish(cls, tur, kalit, versiya):
+        tartib = db.case({kun: i for i, kun in enumerate(KUNLAR)}, value=DarsJadvali.kun, else_=len(KUNLAR))
+        query = (db.select(DarsJadvali.id, DarsJadvali.guruh_id, Guruh.nomi, DarsJadvali.kun,
+                           DarsJadvali.boshlanish_vaqti, DarsJadvali.tugash_vaqti, DarsJadvali.xona,
+                           Guruh.boshlanish_sana, Guruh.tugash_sana, DarsJadvali.yaratilgan_sana)
+                 .where(DarsJadvali.holat == 'faol')
+                 .order_by(tartib, DarsJadvali.boshlanish_vaqti, DarsJadvali.id))
+        if tur != 'mentor':
+            query = query.join(Guruh, Guruh.id == DarsJadvali.guruh_id)
+        rows = db.session.execute(_jadval_sharti(query, tur, kalit)).all()
+        return cls(tur, kalit, versiya, [HaftalikDars(*row) for row in rows])
+
+class HaftalikJadvallar:
+    """Versiya bo'yicha tekshiriladigan haftalik jadvallar keshi (LRU)"""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def olish(self, tur, kalit):
+        versiya = jadval_versiyasi(tur, kalit)
+        with self._lock:
+            jadval = self._data.get((tur, kalit))
+            if jadval is not None and jadval.versiya == versiya:
+                self._data.move_to_end((tur, kalit))
+                return jadval
+        jadval = HaftalikJadval.qurish(tur, kalit, versiya)
+        with self._lock:
+            self._data[(tur, kalit)] = jadval
+            self._data.move_to_end((tur, kalit))
+            while len(self._data) > app.config['HAFTALIK_JADVAL_KESH_HAJMI']:
+                self._data.popitem(last=False)
+        return jadval
+
+    def tozalash(self):
+        with self._lock:
+            self._data.clear()
+
+haftalik_jadvallar = HaftalikJadvallar()
+
+def _ics_serializer():
+    return URLSafeSerializer(app.config['SECRET_KEY'], salt='jadval-ics')
+
+def ics_versiyasi(tur, kalit):
+    qator = db.session.get(IcsHavola, (tur, str(kalit)))
+    return qator.versiya if qator is not None else 0
+
+def ics_tokeni(tur, kalit):
+    """Kalendar ilovalari uchun login talab qilmaydigan imzolangan havola kaliti.
+
+    Tokenga jadvalning joriy havola versiyasi kiradi: ics_havolasini_yangilash()
+    dan keyin eski havola 404 qaytaradi.
+    """
+    return _ics_serializer().dumps([tur, kalit, ics_versiyasi(tur, kalit)])
+
+def ics_tokenini_oqish(token):
+    try:
+        tur, kalit, *versiya = _ics_serializer().loads(token)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    if tur not in JADVAL_TURLARI or len(versiya) > 1:
+        return None
+    # Versiyasiz (avvalgi) havolalar 0-versiya hisoblanadi - birinchi yangilashgacha ishlaydi
+    if (versiya[0] if versiya else 0) != ics_versiyasi(tur, kalit):
+        return None
+    return tur, kalit
+
+def ics_havolasini_yangilash(tur, kalit):
+    """Jadvalning .ics havolasini almashtirish: avval berilgan barcha havolalar bekor bo'ladi"""
+    qator = db.session.get(IcsHavola, (tur, str(kalit)))
+    if qator is None:
+        qator = IcsHavola(tur=tur, kalit=str(kalit), versiya=0)
+        db.session.add(qator)
+    qator.versiya += 1
+
+def _ics_matn(qiymat):
+    return (str(qiymat).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\n', '\\n'))
+
+def _ics_qator(qator):
+    # RFC 5545: 75 baytdan uzun qatorlar bo'shliq bilan davom ettiriladi
+    qismlar, joriy = [], ''
+    for belgi in qator:
+        if len((joriy + belgi).encode()) > (75 if not qismlar else 74):
+            qismlar.append(joriy)
+            joriy = ''
+        joriy += belgi
+    qismlar.append(joriy)
+    return '\r\n '.join(qismlar) + '\r\n'
+
+def ics_qatorlari(jadval, nomi):
+    """Haftalik jadvalni iCalendar (RFC 5545) qatorlari sifatida ketma-ket berish"""
+    dtstamp = (jadval.oxirgi_ozgarish or datetime(2000, 1, 1, tzinfo=timezone.utc)).strftime('%Y%m%dT%H%M%SZ')
+    yield _ics_qator('BEGIN:VCALENDAR')
+    yield _ics_qator('VERSION:2.0')
+    yield _ics_qator('PRODID:-//EduCenter//Dars jadvali//UZ')
+    yield _ics_qator('CALSCALE:GREGORIAN')
+    yield _ics_qator(f'X-WR-CALNAME:{_ics_matn(nomi)}')
+    for dars in jadval.darslar:
+        if dars.kun not in KUNLAR:
+            continue
+        # Birinchi dars: guruh boshlanish (bo'lmasa dars qo'shilgan) sanasidan keyingi mos hafta kuni
+        boshlanish = dars.boshlanish_sana or (dars.yaratilgan_sana or datetime(2000, 1, 1)).date()
+        sana = boshlanish + timedelta(days=(KUNLAR.index(dars.kun) - boshlanish.weekday()) % 7)
+        yield _ics_qator('BEGIN:VEVENT')
+        yield _ics_qator(f'UID:dars-{dars.id}@educenter')
+        yield _ics_qator(f'DTSTAMP:{dtstamp}')
+        yield _ics_qator(f'DTSTART:{datetime.combine(sana, dars.boshlanish_vaqti).strftime("%Y%m%dT%H%M%S")}')
+        yield _ics_qator(f'DTEND:{datetime.combine(sana, dars.tugash_vaqti).strftime("%Y%m%dT%H%M%S")}')
+        rrule = 'RRULE:FREQ=WEEKLY'
+        if dars.tugash_sana:
+            rrule += f';UNTIL={dars.tugash_sana.strftime("%Y%m%d")}T235959'
+        yield _ics_qator(rrule)
+        yield _ics_qator(f'SUMMARY:{_ics_matn(dars.guruh_nomi)}')
+        if dars.xona:
+            yield _ics_qator(f'LOCATION:{_ics_matn(dars.xona)}')
+        yield _ics_qator('END:VEVENT')
+    yield _ics_qator('END:VCALENDAR')
+
+def shartli_javob(javob, etag, oxirgi_ozgarish=None):
+    """ETag/Last-Modified qo'yib, If-None-Match/If-Modified-Since bo'yicha 304 qaytarish"""
+    javob.set_etag(etag)
+    if oxirgi_ozgarish is not None:
+        javob.last_modified = oxirgi_ozgarish
+    javob.cache_control.no_cache = True
+    return javob.make_conditional(request)
+
+# ============= EKSPORT =============
+# Ro'yxatlar CSV/XLSX sifatida oqim bilan beriladi: qatorlar keyset sahifalash
+# kabi (saralash ustuni, id) chegarasi bo'yicha bo'laklab o'qiladi va yozuvchi
+# generator har bo'lakni darhol jo'natadi. Bitta katta ORDER BY so'rovidan farqli
+# ravishda har bir bo'lak indeks bo'yicha o'qiladi (SQLite natijani vaqtinchalik
+# B-tree da saralamaydi), shuning uchun xotira sarfi qatorlar sonidan qat'i nazar
+# o'zgarmas. Filtrlar va saralash ro'yxat sahifalari bilan bir xil.
+
+EKSPORT_BOLAK = 1000  # bitta so'rov va bitta jo'natiladigan bo'lakdagi qatorlar soni
+
+def _sana_matni(qiymat):
+    if isinstance(qiymat, datetime):
+        return qiymat.strftime('%Y-%m-%d %H:%M')
+    return qiymat.isoformat() if qiymat is not None and hasattr(qiymat, 'isoformat') else qiymat
+
+def _talabalar_eksport_sorovi():
+    return (db.select(Talaba.id, Talaba.ism, Talaba.familiya, Talaba.telefon, Talaba.manzil, Talaba.tug_sana,
+                      Guruh.nomi, User.username, User.email)
+            .outerjoin(Guruh, Guruh.id == Talaba.guruh_id)
+            .outerjoin(User, User.id == Talaba.user_id))
+
+def _guruhlar_eksport_sorovi():
+    return (db.select(Guruh.id, Guruh.nomi, Fan.nomi, db.func.trim(Mentor.ism + ' ' + Mentor.familiya),
+                      Guruh.boshlanish_sana, Guruh.tugash_sana, Guruh.talabalar_soni, Guruh.max_talabalar, Guruh.holat)
+            .outerjoin(Fan, Fan.id == Guruh.fan_id)
+            .outerjoin(Mentor, Mentor.id == Guruh.mentor_id))
+
+def _arizalar_eksport_sorovi():
+    return (db.select(GuruhAriza.id, Talaba.ism, Talaba.familiya, Talaba.telefon, Guruh.nomi, Fan.nomi,
+                      GuruhAriza.holat, GuruhAriza.ariza_sana, GuruhAriza.javob_sana, GuruhAriza.izoh)
+            .outerjoin(Talaba, Talaba.id == GuruhAriza.talaba_id)
+            .outerjoin(Guruh, Guruh.id == GuruhAriza.guruh_id)
+            .outerjoin(Fan, Fan.id == Guruh.fan_id))
+
+# royxat -> (sarlavhalar, so'rov, model, saralash, default_sort, default_yonalish, filtrlar)
+EKSPORTLAR = {
+    'talabalar': (['ID', 'Ism', 'Familiya', 'Telefon', 'Manzil', 'Tug\'ilgan sana', 'Guruh', 'Username', 'Email'],
+                  _talabalar_eksport_sorovi, Talaba, TALABA_SARALASH, 'id', 'asc', TALABA_FILTRLARI),
+    'guruhlar': (['ID', 'Nomi', 'Fan', 'Mentor', 'Boshlanish', 'Tugash', 'Talabalar', 'Sig\'im', 'Holat'],
+                 _guruhlar_eksport_sorovi, Guruh, GURUH_SARALASH, 'id', 'asc', GURUH_FILTRLARI),
+    'arizalar': (['ID', 'Ism', 'Familiya', 'Telefon', 'Guruh', 'Fan', 'Holat', 'Ariza sanasi', 'Javob sanasi', 'Izoh'],
+                 _arizalar_eksport_sorovi, GuruhAriza, ARIZA_SARALASH, 'ariza_sana', 'desc', ARIZA_FILTRLARI),
+}
+
+def eksport_qatorlari(royxat):
+    """Joriy request.args filtr/saralashi bo'yicha qatorlar, keyset bo'laklari bilan"""
+    _, sorov, model, saralash, default_sort, default_yonalish, filtrlar = EKSPORTLAR[royxat]
+    _, yonalish, columns = saralash_parametrlari(model, saralash, default_sort, default_yonalish)
+    # Saralash ustunlari qator oxiriga qo'shiladi - keyingi bo'lak chegarasi shulardan olinadi
+    query = royxat_filtrlari(sorov(), filtrlar).add_columns(*columns)
+    query = query.order_by(*[col.desc() if yonalish == 'desc' else col.asc() for col in columns])
+    key = db.tuple_(*columns) if len(columns) > 1 else columns[0]
+    bound = None
+    while True:
+        bolak_query = query
+        if bound is not None:
+            bolak_query = query.where(key < bound if yonalish == 'desc' else key > bound)
+        rows = db.session.execute(bolak_query.limit(EKSPORT_BOLAK)).all()
+        for row in rows:
+            yield [_sana_matni(qiymat) for qiymat in row[:-len(columns)]]
+        if len(rows) < EKSPORT_BOLAK:
+            break
+        values = rows[-1][-len(columns):]
+        bound = db.tuple_(*values) if len(columns) > 1 else values[0]
+
+class _Aks:
+    """csv.writer uchun: yozilgan qatorni saqlamasdan qaytaradi"""
+
+    def write(self, qiymat):
+        return qiymat
+
+def csv_oqimi(sarlavhalar, qatorlar):
+    writer = csv.writer(_Aks())
+    # BOM - Excel UTF-8 ni (o‘, g‘ harflarini) to'g'ri ochishi uchun
+    yield ('\ufeff' + writer.writerow(sarlavhalar)).encode('utf-8')
+    bolak = []
+    for row in qatorlar:
+        bolak.append(writer.writerow(row))
+        if len(bolak) >= EKSPORT_BOLAK:
+            yield ''.join(bolak).encode('utf-8')
+            bolak = []
+    if bolak:
+        yield ''.join(bolak).encode('utf-8')
+
+class _OqimBuferi(io.RawIOBase):
+    """zipfile uchun seek qilinmaydigan chiqish: yozilgan baytlar generatorga uzatiladi"""
+
+    def __init__(self):
+        self._qismlar = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._qismlar.append(bytes(b))
+        return len(b)
+
+    def olish(self):
+        data = b''.join(self._qismlar)
+        self._qismlar = []
+        return data
+
+_XLSX_FAYLLARI = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'),
+}
+# XML 1.0 da ruxsat etilmagan boshqaruv belgilari
+_XML_NOTOGRI = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+
+def _xlsx_katak(qiymat):
+    if qiymat is None:
+        return '<c/>'
+    if isinstance(qiymat, (int, float)) and not isinstance(qiymat, bool):
+        return f'<c><v>{qiymat}</v></c>'
+    matn = xml_escape(str(qiymat).translate(_XML_NOTOGRI))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{matn}</t></is></c>'
+
+def _xlsx_qatori(row):
+    return '<row>' + ''.join(_xlsx_katak(qiymat) for qiymat in row) + '</row>'
+
+def xlsx_oqimi(sarlavhalar, qatorlar, varaq_nomi):
+    """Minimal XLSX (inlineStr kataklar): varaq XML i zip ichiga oqim bilan yoziladi"""
+    bufer = _OqimBuferi()
+    with zipfile.ZipFile(bufer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nomi, matn in _XLSX_FAYLLARI.items():
+            zf.writestr(nomi, matn)
+        zf.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{xml_escape(varaq_nomi[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'))
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as varaq:
+            varaq.write(('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                         '<sheetData>' + _xlsx_qatori(sarlavhalar)).encode('utf-8'))
+            yield bufer.olish()
+            bolak = []
+            for row in qatorlar:
+                bolak.append(_xlsx_qatori(row))
+                if len(bolak) >= EKSPORT_BOLAK:
+                    varaq.write(''.join(bolak).encode('utf-8'))
+                    bolak = []
+                    yield bufer.olish()
+            if bolak:
+                varaq.write(''.join(bolak).encode('utf-8'))
+            varaq.write(b'</sheetData></worksheet>')
+    yield bufer.olish()
+
+EKSPORT_FORMATLARI = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# ============= TALABALAR IMPORTI =============
+# CSV fayl qatorma-qator o'qiladi va IMPORT_BOLAK qatordan iborat bo'laklarda
+# ishlanadi: tekshiruv, fayl ichidagi va bazadagi takroriy username/email lar
+# (bo'lak uchun bittadan IN so'rovi), parol xeshlari jarayonlar hovuzida va
+# User/Talaba qatorlari executemany bilan qo'shiladi. Har bir bo'lak alohida
+# commit qilinadi; xato qatorlar o'tkazib yuborilib, raqami bilan qaytariladi.
+
+IMPORT_BOLAK = 1000
+IMPORT_MAJBURIY = ('username', 'email', 'parol', 'ism', 'familiya')
+IMPORT_USTUNLARI = IMPORT_MAJBURIY + ('telefon', 'manzil', 'tug_sana')
+IMPORT_UZUNLIKLARI = {'username': 80, 'email': 120, 'ism': 100, 'familiya': 100, 'telefon': 20, 'manzil': 200}
+
+class ImportNatijasi:
+    """Import hisoboti: qo'shilganlar soni va [(qator raqami, xabar), ...]"""
+
+    MAX_XATOLAR = 1000  # hisobotda saqlanadigan xatolar (qolganlari faqat sanaladi)
+
+    def __init__(self):
+        self.qatorlar = 0
+        self.qoshilgan = 0
+        self.xatolar_soni = 0
+        self.xatolar = []
+        self.davomiylik = 0.0
+
+    def xato(self, qator, xabar):
+        self.xatolar_soni += 1
+        if len(self.xatolar) < self.MAX_XATOLAR:
+            self.xatolar.append((qator, xabar))
+
+    @property
+    def tezlik(self):
+        return self.qatorlar / self.davomiylik if self.davomiylik else 0
+
+def _import_qatorini_tekshirish(row):
+    """CSV qatoridan (qiymatlar, None) yoki (None, xato xabari)"""
+    qiymatlar = {ustun: (row.get(ustun) or '').strip() for ustun in IMPORT_USTUNLARI}
+    qiymatlar['parol'] = row.get('parol') or ''  # parol bo'shliqlari o'zgartirilmaydi
+    bosh = [ustun for ustun in IMPORT_MAJBURIY if not qiymatlar[ustun]]
+    if bosh:
+        return None, f'majburiy maydon bo\'sh: {", ".join(bosh)}'
+    for ustun, uzunlik in IMPORT_UZUNLIKLARI.items():
+        if len(qiymatlar[ustun]) > uzunlik:
+            return None, f'{ustun} {uzunlik} belgidan uzun'
+    if '@' not in qiymatlar['email']:
+        return None, 'email noto\'g\'ri'
+    if qiymatlar['tug_sana']:
+        try:
+            qiymatlar['tug_sana'] = datetime.strptime(qiymatlar['tug_sana'], '%Y-%m-%d').date()
+        except ValueError:
+            return None, 'tug_sana YYYY-MM-DD formatida bo\'lishi kerak'
+    return qiymatlar, None
+
+def _mavjud_qiymatlar(ustun, qiymatlar):
+    """Bazada allaqachon bor qiymatlar (bitta IN so'rovi)"""
+    if not qiymatlar:
+        return set()
+    return set(db.session.scalars(db.select(ustun).where(ustun.in_(qiymatlar))))
+
+def talabalarni_import_qilish(fayl, jarayonlar=None, xesh_usuli=None, faqat_tekshirish=False):
+    """Matn oqimidagi CSV dan talabalarni qo'shish; ImportNatijasi qaytaradi"""
+    natija = ImportNatijasi()
+    boshlanish = perf_counter()
+    reader = csv.DictReader(fayl)
+    yetishmaydi = [ustun for ustun in IMPORT_MAJBURIY if ustun not in (reader.fieldnames or [])]
+    if yetishmaydi:
+        natija.xato(1, f'sarlavhada ustunlar yo\'q: {", ".join(yetishmaydi)}')
+        return natija
+
+    xeshlash = partial(generate_password_hash, method=xesh_usuli or app.config['PAROL_XESH_USULI'])
+    jarayonlar = jarayonlar or app.config['IMPORT_JARAYONLARI']
+    pool = multiprocessing.get_context('spawn').Pool(jarayonlar) if jarayonlar > 1 and not faqat_tekshirish else None
+    korilgan_username, korilgan_email = set(), set()
+    try:
+        for bolak in _boluklar(enumerate(reader, start=2), IMPORT_BOLAK):  # 1-qator - sarlavha
+            natija.qatorlar += len(bolak)
+            yaroqli = []
+            for qator, row in bolak:
+                qiymatlar, xabar = _import_qatorini_tekshirish(row)
+                if xabar is None and qiymatlar['username'] in korilgan_username:
+                    xabar = f'username faylda takrorlangan: {qiymatlar["username"]}'
+                elif xabar is None and qiymatlar['email'] in korilgan_email:
+                    xabar = f'email faylda takrorlangan: {qiymatlar["email"]}'
+                if xabar:
+                    natija.xato(qator, xabar)
+                    continue
+                korilgan_username.add(qiymatlar['username'])
+                korilgan_email.add(qiymatlar['email'])
+                yaroqli.append((qator, qiymatlar))
+
+            band_username = _mavjud_qiymatlar(User.username, [q['username'] for _, q in yaroqli])
+            band_email = _mavjud_qiymatlar(User.email, [q['email'] for _, q in yaroqli])
+            qoshiladi = []
+            for qator, qiymatlar in yaroqli:
+                if qiymatlar['username'] in band_username:
+                    natija.xato(qator, f'username band: {qiymatlar["username"]}')
+                elif qiymatlar['email'] in band_email:
+                    natija.xato(qator, f'email allaqachon ro\'yxatdan o\'tgan: {qiymatlar["email"]}')
+                else:
+                    qoshiladi.append((qator, qiymatlar))
+            if faqat_tekshirish:
+                natija.qoshilgan += len(qoshiladi)  # tekshiruv rejimida - qo'shilishi mumkin bo'lganlar
+                continue
+            if not qoshiladi:
+                continue
+
+            parollar = [qiymatlar['parol'] for _, qiymatlar in qoshiladi]
+            xeshlar = pool.map(xeshlash, parollar, chunksize=32) if pool else [xeshlash(p) for p in parollar]
+            hozir = datetime.utcnow()
+            try:
+                user_ids = db.session.scalars(
+                    db.insert(User).returning(User.id, sort_by_parameter_order=True),
+                    [{'username': q['username'], 'email': q['email'], 'password_hash': xesh, 'role': 'talaba',
+                      'created_at': hozir} for (_, q), xesh in zip(qoshiladi, xeshlar)]).all()
+                talaba_ids = db.session.scalars(
+                    db.insert(Talaba).returning(Talaba.id, sort_by_parameter_order=True), [
+                        {'user_id': user_id, 'ism': q['ism'], 'familiya': q['familiya'],
+                         'telefon': q['telefon'] or None, 'manzil': q['manzil'] or None, 'tug_sana': q['tug_sana'] or None}
+                        for user_id, (_, q) in zip(user_ids, qoshiladi)]).all()
+                qidiruv_indeksiga_yozish(db.session.connection(), Talaba, talaba_ids)
+                db.session.commit()
+            except IntegrityError:
+                # Tekshiruvdan keyin boshqa so'rov bir xil username/email qo'shgan - bo'lak yozilmaydi
+                db.session.rollback()
+                for qator, _ in qoshiladi:
+                    natija.xato(qator, 'bo\'lak yozilmadi: username yoki email parallel ravishda band qilindi')
+                continue
+            natija.qoshilgan += len(qoshiladi)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        natija.davomiylik = perf_counter() - boshlanish
+    return natija
+
+# ============= JSON API =============
+# /api/v1/... manbalari ro'yxat sahifalari bilan bir xil filtr, saralash va
+# keyset kursorini JSON sifatida beradi. ?fields= da so'ralgan maydonlar
+# uchungina ustunlar tanlanadi va faqat shu maydonlarga kerakli jadvallar
+# JOIN qilinadi; qatorlar ORM obyektlarisiz Row kortejlaridan to'g'ridan-
+# to'g'ri lug'atga aylanadi. orjson o'rnatilgan bo'lsa u ishlatiladi.
+# Javob ETag bilan qaytadi - o'zgarmagan sahifa uchun 304.
+
+API_VERSIYASI = 'v1'
+
+# maydonlar: {nom: (ustun, bog'lanish)}, boglanishlar: {bog'lanish: (model, shart, ota bog'lanish)}
+ApiManba = namedtuple('ApiManba', 'model maydonlar boglanishlar standart saralash default_sort '
+                                  'default_yonalish filtrlar rollar')
+
+def _api_maydonlari(model, *nomlar, boglanish=None):
+    return {(f'{boglanish}.{nom}' if boglanish else nom): (getattr(model, nom), boglanish) for nom in nomlar}
+
+BARCHA_ROLLAR = ('admin', 'mentor', 'talaba')
+
+API_MANBALARI = {
+    'talabalar': ApiManba(
+        Talaba,
+        {**_api_maydonlari(Talaba, 'id', 'ism', 'familiya', 'telefon', 'manzil', 'tug_sana', 'guruh_id', 'user_id'),
+         **_api_maydonlari(Guruh, 'nomi', 'holat', boglanish='guruh'),
+         **_api_maydonlari(User, 'username', 'email', boglanish='user')},
+        {'guruh': (Guruh, Guruh.id == Talaba.guruh_id, None), 'user': (User, User.id == Talaba.user_id, None)},
+        ('id', 'ism', 'familiya', 'telefon', 'guruh_id', 'guruh.nomi'),
+        TALABA_SARALASH, 'id', 'asc', TALABA_FILTRLARI, ('admin',)),
+    'mentorlar': ApiManba(
+        Mentor,
+        {**_api_maydonlari(Mentor, 'id', 'ism', 'familiya', 'telefon', 'mutaxassislik', 'tajriba_yili',
+                           'biografiya', 'user_id'),
+         **_api_maydonlari(User, 'username', 'email', boglanish='user')},
+        {'user': (User, User.id == Mentor.user_id, None)},
+        ('id', 'ism', 'familiya', 'mutaxassislik', 'tajriba_yili'),
+        {'id': Mentor.id, 'ism': Mentor.ism, 'familiya': Mentor.familiya}, 'id', 'asc',
+        {'mutaxassislik': Mentor.mutaxassislik}, ('admin',)),
+    'fanlar': ApiManba(
+        Fan,
+        _api_maydonlari(Fan, 'id', 'nomi', 'tavsif', 'davomiyligi', 'narxi'),
+        {},
+        ('id', 'nomi', 'davomiyligi', 'narxi'),
+        {'id': Fan.id, 'nomi': Fan.nomi}, 'id', 'asc', {}, BARCHA_ROLLAR),
+    'guruhlar': ApiManba(
+        Guruh,
+        {**_api_maydonlari(Guruh, 'id', 'nomi', 'fan_id', 'mentor_id', 'boshlanish_sana', 'tugash_sana',
+                           'max_talabalar', 'talabalar_soni', 'holat'),
+         **_api_maydonlari(Fan, 'nomi', 'narxi', boglanish='fan'),
+         **_api_maydonlari(Mentor, 'ism', 'familiya', boglanish='mentor')},
+        {'fan': (Fan, Fan.id == Guruh.fan_id, None), 'mentor': (Mentor, Mentor.id == Guruh.mentor_id, None)},
+        ('id', 'nomi', 'fan.nomi', 'mentor.ism', 'mentor.familiya', 'boshlanish_sana', 'talabalar_soni',
+         'max_talabalar', 'holat'),
+        GURUH_SARALASH, 'id', 'asc', GURUH_FILTRLARI, BARCHA_ROLLAR),
+    'arizalar': ApiManba(
+        GuruhAriza,
+        {**_api_maydonlari(GuruhAriza, 'id', 'talaba_id', 'guruh_id', 'holat', 'ariza_sana', 'javob_sana', 'izoh'),
+         **_api_maydonlari(Talaba, 'ism', 'familiya', 'telefon', boglanish='talaba'),
+         **_api_maydonlari(Guruh, 'nomi', boglanish='guruh'),
+         **_api_maydonlari(Fan, 'nomi', boglanish='fan')},
+        {'talaba': (Talaba, Talaba.id == GuruhAriza.talaba_id, None),
+         'guruh': (Guruh, Guruh.id == GuruhAriza.guruh_id, None),
+         'fan': (Fan, Fan.id == Guruh.fan_id, 'guruh')},
+        ('id', 'talaba_id', 'talaba.ism', 'talaba.familiya', 'guruh_id', 'guruh.nomi', 'holat', 'ariza_sana'),
+        ARIZA_SARALASH, 'ariza_sana', 'desc', ARIZA_FILTRLARI, ('admin',)),
+    'jadval': ApiManba(
+        DarsJadvali,
+        {**_api_maydonlari(DarsJadvali, 'id', 'guruh_id', 'kun', 'boshlanish_vaqti', 'tugash_vaqti', 'xona', 'holat'),
+         **_api_maydonlari(Guruh, 'nomi', boglanish='guruh')},
+        {'guruh': (Guruh, Guruh.id == DarsJadvali.guruh_id, None)},
+        ('id', 'guruh_id', 'kun', 'boshlanish_vaqti', 'tugash_vaqti', 'xona', 'holat'),
+        {'id': DarsJadvali.id}, 'id', 'asc',
+        {'guruh_id': DarsJadvali.guruh_id, 'kun': DarsJadvali.kun, 'xona': DarsJadvali.xona,
+         'holat': DarsJadvali.holat}, BARCHA_ROLLAR),
+    'vazifalar': ApiManba(  # fon vazifasi holatini kuzatish (polling)
+        Vazifa,
+        _api_maydonlari(Vazifa, 'id', 'turi', 'kalit', 'holat', 'urinishlar', 'max_urinishlar', 'jarayon',
+                        'natija', 'xato', 'yaratilgan_sana', 'keyingi_urinish', 'boshlangan_sana', 'tugagan_sana'),
+        {},
+        ('id', 'turi', 'holat', 'urinishlar', 'jarayon', 'natija', 'xato', 'yaratilgan_sana', 'tugagan_sana'),
+        VAZIFA_SARALASH, 'yaratilgan_sana', 'desc', VAZIFA_FILTRLARI, ('admin',)),
+}
+
+def api_maydon_nomlari(manba):
+    """?fields= dagi maydonlar (takrorlarsiz) yoki standart ro'yxat; noma'lum maydon uchun ValueError"""
+    fields = request.args.get('fields')
+    if not fields:
+        return list(manba.standart)
+    nomlar = list(dict.fromkeys(nom.strip() for nom in fields.split(',') if nom.strip()))
+    nomalum = [nom for nom in nomlar if nom not in manba.maydonlar]
+    if nomalum or not nomlar:
+        raise ValueError(f'Noma\'lum maydon: {", ".join(nomalum)}' if nomalum else 'Maydonlar ko\'rsatilmagan')
+    return nomlar
+
+def api_sorovi(manba, nomlar):
+    """Faqat so'ralgan ustunlar va ularga kerakli bog'lanishlar bilan SELECT"""
+    kerakli = set()
+    for nom in nomlar:
+        boglanish = manba.maydonlar[nom][1]
+        while boglanish is not None and boglanish not in kerakli:
+            kerakli.add(boglanish)
+            boglanish = manba.boglanishlar[boglanish][2]
+    query = db.select(*[manba.maydonlar[nom][0] for nom in nomlar]).select_from(manba.model)
+    for boglanish, (model, shart, _) in manba.boglanishlar.items():  # ota bog'lanish har doim oldinroq
+        if boglanish in kerakli:
+            query = query.outerjoin(model, shart)
+    return query
+
+def api_sahifasi(manba, nomlar):
+    """(qatorlar lug'atlari, keyingi kursor, limit) - request.args filtr/saralash/after bo'yicha"""
+    _, yonalish, columns = saralash_parametrlari(manba.model, manba.saralash, manba.default_sort,
+                                                 manba.default_yonalish)
+    limit = sahifa_limiti()
+    # Saralash ustunlari qator oxiriga qo'shiladi - kursor shulardan olinadi
+    query = royxat_filtrlari(api_sorovi(manba, nomlar), manba.filtrlar).add_columns(*columns)
+    rows = db.session.execute(kursordan_keyingi(query, columns, yonalish).limit(limit + 1)).all()
+    keyingi = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        keyingi = kursor_yaratish(list(rows[-1][-len(columns):]))
+    n = len(nomlar)
+    return [dict(zip(nomlar, row[:n])) for row in rows], keyingi, limit
+
+def _json_qiymat(qiymat):
+    if hasattr(qiymat, 'isoformat'):  # date, time, datetime
+        return qiymat.isoformat()
+    raise TypeError(f'{type(qiymat).__name__} JSON ga aylantirilmaydi')
+
+def json_baytlari(malumot):
+    if orjson is not None:
+        return orjson.dumps(malumot)
+    return json.dumps(malumot, ensure_ascii=False, separators=(',', ':'), default=_json_qiymat).encode()
+
+def api_javobi(malumot, status=200):
+    """JSON javob; muvaffaqiyatli javoblar tana xeshidan ETag oladi (If-None-Match bo'yicha 304)"""
+    javob = Response(json_baytlari(malumot), status=status, mimetype='application/json')
+    if status != 200:
+        return javob
+    javob.cache_control.private = True
+    return shartli_javob(javob, hashlib.sha1(javob.get_data()).hexdigest()[:20])
+
+def api_xato(xabar, status):
+    return api_javobi({'xato': xabar}, status)
+
+# ============= QIDIRUV =============
+# Talaba, mentor, guruh va fanlar bo'yicha to'liq matnli qidiruv SQLite FTS5
+# indeksida. Matn indeksga yozishdan oldin ham, qidiruv so'rovida ham bir xil
+# normallashtiriladi: kirill yozuvi lotinga o'giriladi, tutuq belgilari
+# (o', g', ъ) tashlanadi va telefon raqamlari faqat raqamlar (998 siz va
+# oxirgi 7 raqam variantlari bilan) saqlanadi. Shuning uchun "Шаҳзода",
+# "Shahzoda" va "shah" bir xil topiladi. Har bir so'z prefiks bo'yicha
+# qidiriladi, natijalar bm25 bo'yicha (ism/nom ustuni og'irroq) saralanadi.
+#
+# Indeks mapper hodisalari orqali o'sha tranzaksiyaning o'zida yangilanadi.
+# db.insert()/db.update() hodisalarni chaqirmaydi - indekslangan ustunlarni
+# shu yo'l bilan yozuvchi kod qidiruv_indeksiga_yozish() ni chaqiradi
+# (talabalar importi, seed-data), yoki `flask qidiruv-indeksi` qayta quradi.
+
+QIDIRUV_JADVALI = 'qidiruv'
+QIDIRUV_LIMITI = 50
+QIDIRUV_BOLAK = 5000
+
+# model -> (tur, rowid kodi, asosiy ustunlar, qo'shimcha ustunlar); rowid = obyekt id * 8 + kod
+QIDIRUV_MODELLARI = {
+    Talaba: ('talaba', 1, ('ism', 'familiya'), ('telefon',)),
+    Mentor: ('mentor', 2, ('ism', 'familiya'), ('mutaxassislik',)),
+    Guruh: ('guruh', 3, ('nomi',), ()),
+    Fan: ('fan', 4, ('nomi',), ('tavsif',)),
+}
+QIDIRUV_TURLARI = {tur: model for model, (tur, *_) in QIDIRUV_MODELLARI.items()}
+
+KIRILL_LOTIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'ғ': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'қ': 'q', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'ў': 'o', 'п': 'p',
+    'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ҳ': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh',
+    'щ': 'sh', 'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+# Lotin yozuvidagi tutuq belgisining turli ko'rinishlari (o', g', ta'lim)
+_TUTUQ_BELGILARI = str.maketrans('', '', "'`\u2018\u2019\u02bb\u02bc")
+
+def lotinlashtirish(matn):
+    """Qidiruv uchun normal shakl: kichik harf, lotin yozuvi, tutuq belgilarisiz"""
+    matn = (matn or '').lower()
+    return ''.join(KIRILL_LOTIN.get(belgi, belgi) for belgi in matn).translate(_TUTUQ_BELGILARI)
+
+def _telefon_variantlari(telefon):
+    raqamlar = re.sub(r'\D', '', telefon or '')
+    if not raqamlar:
+        return ''
+    variantlar = [raqamlar]
+    if raqamlar.startswith('998') and len(raqamlar) > 9:
+        variantlar.append(raqamlar[3:])
+    if len(raqamlar) > 7:
+        variantlar.append(raqamlar[-7:])
+    return ' '.join(variantlar)
+
+def _qidiruv_ustunlari(ustunlar, qiymatlar):
+    return ' '.join(_telefon_variantlari(qiymat) if ustun == 'telefon' else lotinlashtirish(qiymat)
+                    for ustun, qiymat in zip(ustunlar, qiymatlar) if qiymat)
+
+def _qidiruv_qatori(model, obyekt_id, qiymatlar):
+    """FTS qatori: {'rowid', 'asosiy', 'qoshimcha'}; qiymatlar asosiy+qo'shimcha ustunlar tartibida"""
+    _, kod, asosiy, qoshimcha = QIDIRUV_MODELLARI[model]
+    return {'rowid': obyekt_id * 8 + kod,
+            'asosiy': _qidiruv_ustunlari(asosiy, qiymatlar[:len(asosiy)]),
+            'qoshimcha': _qidiruv_ustunlari(qoshimcha, qiymatlar[len(asosiy):])}
+
+_qidiruv_jadvallari = {}  # engine url -> FTS jadvali mavjudmi
+
+def qidiruv_yoqilganmi(connection):
+    """Bazada FTS5 qidiruv jadvali bormi (SQLite bo'lmasa yoki migratsiya qilinmagan bo'lsa - yo'q)"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    kalit = str(connection.engine.url)
+    # Yo'qligi ham keshlanadi: aks holda har bir Talaba/Mentor/Guruh/Fan yozuvida sqlite_master so'raladi.
+    # Jadval qidiruv_jadvalini_yaratish() da kalitni yangilaydi; boshqa jarayon `flask migrate-db`
+    # bilan yaratgan bo'lsa, ishlayotgan jarayon qayta ishga tushirilganda ko'radi.
+    if kalit not in _qidiruv_jadvallari:
+        _qidiruv_jadvallari[kalit] = connection.execute(
+            db.text("SELECT 1 FROM sqlite_master WHERE name = :nomi"), {'nomi': QIDIRUV_JADVALI}).first() is not None
+    return _qidiruv_jadvallari[kalit]
+
+def qidiruv_jadvalini_yaratish(connection):
+    """FTS5 jadvalini yaratish; yangi yaratilgan bo'lsa True (FTS5 yo'q SQLite da False)"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    _qidiruv_jadvallari.pop(str(connection.engine.url), None)  # keshdagi "yo'q" emas, bazaning o'zi
+    if qidiruv_yoqilganmi(connection):
+        return False
+    try:
+        connection.execute(db.text(
+            f"CREATE VIRTUAL TABLE {QIDIRUV_JADVALI} USING fts5(asosiy, qoshimcha, "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+    except OperationalError:  # SQLite FTS5 siz yig'ilgan
+        return False
+    _qidiruv_jadvallari[str(connection.engine.url)] = True
+    return True
+
+def _qidiruv_manba_sorovi(model):
+    _, _, asosiy, qoshimcha = QIDIRUV_MODELLARI[model]
+    return db.select(model.id, *[getattr(model, ustun) for ustun in asosiy + qoshimcha])
+
+def qidiruv_indeksiga_yozish(connection, model, ids):
+    """Berilgan obyektlarning indeks qatorlarini bazadagi qiymatlardan qayta yozish"""
+    if not ids or not qidiruv_yoqilganmi(connection):
+        return
+    kod = QIDIRUV_MODELLARI[model][1]
+    for i in range(0, len(ids), SQL_BOLAK):
+        bolak = list(ids[i:i + SQL_BOLAK])
+        connection.execute(db.text(f'DELETE FROM {QIDIRUV_JADVALI} WHERE rowid = :rowid'),
+                           [{'rowid': obyekt_id * 8 + kod} for obyekt_id in bolak])
+        rows = connection.execute(_qidiruv_manba_sorovi(model).where(model.id.in_(bolak))).all()
+        if rows:
+            connection.execute(db.text(f'INSERT INTO {QIDIRUV_JADVALI} (rowid, asosiy, qoshimcha) '
+                                       f'VALUES (:rowid, :asosiy, :qoshimcha)'),
+                               [_qidiruv_qatori(model, row[0], row[1:]) for row in rows])
+
+def qidiruv_indeksini_qurish(connection):
+    """Indeksni butunlay qayta qurish; indekslangan obyektlar sonini qaytaradi"""
+    if not qidiruv_yoqilganmi(connection):
+        return 0
+    connection.execute(db.text(f'DELETE FROM {QIDIRUV_JADVALI}'))
+    jami = 0
+    for model in QIDIRUV_MODELLARI:
+        oxirgi_id = 0
+        while True:
+            rows = connection.execute(_qidiruv_manba_sorovi(model).where(model.id > oxirgi_id)
+                                      .order_by(model.id).limit(QIDIRUV_BOLAK)).all()
+            if not rows:
+                break
+            connection.execute(db.text(f'INSERT INTO {QIDIRUV_JADVALI} (rowid, asosiy, qoshimcha) '
+                                       f'VALUES (:rowid, :asosiy, :qoshimcha)'),
+                               [_qidiruv_qatori(model, row[0], row[1:]) for row in rows])
+            jami += len(rows)
+            oxirgi_id = rows[-1][0]
+    connection.execute(db.text(f"INSERT INTO {QIDIRUV_JADVALI} ({QIDIRUV_JADVALI}) VALUES ('optimize')"))
+    return jami
+
+def qidiruv_ifodasi(matn):
+    """Foydalanuvchi matnidan FTS5 MATCH ifodasi (har so'z prefiks, hammasi AND) yoki None"""
+    if re.fullmatch(r'[\d\s+()-]+', matn or ''):
+        sozlar = [re.sub(r'\D', '', matn)]  # telefon raqami bo'laklarga bo'linmaydi
+    else:
+        sozlar = [soz for soz in re.findall(r'\w+', lotinlashtirish(matn)) if len(soz) >= 2]
+    sozlar = [soz for soz in sozlar if soz]
+    return ' '.join(f'"{soz}"*' for soz in sozlar) or None
+
+def _oddiy_qidiruv(matn, turlar, limit):
+    """FTS5 bo'lmagan bazalar uchun: indekslangan ustunlar bo'yicha LIKE (transliteratsiyasiz)"""
+    natijalar = []
+    for tur in turlar:
+        model = QIDIRUV_TURLARI[tur]
+        _, _, asosiy, qoshimcha = QIDIRUV_MODELLARI[model]
+        shart = db.or_(*[getattr(model, ustun).ilike(f'%{matn}%') for ustun in asosiy + qoshimcha])
+        natijalar.extend((tur, obyekt_id) for obyekt_id in
+                         db.session.scalars(db.select(model.id).where(shart).order_by(model.id).limit(limit)))
+    return natijalar[:limit]
+
+QIDIRUV_OPTIONS = {
+    Talaba: (joinedload(Talaba.guruh),),
+    Mentor: (),
+    Guruh: (joinedload(Guruh.fan), joinedload(Guruh.mentor)),
+    Fan: (),
+}
+
+def qidirish(matn, turlar=None, limit=QIDIRUV_LIMITI):
+    """[(tur, obyekt), ...] - moslik darajasi bo'yicha; turlar: QIDIRUV_TURLARI kalitlari"""
+    turlar = [tur for tur in (turlar or QIDIRUV_TURLARI) if tur in QIDIRUV_TURLARI]
+    ifoda = qidiruv_ifodasi(matn)
+    if ifoda is None or not turlar:
+        return []
+    if qidiruv_yoqilganmi(db.session.connection()):
+        kodlar = {QIDIRUV_MODELLARI[QIDIRUV_TURLARI[tur]][1]: tur for tur in turlar}
+        sql = f'SELECT rowid FROM {QIDIRUV_JADVALI} WHERE {QIDIRUV_JADVALI} MATCH :ifoda'
+        if len(kodlar) < len(QIDIRUV_MODELLARI):
+            sql += f' AND rowid % 8 IN ({", ".join(str(kod) for kod in kodlar)})'
+        sql += f' ORDER BY bm25({QIDIRUV_JADVALI}, 10.0, 1.0) LIMIT :limit'
+        topilgan = [(kodlar[rowid % 8], rowid // 8) for rowid in
+                    db.session.scalars(db.text(sql), {'ifoda': ifoda, 'limit': limit})]
+    else:
+        topilgan = _oddiy_qidiruv(matn.strip(), turlar, limit)
+    # Har bir tur uchun bitta IN so'rovi; indeksda qolib ketgan o'chirilgan obyektlar tashlanadi
+    obyektlar = {}
+    for tur in set(tur for tur, _ in topilgan):
+        model = QIDIRUV_TURLARI[tur]
+        ids = [obyekt_id for t, obyekt_id in topilgan if t == tur]
+        obyektlar.update(((tur, obyekt.id), obyekt) for obyekt in
+                         model.query.options(*QIDIRUV_OPTIONS[model]).filter(model.id.in_(ids)))
+    return [(tur, obyektlar[(tur, obyekt_id)]) for tur, obyekt_id in topilgan if (tur, obyekt_id) in obyektlar]
+
+def _qidiruv_qatorini_yozish(mapper, connection, target):
+    model = mapper.class_
+    _, _, asosiy, qoshimcha = QIDIRUV_MODELLARI[model]
+    if not qidiruv_yoqilganmi(connection):
+        return
+    qator = _qidiruv_qatori(model, target.id, [getattr(target, ustun) for ustun in asosiy + qoshimcha])
+    connection.execute(db.text(f'DELETE FROM {QIDIRUV_JADVALI} WHERE rowid = :rowid'), {'rowid': qator['rowid']})
+    connection.execute(db.text(f'INSERT INTO {QIDIRUV_JADVALI} (rowid, asosiy, qoshimcha) '
+                               f'VALUES (:rowid, :asosiy, :qoshimcha)'), qator)
+
+def _qidiruv_qatori_ozgardi(mapper, connection, target):
+    _, _, asosiy, qoshimcha = QIDIRUV_MODELLARI[mapper.class_]
+    holat = db.inspect(target)
+    if any(holat.attrs[ustun].history.has_changes() for ustun in asosiy + qoshimcha):  # faqat guruh_id emas
+        _qidiruv_qatorini_yozish(mapper, connection, target)
+
+def _qidiruv_qatorini_ochirish(mapper, connection, target):
+    if qidiruv_yoqilganmi(connection):
+        connection.execute(db.text(f'DELETE FROM {QIDIRUV_JADVALI} WHERE rowid = :rowid'),
+                           {'rowid': target.id * 8 + QIDIRUV_MODELLARI[mapper.class_][1]})
+
+for _model in QIDIRUV_MODELLARI:
+    event.listen(_model, 'after_insert', _qidiruv_qatorini_yozish)
+    event.listen(_model, 'after_update', _qidiruv_qatori_ozgardi)
+    event.listen(_model, 'after_delete', _qidiruv_qatorini_ochirish)
+
+# ============= FON VAZIFALARI =============
+# Og'ir yozuvlar (guruh, talaba, mentorni bog'liq qatorlari bilan o'chirish)
+# so'rov oqimida emas, Vazifa jadvalidagi navbat orqali fon ishchilarida
+# bajariladi: admin so'rovi vazifani yozib darhol qaytadi. Ishchi vazifani
+# shartli UPDATE bilan egallaydi (bir nechta jarayon/oqim xavfsiz) va
+# qatorlarni VAZIFA_BOLAK tadan alohida tranzaksiyalarda yozadi, shuning
+# uchun SQLite yozish qulfi bir necha millisekunddan uzoq ushlanmaydi.
+# Xato bo'lsa vazifa kechikish bilan qayta urinadi; qulf muddati tugagan
+# (ishchi to'xtab qolgan) vazifani boshqa ishchi oladi. Shu sababli vazifa
+# funksiyalari takroriy bajarishga chidamli yoziladi. Bir xil kalitli faol
+# vazifa qayta qo'shilmaydi - mavjudi qaytariladi.
+#
+# Ishchilar: VAZIFA_ISHCHILARI ta oqim veb jarayonning o'zida (vazifa commit
+# qilinganda ishga tushadi) yoki alohida `flask vazifa-ishchisi` jarayoni.
+
+VAZIFA_TURLARI = {}  # turi -> funksiya(jarayon, **parametrlar)
+VAZIFA_NOMZODLARI = 5  # egallash uchun bir vaqtda olinadigan navbatdagi vazifalar
+
+class VazifaXatosi(Exception):
+    """Qayta urinishdan foyda yo'q: vazifa darhol 'xato' holatiga o'tadi"""
+
+def vazifa_turi(nomi):
+    def decorator(f):
+        VAZIFA_TURLARI[nomi] = f
+        return f
+    return decorator
+
+def vazifa_qoshish(turi, kalit=None, max_urinishlar=None, **parametrlar):
+    """Vazifani joriy tranzaksiyaga qo'shish; commit chaqiruvchi tomonidan qilinadi.
+
+    Shu kalitli faol (kutilayotgan yoki bajarilayotgan) vazifa bo'lsa yangisi
+    yaratilmaydi - mavjudi qaytariladi.
+    """
+    if kalit is not None:
+        yozish_qulfini_olish()  # tekshirish va qo'shish orasida boshqa so'rov kira olmaydi
+        mavjud = Vazifa.query.filter(Vazifa.kalit == kalit, Vazifa.holat.in_(VAZIFA_FAOL_HOLATLAR)).first()
+        if mavjud is not None:
+            return mavjud
+    vazifa = Vazifa(turi=turi, kalit=kalit, parametrlar=json.dumps(parametrlar),
+                    max_urinishlar=max_urinishlar or app.config['VAZIFA_URINISHLAR'])
+    db.session.add(vazifa)
+    db.session.flush()
+    return vazifa
+
+def vazifani_qayta_qoshish(vazifa):
+    """'xato' holatidagi vazifani boshidan navbatga qo'yish (shu kalitli faol vazifa bo'lsa - o'sha)"""
+    if vazifa.holat != 'xato':
+        return vazifa
+    if vazifa.kalit is not None:
+        yozish_qulfini_olish()
+        mavjud = Vazifa.query.filter(Vazifa.kalit == vazifa.kalit, Vazifa.holat.in_(VAZIFA_FAOL_HOLATLAR)).first()
+        if mavjud is not None:
+            return mavjud
+    vazifa.holat = 'kutilmoqda'
+    vazifa.urinishlar = 0
+    vazifa.xato = None
+    vazifa.ishchi = None
+    vazifa.keyingi_urinish = datetime.utcnow()
+    db.session.info['vazifa_qoshildi'] = True
+    return vazifa
+
+class VazifaJarayoni:
+    """Bajarilayotgan vazifa: bolaklarni commit qilish, jarayonni yozish va qulfni uzaytirish"""
+
+    def __init__(self, vazifa_id, ishchi):
+        self.vazifa_id = vazifa_id
+        self.ishchi = ishchi
+        self.bolaklar = 0
+        self.eng_uzun_bolak = 0.0  # soniya - yozish tranzaksiyasining eng uzun davomiyligi
+        self._bolak_boshlanishi = perf_counter()
+
+    def bolak_tugadi(self, soni):
+        """Joriy bolak tranzaksiyasini vazifa jarayoni bilan birga commit qilish"""
+        result = db.session.execute(
+            db.update(Vazifa)
+            .where(Vazifa.id == self.vazifa_id, Vazifa.holat == 'bajarilmoqda', Vazifa.ishchi == self.ishchi)
+            .values(jarayon=Vazifa.jarayon + soni,
+                    qulf_muddati=datetime.utcnow() + timedelta(seconds=app.config['VAZIFA_QULF_MUDDATI']))
+            .execution_options(synchronize_session=False))
+        if result.rowcount != 1:
+            db.session.rollback()
+            raise VazifaXatosi('Vazifa boshqa ishchiga o\'tdi')
+        db.session.commit()
+        self.bolaklar += 1
+        self.eng_uzun_bolak = max(self.eng_uzun_bolak, perf_counter() - self._bolak_boshlanishi)
+        self._bolak_boshlanishi = perf_counter()
+
+    def bolaklab_ochirish(self, model, *shartlar):
+        """Shartga mos qatorlarni VAZIFA_BOLAK tadan alohida tranzaksiyalarda o'chirish; jami sonini qaytaradi"""
+        jami = 0
+        while True:
+            ids = db.select(model.id).where(*shartlar).limit(app.config['VAZIFA_BOLAK'])
+            soni = db.session.execute(db.delete(model).where(model.id.in_(ids))
+                                      .execution_options(synchronize_session=False)).rowcount
+            if not soni:
+                return jami
+            self.bolak_tugadi(soni)
+            jami += soni
+
+    def bolaklab_yangilash(self, model, shartlar, **values):
+        """bolaklab_ochirish kabi UPDATE; values qatorni shartlardan chiqarishi kerak"""
+        jami = 0
+        while True:
+            ids = db.select(model.id).where(*shartlar).limit(app.config['VAZIFA_BOLAK'])
+            soni = db.session.execute(db.update(model).where(model.id.in_(ids)).values(**values)
+                                      .execution_options(synchronize_session=False)).rowcount
+            if not soni:
+                return jami
+            self.bolak_tugadi(soni)
+            jami += soni
+
+def vazifani_olish(ishchi):
+    """Navbatdagi vazifani shartli UPDATE bilan egallash (commit qilinadi); navbat bo'sh bo'lsa None"""
+    hozir = datetime.utcnow()
+    tayyor = (Vazifa.holat == 'kutilmoqda', Vazifa.keyingi_urinish <= hozir)
+    nomzodlar = db.session.scalars(
+        db.select(Vazifa.id).where(*tayyor).order_by(Vazifa.keyingi_urinish, Vazifa.id).limit(VAZIFA_NOMZODLARI)).all()
+    for vazifa_id in nomzodlar:
+        egallandi = db.session.execute(
+            db.update(Vazifa).where(Vazifa.id == vazifa_id, *tayyor)
+            .values(holat='bajarilmoqda', ishchi=ishchi, urinishlar=Vazifa.urinishlar + 1, boshlangan_sana=hozir,
+                    qulf_muddati=hozir + timedelta(seconds=app.config['VAZIFA_QULF_MUDDATI']))
+            .execution_options(synchronize_session=False)).rowcount == 1
+        if egallandi:
+            db.session.commit()
+            return db.session.get(Vazifa, vazifa_id)
+    db.session.rollback()
+    return None
+
+def eskirgan_vazifalarni_qaytarish():
+    """Qulf muddati tugagan (ishchi to'xtab qolgan) vazifalarni navbatga qaytarish yoki yopish"""
+    hozir = datetime.utcnow()
+    eskirgan = (Vazifa.holat == 'bajarilmoqda', Vazifa.qulf_muddati < hozir)
+    if db.session.scalar(db.select(Vazifa.id).where(*eskirgan).limit(1)) is None:
+        db.session.rollback()  # bo'sh ishchi har safar yozish qulfini olmasligi uchun
+        return 0
+    qaytarildi = db.session.execute(
+        db.update(Vazifa).where(*eskirgan, Vazifa.urinishlar < Vazifa.max_urinishlar)
+        .values(holat='kutilmoqda', ishchi=None, keyingi_urinish=hozir)
+        .execution_options(synchronize_session=False)).rowcount
+    db.session.execute(
+        db.update(Vazifa).where(*eskirgan)
+        .values(holat='xato', xato='Ishchi vazifani qulf muddatida yakunlamadi', tugagan_sana=hozir)
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+    return qaytarildi
+
+def _vazifani_yakunlash(vazifa_id, egasi, **values):
+    # Qulf boshqa ishchiga o'tgan bo'lsa uning natijasi ustidan yozilmaydi
+    db.session.execute(
+        db.update(Vazifa)
+        .where(Vazifa.id == vazifa_id, Vazifa.holat == 'bajarilmoqda', Vazifa.ishchi == egasi)
+        .values(qulf_muddati=None, **values)
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+
+def vazifani_bajarish(ishchi):
+    """Navbatdagi bitta vazifani bajarish. Navbat bo'sh bo'lsa None, aks holda VazifaJarayoni."""
+    vazifa = vazifani_olish(ishchi)
+    if vazifa is None:
+        return None
+    vazifa_id, turi, urinishlar, max_urinishlar = vazifa.id, vazifa.turi, vazifa.urinishlar, vazifa.max_urinishlar
+    jarayon = VazifaJarayoni(vazifa_id, ishchi)
+    try:
+        if turi not in VAZIFA_TURLARI:
+            raise VazifaXatosi(f'Noma\'lum vazifa turi: {turi}')
+        natija = VAZIFA_TURLARI[turi](jarayon, **json.loads(vazifa.parametrlar))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning('Vazifa #%d (%s) %d-urinishda xato: %r', vazifa_id, turi, urinishlar, e)
+        if isinstance(e, VazifaXatosi) or urinishlar >= max_urinishlar:
+            _vazifani_yakunlash(vazifa_id, ishchi, holat='xato', xato=str(e) or repr(e),
+                                tugagan_sana=datetime.utcnow())
+        else:
+            kechikish = app.config['VAZIFA_KECHIKISH'] * 2 ** (urinishlar - 1)
+            _vazifani_yakunlash(vazifa_id, ishchi, holat='kutilmoqda', ishchi=None, xato=str(e) or repr(e),
+                                keyingi_urinish=datetime.utcnow() + timedelta(seconds=kechikish))
+    else:
+        _vazifani_yakunlash(vazifa_id, ishchi, holat='bajarildi', xato=None, tugagan_sana=datetime.utcnow(),
+                            natija=json.dumps(natija) if natija is not None else None)
+    return jarayon
+
+class VazifaIshchilari:
+    """Navbatdan vazifalarni oluvchi ishchi oqimlar hovuzi"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._oqimlar = []
+        self._uygotish = threading.Event()
+        self._toxtash = threading.Event()
+
+    def ishga_tushirish(self, soni=None):
+        """Ishchilar hali ishlamayotgan bo'lsa soni (standart: VAZIFA_ISHCHILARI) ta oqimni boshlash"""
+        soni = app.config['VAZIFA_ISHCHILARI'] if soni is None else soni
+        with self._lock:
+            if self._oqimlar or soni <= 0:
+                return
+            for i in range(soni):
+                oqim = threading.Thread(target=self._ishlash, name=f'vazifa-ishchi-{i + 1}', daemon=True)
+                self._oqimlar.append(oqim)
+                oqim.start()
+
+    def uygotish(self):
+        self._uygotish.set()
+
+    def toxtatish(self):
+        self._toxtash.set()
+        self._uygotish.set()
+        for oqim in self._oqimlar:
+            oqim.join()
+
+    def _ishlash(self):
+        ishchi = f'{os.getpid()}:{threading.current_thread().name}'
+        with app.app_context():
+            while not self._toxtash.is_set():
+                try:
+                    bajarildi = vazifani_bajarish(ishchi) is not None
+                    if not bajarildi:
+                        eskirgan_vazifalarni_qaytarish()
+                except Exception:  # baza band yoki vaqtincha mavjud emas - oqim to'xtamaydi
+                    db.session.rollback()
+                    app.logger.exception('Vazifa ishchisi %s', ishchi)
+                    bajarildi = False
+                finally:
+                    db.session.remove()
+                if not bajarildi:
+                    self._uygotish.wait(app.config['VAZIFA_SOROV_ORALIGI'])
+                    self._uygotish.clear()
+
+vazifa_ishchilari = VazifaIshchilari()
+
+@event.listens_for(Vazifa, 'after_insert')
+def _vazifa_qoshildi(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['vazifa_qoshildi'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _vazifa_ishchilarini_uygotish(session):
+    if session.info.pop('vazifa_qoshildi', False):
+        vazifa_ishchilari.ishga_tushirish()
+        vazifa_ishchilari.uygotish()
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _vazifa_belgisini_tashlash(session, previous_transaction):
+    session.info.pop('vazifa_qoshildi', None)
+
+@vazifa_turi('guruh_ochirish')
+def _guruhni_ochirish(jarayon, guruh_id):
+    if db.session.get(Guruh, guruh_id) is None:
+        return {'ochirildi': False}
+    natija = {'darslar': jarayon.bolaklab_ochirish(DarsJadvali, DarsJadvali.guruh_id == guruh_id),
+              'arizalar': jarayon.bolaklab_ochirish(GuruhAriza, GuruhAriza.guruh_id == guruh_id),
+              'talabalar': jarayon.bolaklab_yangilash(Talaba, (Talaba.guruh_id == guruh_id,), guruh_id=None)}
+    # Bolaklar orasida qo'shilgan arizalar oxirgi tranzaksiyada o'chiriladi (guruh_id NOT NULL)
+    GuruhAriza.query.filter_by(guruh_id=guruh_id).delete(synchronize_session=False)
+    db.session.delete(db.session.get(Guruh, guruh_id))
+    jarayon.bolak_tugadi(1)
+    return {'ochirildi': True, **natija}
+
+@vazifa_turi('talaba_ochirish')
+def _talabani_ochirish(jarayon, talaba_id):
+    if db.session.get(Talaba, talaba_id) is None:
+        return {'ochirildi': False}
+    arizalar = jarayon.bolaklab_ochirish(GuruhAriza, GuruhAriza.talaba_id == talaba_id)
+    talaba = db.session.get(Talaba, talaba_id)
+    jarayon.bolaklab_ochirish(Xabarnoma, Xabarnoma.user_id == talaba.user_id)
+    jarayon.bolaklab_ochirish(ChiquvchiXabar, ChiquvchiXabar.user_id == talaba.user_id)
+    talaba = db.session.get(Talaba, talaba_id)
+    if talaba.guruh_id:
+        joy_bosatish(talaba.guruh_id)  # bo'shagan joy navbatdagi talabaga o'tadi
+    GuruhAriza.query.filter_by(talaba_id=talaba_id).delete(synchronize_session=False)
+    user = db.session.get(User, talaba.user_id)
+    db.session.delete(talaba)
+    if user is not None:
+        db.session.delete(user)
+    jarayon.bolak_tugadi(1)
+    return {'ochirildi': True, 'arizalar': arizalar}
+
+@vazifa_turi('mentor_ochirish')
+def _mentorni_ochirish(jarayon, mentor_id):
+    if db.session.get(Mentor, mentor_id) is None:
+        return {'ochirildi': False}
+    guruhlar = 0
+    while True:
+        ids = db.session.scalars(db.select(Guruh.id).where(Guruh.mentor_id == mentor_id)
+                                 .limit(app.config['VAZIFA_BOLAK'])).all()
+        if not ids:
+            break
+        # Haftalik jadval ko'rinishlari mentor ismini o'z ichiga oladi
+        db.session.execute(db.update(DarsJadvali).where(DarsJadvali.guruh_id.in_(ids))
+                           .values(yangilangan_sana=datetime.utcnow()).execution_options(synchronize_session=False))
+        db.session.execute(db.update(Guruh).where(Guruh.id.in_(ids)).values(mentor_id=None, versiya=Guruh.versiya + 1)
+                           .execution_options(synchronize_session=False))
+        jarayon.bolak_tugadi(len(ids))
+        guruhlar += len(ids)
+    mentor = db.session.get(Mentor, mentor_id)
+    jarayon.bolaklab_ochirish(Xabarnoma, Xabarnoma.user_id == mentor.user_id)
+    jarayon.bolaklab_ochirish(ChiquvchiXabar, ChiquvchiXabar.user_id == mentor.user_id)
+    mentor = db.session.get(Mentor, mentor_id)
+    user = db.session.get(User, mentor.user_id)
+    db.session.delete(mentor)
+    if user is not None:
+        db.session.delete(user)
+    jarayon.bolak_tugadi(1)
+    return {'ochirildi': True, 'guruhlar': guruhlar}
+
+# ============= XABARNOMALAR =============
+# Ariza qarorlari va dars jadvali o'zgarishlari haqidagi xabarlar holat
+# o'zgargan tranzaksiyaning o'zida ChiquvchiXabar (outbox) qatorlari sifatida
+# yoziladi - yoqilgan har bir kanal (XABAR_KANALLARI) uchun bittadan. Guruh
+# bo'yicha xabar INSERT ... SELECT bilan yoziladi, shuning uchun 2000 talabali
+# guruh uchun ham so'rov millisekundlarda tugaydi. Yetkazishni alohida oqimdagi
+# asyncio dispetcheri bajaradi: navbatdan partiyani qulf muddati bilan
+# egallaydi, kanal bo'yicha bo'laklarga ajratib parallel yuboradi (har bir
+# kanal uchun semafor bilan cheklangan) va natijalarni bitta tranzaksiyada
+# yozadi. Yetkazilmagan xabar kechikish bilan qayta urinadi; dispetcher
+# to'xtab qolsa qulf muddati tugagach boshqasi oladi (kamida bir marta
+# yetkazish). Kanallar xabar_kanali() bilan ro'yxatga olinadi.
+
+XABAR_KANAL_TURLARI = {}  # nomi -> kanal obyekti
+
+def xabar_kanali(nomi):
+    def decorator(cls):
+        XABAR_KANAL_TURLARI[nomi] = cls()
+        return cls
+    return decorator
+
+def xabar_havolasi(endpoint, **values):
+    """Xabar uchun nisbiy havola; so'rovdan tashqarida ham (navbat, fon vazifasi, CLI)"""
+    if has_request_context():
+        return url_for(endpoint, **values)
+    with app.test_request_context():
+        return url_for(endpoint, **values)
+
+def xabarlarni_yozish(qatorlar):
+    """[{user_id, hodisa, sarlavha, matn, havola}] - har bir yoqilgan kanal uchun outbox qatori joriy tranzaksiyada"""
+    hozir = datetime.utcnow()
+    rows = [{**qator, 'kanal': kanal, 'keyingi_urinish': hozir, 'yaratilgan_sana': hozir}
+            for kanal in app.config['XABAR_KANALLARI'] for qator in qatorlar]
+    if rows:
+        db.session.execute(db.insert(ChiquvchiXabar), rows)
+        db.session.info['xabar_qoshildi'] = True
+
+def guruhga_xabar(guruh_id, hodisa, sarlavha, matn, havola=None):
+    """Guruh talabalari va mentoriga xabar: INSERT ... SELECT, qabul qiluvchilar Pythonga o'qilmaydi"""
+    oluvchilar = db.union(
+        db.select(Talaba.user_id.label('user_id')).where(Talaba.guruh_id == guruh_id),
+        db.select(Mentor.user_id).join(Guruh, Guruh.mentor_id == Mentor.id).where(Guruh.id == guruh_id),
+    ).subquery()
+    hozir = datetime.utcnow()
+    ustunlar = ('user_id', 'kanal', 'hodisa', 'sarlavha', 'matn', 'havola', 'holat', 'urinishlar',
+                'keyingi_urinish', 'yaratilgan_sana')
+    soni = 0
+    for kanal in app.config['XABAR_KANALLARI']:
+        soni += db.session.execute(db.insert(ChiquvchiXabar).from_select(ustunlar, db.select(
+            oluvchilar.c.user_id, db.literal(kanal), db.literal(hodisa), db.literal(sarlavha), db.literal(matn),
+            db.literal(havola, db.String), db.literal('kutilmoqda'), db.literal(0),
+            db.literal(hozir, db.DateTime), db.literal(hozir, db.DateTime)))).rowcount
+    if soni:
+        db.session.info['xabar_qoshildi'] = True
+    return soni
+
+def ariza_xabarlari(ariza_ids):
+    """Ko'rib chiqilgan arizalar talabalariga qaror haqida xabar (joriy tranzaksiyadagi holat bo'yicha)"""
+    havola = xabar_havolasi('talaba_dashboard')
+    qatorlar = []
+    for i in range(0, len(ariza_ids), SQL_BOLAK):
+        for row in db.session.execute(
+                db.select(GuruhAriza.holat, GuruhAriza.izoh, Talaba.user_id, Guruh.nomi)
+                .join(Talaba, Talaba.id == GuruhAriza.talaba_id)
+                .join(Guruh, Guruh.id == GuruhAriza.guruh_id)
+                .where(GuruhAriza.id.in_(ariza_ids[i:i + SQL_BOLAK]))):
+            if row.holat == 'qabul_qilindi':
+                qatorlar.append({'user_id': row.user_id, 'hodisa': 'ariza_qabul', 'havola': havola,
+                                 'sarlavha': 'Arizangiz qabul qilindi',
+                                 'matn': f'Siz {row.nomi} guruhiga qabul qilindingiz.'})
+            elif row.holat == 'qabul_qilinmadi':
+                qatorlar.append({'user_id': row.user_id, 'hodisa': 'ariza_rad', 'havola': havola,
+                                 'sarlavha': 'Arizangiz qabul qilinmadi',
+                                 'matn': f'{row.nomi} guruhiga arizangiz qabul qilinmadi. Sabab: {row.izoh}'})
+    xabarlarni_yozish(qatorlar)
+
+def jadval_xabari(jadval, hodisa):
+    """Dars bekor qilindi / tiklandi - guruhning barcha talabalari va mentoriga"""
+    sarlavha = 'Dars bekor qilindi' if hodisa == 'dars_bekor' else 'Dars qayta tiklandi'
+    vaqt = f'{jadval.boshlanish_vaqti.strftime("%H:%M")}-{jadval.tugash_vaqti.strftime("%H:%M")}'
+    matn = f'{jadval.guruh.nomi}: {jadval.kun} {vaqt}' + (f', {jadval.xona} xona' if jadval.xona else '')
+    return guruhga_xabar(jadval.guruh_id, hodisa, sarlavha, matn,
+                         xabar_havolasi('dars_jadvali', guruh_id=jadval.guruh_id))
+
+@xabar_kanali('ichki')
+class IchkiKanal:
+    """Xabarlar qutisi: natijalar bilan bir tranzaksiyada yoziladi"""
+    partiya = 1000
+    parallel = 1
+
+    async def yuborish(self, xabarlar):
+        db.session.execute(db.insert(Xabarnoma), [
+            {'user_id': x.user_id, 'hodisa': x.hodisa, 'sarlavha': x.sarlavha, 'matn': x.matn, 'havola': x.havola,
+             'yaratilgan_sana': x.yaratilgan_sana} for x in xabarlar])
+        return {}
+
+@xabar_kanali('email')
+class EmailKanal:
+    """SMTP: bitta ulanishda partiyadagi barcha xatlar (smtplib alohida oqimda)"""
+    partiya = 100
+
+    @property
+    def parallel(self):
+        return app.config['XABAR_EMAIL_PARALLEL']
+
+    async def yuborish(self, xabarlar):
+        return await asyncio.to_thread(self._smtp_yuborish, xabarlar, app.config['XABAR_SMTP'],
+                                       app.config['XABAR_SMTP_YUBORUVCHI'], app.config['XABAR_SAYT_MANZILI'])
+
+    @staticmethod
+    def _smtp_yuborish(xabarlar, manzil, yuboruvchi, sayt):
+        host, _, port = manzil.partition(':')
+        xatolar = {}
+        yuborilgan = set()
+        try:
+            with smtplib.SMTP(host, int(port or 25), timeout=10) as smtp:
+                for x in xabarlar:
+                    if not x.email:
+                        xatolar[x.id] = 'Email manzili yo\'q'
+                        continue
+                    # MIMEText (compat32) EmailMessage dan ~4 barobar arzon: partiya GIL ni kamroq band qiladi
+                    xat = MIMEText(f'{x.matn or ""}\n\n{sayt}{x.havola}' if x.havola else x.matn or '', 'plain', 'utf-8')
+                    xat['From'] = yuboruvchi
+                    xat['To'] = x.email
+                    xat['Subject'] = Header(x.sarlavha, 'utf-8')
+                    try:
+                        smtp.sendmail(yuboruvchi, [x.email], xat.as_bytes())
+                    except smtplib.SMTPRecipientsRefused as e:
+                        xatolar[x.id] = str(e)
+                        continue
+                    yuborilgan.add(x.id)
+        except (OSError, smtplib.SMTPException) as e:  # ulanish uzildi - qolganlari qayta urinadi
+            xatolar.update({x.id: str(e) or repr(e) for x in xabarlar if x.id not in yuborilgan and x.id not in xatolar})
+        return xatolar
+
+@xabar_kanali('webhook')
+class WebhookKanal:
+    """XABAR_WEBHOOK_URL ga partiya JSON massiv sifatida bitta POST bilan"""
+    partiya = 200
+
+    @property
+    def parallel(self):
+        return app.config['XABAR_WEBHOOK_PARALLEL']
+
+    async def yuborish(self, xabarlar):
+        url = app.config['XABAR_WEBHOOK_URL']
+        if not url:
+            return {x.id: 'XABAR_WEBHOOK_URL sozlanmagan' for x in xabarlar}
+        tana = json_baytlari([{'id': x.id, 'user_id': x.user_id, 'hodisa': x.hodisa, 'sarlavha': x.sarlavha,
+                               'matn': x.matn, 'havola': x.havola} for x in xabarlar])
+        return await asyncio.to_thread(self._post, xabarlar, url, tana)
+
+    @staticmethod
+    def _post(xabarlar, url, tana):
+        sorov = urllib.request.Request(url, data=tana, method='POST', headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(sorov, timeout=10) as javob:
+                javob.read()
+        except (OSError, ValueError) as e:  # URLError/HTTPError - OSError
+            return {x.id: str(e) or repr(e) for x in xabarlar}
+        return {}
+
+def xabarlarni_egallash(egasi):
+    """Navbatdagi XABAR_PARTIYA ta xabarni qulf muddati bilan egallash (commit qilinadi)"""
+    hozir = datetime.utcnow()
+    tayyor = (ChiquvchiXabar.holat == 'kutilmoqda', ChiquvchiXabar.keyingi_urinish <= hozir,
+              db.or_(ChiquvchiXabar.qulf_muddati.is_(None), ChiquvchiXabar.qulf_muddati < hozir))
+    navbat = (db.select(ChiquvchiXabar.id).where(*tayyor)
+              .order_by(ChiquvchiXabar.keyingi_urinish, ChiquvchiXabar.id).limit(app.config['XABAR_PARTIYA']))
+    # Shartlar tashqi WHERE da takrorlanadi: parallel dispetcher egallagan qatorlar qayta tekshiriladi
+    soni = db.session.execute(
+        db.update(ChiquvchiXabar).where(ChiquvchiXabar.id.in_(navbat), *tayyor)
+        .values(egasi=egasi, qulf_muddati=hozir + timedelta(seconds=app.config['XABAR_QULF_MUDDATI']))
+        .execution_options(synchronize_session=False)).rowcount
+    if not soni:
+        db.session.rollback()
+        return []
+    xabarlar = db.session.execute(
+        db.select(ChiquvchiXabar.id, ChiquvchiXabar.user_id, ChiquvchiXabar.kanal, ChiquvchiXabar.hodisa,
+                  ChiquvchiXabar.sarlavha, ChiquvchiXabar.matn, ChiquvchiXabar.havola, ChiquvchiXabar.urinishlar,
+                  ChiquvchiXabar.yaratilgan_sana, User.email)
+        .outerjoin(User, User.id == ChiquvchiXabar.user_id)
+        .where(ChiquvchiXabar.egasi == egasi)).all()
+    db.session.commit()
+    return xabarlar
+
+def xabar_natijalarini_yozish(xabarlar, xatolar):
+    """Yetkazilganlarni yopish, qolganlarini kechikish bilan navbatga qaytarish (bitta tranzaksiya)"""
+    hozir = datetime.utcnow()
+    _bolaklab_yangilash(ChiquvchiXabar, [x.id for x in xabarlar if x.id not in xatolar], holat='yuborildi',
+                        yuborilgan_sana=hozir, egasi=None, qulf_muddati=None, xato=None)
+    if xatolar:
+        keyingi, yopiladi = {}, []
+        for x in xabarlar:
+            if x.id not in xatolar:
+                continue
+            if x.urinishlar + 1 >= app.config['XABAR_URINISHLAR']:
+                yopiladi.append(x.id)
+            else:
+                keyingi[x.id] = hozir + timedelta(seconds=app.config['XABAR_KECHIKISH'] * 2 ** x.urinishlar)
+        _bolaklab_yangilash(ChiquvchiXabar, list(xatolar), urinishlar=ChiquvchiXabar.urinishlar + 1,
+                            egasi=None, qulf_muddati=None)
+        _bolaklab_yangilash(ChiquvchiXabar, yopiladi, holat='xato')
+        _bolaklab_case_yangilash(ChiquvchiXabar, 'keyingi_urinish', keyingi)
+        _bolaklab_case_yangilash(ChiquvchiXabar, 'xato', {id: xato[:500] for id, xato in xatolar.items()})
+    db.session.commit()
+
+async def xabarlar_partiyasini_yuborish(egasi, semaforlar):
+    """Bitta partiyani egallash, kanallarga parallel yetkazish va natijani yozish; egallangan xabarlar soni"""
+    xabarlar = xabarlarni_egallash(egasi)
+    if not xabarlar:
+        return 0
+    kanallar = {}
+    for x in xabarlar:
+        kanallar.setdefault(x.kanal, []).append(x)
+
+    async def yetkazish(kanal, partiya):
+        if kanal not in XABAR_KANAL_TURLARI:
+            return {x.id: f'Noma\'lum kanal: {kanal}' for x in partiya}
+        async with semaforlar.setdefault(kanal, asyncio.Semaphore(XABAR_KANAL_TURLARI[kanal].parallel)):
+            try:
+                return await XABAR_KANAL_TURLARI[kanal].yuborish(partiya)
+            except Exception as e:
+                app.logger.warning('%s kanali: %d ta xabar yetkazilmadi: %r', kanal, len(partiya), e)
+                return {x.id: str(e) or repr(e) for x in partiya}
+
+    bolaklar = []
+    for kanal, qatorlar in kanallar.items():
+        hajm = XABAR_KANAL_TURLARI[kanal].partiya if kanal in XABAR_KANAL_TURLARI else len(qatorlar)
+        bolaklar.extend(yetkazish(kanal, qatorlar[i:i + hajm]) for i in range(0, len(qatorlar), hajm))
+    xatolar = {}
+    for natija in await asyncio.gather(*bolaklar):
+        xatolar.update(natija)
+    xabar_natijalarini_yozish(xabarlar, xatolar)
+    return len(xabarlar)
+
+class XabarDispetcheri:
+    """Outbox navbatini asyncio tsiklida yetkazuvchi alohida oqim"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._oqim = None
+        self._loop = None
+        self._uygotish = None
+        self._toxtash = threading.Event()
+
+    def ishga_tushirish(self, majburiy=False):
+        if not (majburiy or app.config['XABAR_DISPETCHER']):
+            return
+        with self._lock:
+            if self._oqim is None:
+                self._oqim = threading.Thread(target=self._ishlash, name='xabar-dispetcher', daemon=True)
+                self._oqim.start()
+
+    def uygotish(self):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._uygotish.set)
+
+    def toxtatish(self):
+        self._toxtash.set()
+        self.uygotish()
+        if self._oqim is not None:
+            self._oqim.join()
+
+    def _ishlash(self):
+        with app.app_context():
+            asyncio.run(self._tsikl())
+
+    async def _tsikl(self):
+        self._uygotish = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        semaforlar = {}
+        asos = f'{os.getpid()}:xabar'
+        while not self._toxtash.is_set():
+            try:
+                soni = await xabarlar_partiyasini_yuborish(f'{asos}:{os.urandom(4).hex()}', semaforlar)
+            except Exception:  # baza band yoki vaqtincha mavjud emas - tsikl to'xtamaydi
+                db.session.rollback()
+                app.logger.exception('Xabar dispetcheri')
+                soni = 0
+            finally:
+                db.session.remove()
+            if not soni:
+                try:
+                    await asyncio.wait_for(self._uygotish.wait(), app.config['XABAR_SOROV_ORALIGI'])
+                except asyncio.TimeoutError:
+                    pass
+                self._uygotish.clear()
+
+xabar_dispetcheri = XabarDispetcheri()
+
+@event.listens_for(Session, 'after_commit')
+def _xabar_dispetcherini_uygotish(session):
+    if session.info.pop('xabar_qoshildi', False):
+        xabar_dispetcheri.ishga_tushirish()
+        xabar_dispetcheri.uygotish()
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _xabar_belgisini_tashlash(session, previous_transaction):
+    session.info.pop('xabar_qoshildi', None)
+
+# ============= JONLI HODISALAR =============
+# Admin sahifalari yangi arizalarni ko'rish uchun qayta-qayta yangilanmaydi:
+# /admin/hodisalar oqimiga (Server-Sent Events) ulanadi. Manba - umumiy baza:
+# obunachilar bor bo'lsa bitta tarqatuvchi oqim SSE_TEKSHIRUV_ORALIGI da bir marta
+# oxirgi ko'rilgan GuruhAriza.id dan keyingi arizalarni va hisoblagichlarni (keshsiz)
+# o'qiydi, shuning uchun boshqa jarayonlar (gunicorn ishchilari, CLI) yozgan
+# arizalar ham kechikmaydi. Shu jarayondagi commit lar tarqatuvchini kutmasdan
+# uyg'otadi. Hodisa bir marta tayyorlangan baytlar sifatida barcha ulangan
+# brauzerlarga beriladi - N ta brauzer uchun N ta emas, bitta tekshiruv. Oxirgi
+# SSE_BUFER ta hodisa saqlanadi: qayta ulangan brauzer Last-Event-ID dan
+# keyingilarini oladi.
+#
+# Har bir ochiq oqim ishchini ulanish davomida band qiladi. Shuning uchun oqim
+# faqat ko'p oqimli serverda (gunicorn --threads, wsgi.multithread) yoki
+# SSE_OQIM=1 bilan (gevent) beriladi; sync ishchilarda brauzer har
+# SSE_SOROV_ORALIGI da /admin/arizalar/holat ni so'raydi - ishchi band bo'lmaydi.
+
+JONLI_YANGI_LIMITI = 100  # bitta hodisadagi yangi ariza id lari, qolgani keyingi hodisada
+
+def yangi_ariza_idlari(oxirgi_id, limit=JONLI_YANGI_LIMITI):
+    """oxirgi_id dan keyin (istalgan jarayonda) qo'shilgan arizalar id lari, o'sish tartibida"""
+    return db.session.scalars(db.select(GuruhAriza.id).where(GuruhAriza.id > oxirgi_id)
+                              .order_by(GuruhAriza.id).limit(limit)).all()
+
+def oxirgi_ariza_id():
+    return db.session.scalar(db.select(db.func.max(GuruhAriza.id))) or 0
+
+@app.template_global()
+def jonli_oqim_mumkinmi():
+    """SSE oqimi shu serverda ishchilarni band qilib qo'ymaydimi (SSE_OQIM, wsgi.multithread)"""
+    rejim = app.config['SSE_OQIM']
+    if rejim == 'auto':
+        return bool(request.environ.get('wsgi.multithread'))
+    return rejim == '1'
+
+class HodisaShinasi:
+    """Jarayon ichidagi hodisalar shinasi: umumiy baza -> bitta tarqatuvchi oqim -> obunachilar"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shart = threading.Condition()
+        self._bufer = []  # (id, SSE baytlari), id lar ketma-ket
+        # Jarayon boshlangan vaqtdan: boshqa jarayonning Last-Event-ID si bufer oralig'iga tushmaydi
+        self._oxirgi_id = int(datetime.utcnow().timestamp() * 1000)
+        self._uygotish = threading.Event()
+        self._oqim = None
+        self._ariza_id = None  # tarqatilgan eng katta GuruhAriza.id; obunachi yo'q bo'lsa None
+        self._tarqatilgan = None  # oxirgi hodisadagi hisoblagichlar
+        self._statistika = None  # (monotonic vaqt, bazadan olingan hisoblagichlar)
+        self.obunachilar = 0
+
+    def obuna_bolish(self):
+        """Joy bo'lsa obunachini ro'yxatga olish va tarqatuvchini ishga tushirish"""
+        with self._lock:
+            if self.obunachilar >= app.config['SSE_MAKS_ULANISHLAR']:
+                return False
+            self.obunachilar += 1
+            if self._oqim is None:
+                self._oqim = threading.Thread(target=self._ishlash, name='hodisa-shinasi', daemon=True)
+                self._oqim.start()
+            birinchi = self.obunachilar == 1
+        if birinchi:
+            self._uygotish.set()  # boshlang'ich GuruhAriza.id kutmasdan o'qilsin
+        return True
+
+    def obunani_bekor_qilish(self):
+        with self._lock:
+            self.obunachilar -= 1
+
+    def ozgarish(self):
+        """Shu jarayonda ariza o'zgarishi commit qilindi: hisoblagichlar eskirdi, tarqatuvchi uyg'onadi"""
+        with self._lock:
+            self._statistika = None
+        self._uygotish.set()
+
+    def statistika(self):
+        """Bazadagi hisoblagichlar (keshsiz); jarayonda SSE_TEKSHIRUV_ORALIGI da bir martadan ko'p so'ralmaydi"""
+        with self._lock:
+            if self._statistika is not None and monotonic() - self._statistika[0] < app.config['SSE_TEKSHIRUV_ORALIGI']:
+                return self._statistika[1]
+        statistika = admin_statistikasi(yangilash=True)
+        with self._lock:
+            self._statistika = (monotonic(), statistika)
+        return statistika
+
+    @property
+    def oxirgi_id(self):
+        with self._shart:
+            return self._oxirgi_id
+
+    def hodisa(self, malumot, hodisa_id=None):
+        """SSE formatidagi baytlar"""
+        return (f'id: {self._oxirgi_id if hodisa_id is None else hodisa_id}\nevent: arizalar\ndata: '.encode()
+                + json_baytlari(malumot) + b'\n\n')
+
+    def tarqatish(self, malumot):
+        with self._shart:
+            self._oxirgi_id += 1
+            self._bufer.append((self._oxirgi_id, self.hodisa(malumot)))
+            if len(self._bufer) > 2 * app.config['SSE_BUFER']:
+                del self._bufer[:-app.config['SSE_BUFER']]
+            self._shart.notify_all()
+
+    def _keyingilar(self, oxirgi_id):
+        # _shart ushlangan holda; id lar ketma-ket bo'lgani uchun kesim indeks bilan
+        if oxirgi_id >= self._oxirgi_id:
+            return []
+        boshi = self._bufer[0][0]
+        return self._bufer[max(oxirgi_id - boshi + 1, 0):]
+
+    def malum(self, oxirgi_id):
+        """Last-Event-ID shu jarayon buferida bo'lsa - yo'qotilganlar qayta beriladi"""
+        with self._shart:
+            return self._bufer and self._bufer[0][0] - 1 <= oxirgi_id <= self._oxirgi_id
+
+    def kutish(self, oxirgi_id, timeout):
+        """oxirgi_id dan keyingi hodisalar; yo'q bo'lsa timeout gacha kutiladi"""
+        with self._shart:
+            if oxirgi_id >= self._oxirgi_id:
+                self._shart.wait(timeout)
+            return self._keyingilar(oxirgi_id)
+
+    def oqim(self, boshlangich, oxirgi_id):
+        """Obunachi uchun SSE baytlari (so'rov va ilova kontekstisiz ishlaydi)"""
+        yield f'retry: {int(app.config["SSE_PING"] * 1000)}\n\n'.encode() + (boshlangich or b'')
+        while True:
+            hodisalar = self.kutish(oxirgi_id, app.config['SSE_PING'])
+            if hodisalar:
+                oxirgi_id = hodisalar[-1][0]
+                yield b''.join(baytlar for _, baytlar in hodisalar)
+            else:
+                yield b': ping\n\n'  # uzilgan ulanish shu yozishda aniqlanadi
+
+    def _tekshirish(self):
+        """Umumiy bazadan: oxirgi tekshiruvdan keyingi arizalar va hisoblagichlar; hodisa yoki None"""
+        if self._ariza_id is None:
+            self._ariza_id = oxirgi_ariza_id()  # undan oldingilari obunachining boshlang'ich holatida
+            yangi = []
+        else:
+            yangi = yangi_ariza_idlari(self._ariza_id)
+            if yangi:
+                self._ariza_id = yangi[-1]
+                if len(yangi) == JONLI_YANGI_LIMITI:
+                    self._uygotish.set()  # qolganlari darhol keyingi hodisada
+        statistika = admin_statistikasi(yangilash=True)
+        with self._lock:
+            self._statistika = (monotonic(), statistika)
+        oldingi, self._tarqatilgan = self._tarqatilgan, statistika
+        if not yangi and statistika == oldingi:
+            return None
+        # Ko'rib chiqilgan arizalar kutilayotganlar sonida ko'rinadi (qaysi jarayonda bo'lmasin)
+        ozgardi = oldingi is not None and oldingi['arizalar_soni'] + len(yangi) != statistika['arizalar_soni']
+        return {'yangi': yangi, 'ozgardi': ozgardi, **statistika}
+
+    def _ishlash(self):
+        with app.app_context():
+            while True:
+                self._uygotish.wait(app.config['SSE_TEKSHIRUV_ORALIGI'])
+                self._uygotish.clear()
+                if not self.obunachilar:
+                    # Keyingi obunachi joriy holatdan boshlaydi
+                    self._ariza_id = self._tarqatilgan = None
+                    continue
+                try:
+                    malumot = self._tekshirish()
+                except Exception:  # baza band yoki vaqtincha mavjud emas - keyingi aylanishda
+                    db.session.rollback()
+                    app.logger.exception('Hodisa shinasi')
+                    continue
+                finally:
+                    db.session.remove()
+                if malumot is not None:
+                    self.tarqatish(malumot)
+
+hodisa_shinasi = HodisaShinasi()
+
+@event.listens_for(GuruhAriza, 'after_insert')
+@event.listens_for(GuruhAriza, 'after_update')
+@event.listens_for(GuruhAriza, 'after_delete')
+def _ariza_ozgarishi_hodisasi(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['arizalar_ozgardi'] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def _ommaviy_ariza_hodisasi(orm_execute_state):
+    # Qabul/rad qilish shartli va bolaklangan UPDATE lar bilan - mapper hodisasiz
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is GuruhAriza and \
+            (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        orm_execute_state.session.info['arizalar_ozgardi'] = True
 
-class DarsJadvali(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    guruh_id = db.Column(db.Integer, db.ForeignKey('guruh.id'), nullable=False)
-    kun = db.Column(db.String(20), nullable=False)  # 'Dushanba', 'Seshanba', ...
-    boshlanish_vaqti = db.Column(db.Time, nullable=False)
-    tugash_vaqti = db.Column(db.Time, nullable=False)
-    xona = db.Column(db.String(50))
-    holat = db.Column(db.String(20), default='faol')  # 'faol', 'bekor_qilindi'
-    yaratilgan_sana = db.Column(db.DateTime, default=datetime.utcnow)
+@event.listens_for(Session, 'after_commit')
+def _ariza_hodisalarini_tarqatish(session):
+    if session.info.pop('arizalar_ozgardi', False):
+        hodisa_shinasi.ozgarish()
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _ariza_hodisalarini_tashlash(session, previous_transaction):
+    session.info.pop('arizalar_ozgardi', None)
 
 # ============= DECORATORS =============
 
@@ -125,6 +3177,120 @@ def mentor_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def api_login_required(f):
+    """JSON API uchun: login sahifasiga yo'naltirish o'rniga 401, rol mos kelmasa 403"""
+    @wraps(f)
+    def decorated_function(nomi, *args, **kwargs):
+        if 'user_id' not in session:
+            return api_xato('Avtorizatsiya talab qilinadi', 401)
+        if session.get('role') not in API_MANBALARI[nomi].rollar:
+            return api_xato('Ruxsat yo\'q', 403)
+        return f(nomi, *args, **kwargs)
+    return decorated_function
+
+def qayta_urinish_javobi(shablon, xabar, status=503, soniya=2):
+    """Formani xabar, status va Retry-After bilan qayta ko'rsatish (SQL bajarilmaydi)"""
+    flash(xabar, 'warning')
+    javob = Response(render_template(shablon), status=status)
+    javob.headers['Retry-After'] = str(max(1, ceil(soniya)))
+    return javob
+
+def server_band_javobi(shablon):
+    """Parol xeshlash navbati to'la"""
+    return qayta_urinish_javobi(shablon, 'Server hozir band, bir necha soniyadan so\'ng qayta urinib ko\'ring.')
+
+# ============= SO'ROV CHEKLOVLARI =============
+# Login, ro'yxatdan o'tish va guruhga yozilish POST so'rovlari IP, username va
+# foydalanuvchi bo'yicha cheklanadi. Sirpanuvchi oyna ikki qo'shni qat'iy oyna
+# hisoblagichidan taxminlanadi: kalit uchun faqat ikkita butun son saqlanadi.
+# Cheklov dekorator ichida, parol xeshlash yoki SQL dan oldin tekshiriladi.
+# CHEKLOV_OMBORI - get/incr interfeysli umumiy ombor (masalan, Redis o'rami);
+# berilmasa jarayon ichidagi ombor ishlatiladi.
+
+class XotiraCheklovOmbori:
+    """Jarayon ichidagi hisoblagichlar: kalit -> [qiymat, muddat]"""
+
+    TOZALASH_ORALIGI = 1000  # har shuncha incr dan keyin muddati o'tganlar o'chiriladi
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._amallar = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None or item[1] < monotonic():
+            return 0
+        return item[0]
+
+    def incr(self, key, timeout):
+        hozir = monotonic()
+        with self._lock:
+            self._amallar += 1
+            if self._amallar % self.TOZALASH_ORALIGI == 0:
+                self._data = {k: v for k, v in self._data.items() if v[1] >= hozir}
+            item = self._data.get(key)
+            if item is None or item[1] < hozir:
+                item = self._data[key] = [0, hozir + timeout]
+            item[0] += 1
+            return item[0]
+
+_xotira_cheklov_ombori = XotiraCheklovOmbori()
+
+def cheklov_ombori():
+    return app.config.get('CHEKLOV_OMBORI') or _xotira_cheklov_ombori
+
+def cheklovni_tekshirish(nomi, kalit):
+    """So'rovni hisobga olish; limitdan oshsa Retry-After soniyalari, aks holda None"""
+    soni, oyna = app.config['CHEKLOVLAR'][nomi]
+    hozir = datetime.now(timezone.utc).timestamp()
+    joriy_oyna, otgan = divmod(hozir, oyna)
+    ombor = cheklov_ombori()
+    prefiks = f'cheklov:{nomi}:{kalit}:'
+    oldingi = ombor.get(prefiks + str(int(joriy_oyna) - 1)) or 0
+    # Qaror incr qaytargan qiymat bo'yicha: alohida get + incr da bir vaqtdagi so'rovlar bir xil
+    # eski qiymatni ko'rib hammasi o'tib ketardi. Rad etilgan urinishlar ham hisoblanadi.
+    joriy = ombor.incr(prefiks + str(int(joriy_oyna)), timeout=2 * oyna)
+    # Oldingi oynaning hali sirpanuvchi oyna ichida qolgan ulushi
+    taxmin = oldingi * (1 - otgan / oyna) + joriy
+    if taxmin > soni:
+        if joriy < soni:
+            # oldingi oyna ulushi kamayib, keyingi so'rov soni ga sig'guncha
+            return oyna * (1 - (soni - joriy - 1) / oldingi) - otgan
+        # keyingi oynada shu oyna (rad etilganlar bilan) ulushi kamayguncha
+        return oyna - otgan + oyna * (1 - (soni - 1) / joriy)
+    return None
+
+def _mijoz_ip():
+    # Proksi orqasida ishlaganda werkzeug ProxyFix remote_addr ni to'g'rilaydi
+    return request.remote_addr or '-'
+
+CHEKLOV_KALITLARI = {
+    'login_ip': _mijoz_ip,
+    'login_username': lambda: (request.form.get('username') or '').strip().lower() or None,
+    'register_ip': _mijoz_ip,
+    'yozilish_user': lambda: session.get('user_id'),
+}
+
+def sorov_cheklovi(*nomlar, shablon='cheklov.html'):
+    """POST so'rovlarini berilgan cheklovlar bo'yicha tekshiruvchi dekorator (429)"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'POST':
+                for nomi in nomlar:
+                    kalit = CHEKLOV_KALITLARI[nomi]()
+                    if kalit is None:
+                        continue
+                    kutish = cheklovni_tekshirish(nomi, kalit)
+                    if kutish is not None:
+                        return qayta_urinish_javobi(
+                            shablon, f'Urinishlar juda ko\'p. {max(1, ceil(kutish))} soniyadan so\'ng qayta urinib ko\'ring.',
+                            status=429, soniya=kutish)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 # ============= ROUTES =============
 
 @app.route('/')
@@ -142,6 +3308,7 @@ def index():
 # ============= AUTH ROUTES =============
 
 @app.route('/register', methods=['GET', 'POST'])
+@sorov_cheklovi('register_ip', shablon='register.html')
 def register():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -161,7 +3328,10 @@ def register():
             return redirect(url_for('register'))
         
         user = User(username=username, email=email, role=role)
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except ParolXeshlashBand:
+            return server_band_javobi('register.html')
         db.session.add(user)
         db.session.flush()
         
@@ -179,6 +3349,7 @@ def register():
     return render_template('register.html')
 
 @app.route('/login', methods=['GET', 'POST'])
+@sorov_cheklovi('login_ip', 'login_username', shablon='login.html')
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -186,7 +3357,16 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and user.check_password(password):
+        try:
+            togri = user is not None and user.check_password(password)
+            if togri and xesh_yangilanishi_kerakmi(user.password_hash):
+                # PAROL_XESH_USULI o'zgargan - parol ochiq holda faqat shu yerda mavjud
+                user.set_password(password)
+                db.session.commit()
+        except ParolXeshlashBand:
+            return server_band_javobi('login.html')
+        
+        if togri:
             session['user_id'] = user.id
             session['username'] = user.username
             session['role'] = user.role
@@ -208,30 +3388,19 @@ def logout():
 @app.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
-    talabalar_soni = Talaba.query.count()
-    mentorlar_soni = Mentor.query.count()
-    guruhlar_soni = Guruh.query.count()
-    fanlar_soni = Fan.query.count()
-    arizalar_soni = GuruhAriza.query.filter_by(holat='kutilmoqda').count()
-    jadvallar_soni = DarsJadvali.query.filter_by(holat='faol').count()
+    statistika = admin_statistikasi()
     
     # Yangi arizalarni olish (oxirgi 10 ta)
-    arizalar = GuruhAriza.query.filter_by(holat='kutilmoqda').order_by(GuruhAriza.ariza_sana.desc()).limit(10).all()
+    arizalar = arizalar_query().filter_by(holat='kutilmoqda').order_by(GuruhAriza.ariza_sana.desc()).limit(10).all()
     
-    return render_template('admin_dashboard.html', 
-                         talabalar_soni=talabalar_soni,
-                         mentorlar_soni=mentorlar_soni,
-                         guruhlar_soni=guruhlar_soni,
-                         fanlar_soni=fanlar_soni,
-                         arizalar_soni=arizalar_soni,
-                         jadvallar_soni=jadvallar_soni,
-                         arizalar=arizalar)
+    return render_template('admin_dashboard.html', arizalar=arizalar, **statistika)
 
 @app.route('/admin/fanlar')
 @admin_required
 def fanlar_list():
-    fanlar = Fan.query.all()
-    return render_template('fanlar_list.html', fanlar=fanlar)
+    fanlar = keyset_sahifa(Fan.query, Fan, {'id': Fan.id, 'nomi': Fan.nomi}, 'id')
+    guruhlar_soni = fan_guruhlar_soni([fan.id for fan in fanlar])
+    return render_template('fanlar_list.html', fanlar=fanlar, guruhlar_soni=guruhlar_soni)
 
 @app.route('/admin/fan/add', methods=['GET', 'POST'])
 @admin_required
@@ -275,7 +3444,7 @@ def fan_delete(id):
 @app.route('/admin/guruhlar')
 @admin_required
 def guruhlar_list():
-    guruhlar = Guruh.query.all()
+    guruhlar = keyset_sahifa(guruhlar_query(), Guruh, GURUH_SARALASH, 'id', filtrlar=GURUH_FILTRLARI)
     return render_template('guruhlar_list.html', guruhlar=guruhlar)
 
 @app.route('/admin/guruh/add', methods=['GET', 'POST'])
@@ -289,7 +3458,8 @@ def guruh_add():
             mentor_id=request.form.get('mentor_id'),
             boshlanish_sana=datetime.strptime(boshlanish, '%Y-%m-%d').date() if boshlanish else None,
             max_talabalar=request.form.get('max_talabalar', 15),
-            holat=request.form.get('holat', 'faol')
+            holat=request.form.get('holat', 'faol'),
+            avtomatik_qabul='avtomatik_qabul' in request.form
         )
         db.session.add(guruh)
         db.session.commit()
@@ -306,12 +3476,21 @@ def guruh_edit(id):
     guruh = Guruh.query.get_or_404(id)
     if request.method == 'POST':
         boshlanish = request.form.get('boshlanish_sana')
+        eski = (guruh.nomi, guruh.mentor_id, guruh.boshlanish_sana)
         guruh.nomi = request.form.get('nomi')
         guruh.fan_id = request.form.get('fan_id')
         guruh.mentor_id = request.form.get('mentor_id')
         guruh.boshlanish_sana = datetime.strptime(boshlanish, '%Y-%m-%d').date() if boshlanish else None
+        eski_sigim = (guruh.max_talabalar, guruh.avtomatik_qabul)
         guruh.max_talabalar = request.form.get('max_talabalar', 15)
         guruh.holat = request.form.get('holat', 'faol')
+        guruh.avtomatik_qabul = 'avtomatik_qabul' in request.form
+        if eski_sigim != (int(guruh.max_talabalar), guruh.avtomatik_qabul):
+            navbatga_belgilash(guruh.id)  # sig'im oshgan yoki navbat yoqilgan - kutayotganlar qabul qilinadi
+        if eski != (guruh.nomi, int(guruh.mentor_id) if guruh.mentor_id else None, guruh.boshlanish_sana):
+            # Haftalik jadval ko'rinishlari guruh nomi, mentori va sanasini o'z ichiga oladi
+            DarsJadvali.query.filter_by(guruh_id=guruh.id).update(
+                {'yangilangan_sana': datetime.utcnow()}, synchronize_session=False)
         db.session.commit()
         flash('Guruh muvaffaqiyatli yangilandi!', 'success')
         return redirect(url_for('guruhlar_list'))
@@ -324,17 +3503,48 @@ def guruh_edit(id):
 @admin_required
 def guruh_delete(id):
     guruh = Guruh.query.get_or_404(id)
-    db.session.delete(guruh)
+    # Dars jadvali, arizalar va talabalar bog'lanishi fon vazifasida bolaklab o'chiriladi
+    vazifa_id = vazifa_qoshish('guruh_ochirish', kalit=f'guruh_ochirish:{guruh.id}', guruh_id=guruh.id).id
     db.session.commit()
-    flash('Guruh o\'chirildi!', 'info')
+    flash(f'Guruh o\'chirish navbatga qo\'yildi (vazifa #{vazifa_id}).', 'info')
     return redirect(url_for('guruhlar_list'))
 
 @app.route('/admin/talabalar')
 @admin_required
 def talabalar_list():
-    talabalar = Talaba.query.all()
+    talabalar = keyset_sahifa(talabalar_query(), Talaba, TALABA_SARALASH, 'id', filtrlar=TALABA_FILTRLARI)
     return render_template('talabalar_list.html', talabalar=talabalar)
 
+@app.route('/admin/qidiruv')
+@admin_required
+def qidiruv():
+    matn = request.args.get('q', '').strip()
+    tur = request.args.get('tur')
+    natijalar = qidirish(matn, [tur] if tur in QIDIRUV_TURLARI else None) if matn else []
+    return render_template('qidiruv.html', matn=matn, tur=tur, natijalar=natijalar)
+
+@app.route('/admin/talabalar/import', methods=['GET', 'POST'])
+@admin_required
+def talabalar_import():
+    if request.method == 'POST':
+        fayl = request.files.get('fayl')
+        if not fayl or not fayl.filename:
+            flash('CSV faylni tanlang!', 'danger')
+            return redirect(url_for('talabalar_import'))
+        matn = io.TextIOWrapper(fayl.stream, encoding='utf-8-sig', newline='')
+        try:
+            natija = talabalarni_import_qilish(matn, faqat_tekshirish=bool(request.form.get('tekshirish')))
+        except UnicodeDecodeError:
+            db.session.rollback()
+            flash('Fayl UTF-8 kodlashda bo\'lishi kerak!', 'danger')
+            return redirect(url_for('talabalar_import'))
+        if not request.form.get('tekshirish'):
+            flash(f'{natija.qoshilgan} ta talaba qo\'shildi, {natija.xatolar_soni} ta qatorda xato.',
+                  'success' if natija.qoshilgan else 'warning')
+        return render_template('talabalar_import.html', natija=natija, tekshirish=bool(request.form.get('tekshirish')),
+                               ustunlar=IMPORT_USTUNLARI)
+    return render_template('talabalar_import.html', natija=None, ustunlar=IMPORT_USTUNLARI)
+
 @app.route('/admin/talaba/<int:id>')
 @admin_required
 def talaba_detail(id):
@@ -345,18 +3555,19 @@ def talaba_detail(id):
 @admin_required
 def talaba_delete(id):
     talaba = Talaba.query.get_or_404(id)
-    user = User.query.get(talaba.user_id)
-    db.session.delete(talaba)
-    db.session.delete(user)
+    # Arizalar talabasiz qolmaydi (talaba_id NOT NULL) - vazifada talaba bilan birga o'chiriladi
+    vazifa_id = vazifa_qoshish('talaba_ochirish', kalit=f'talaba_ochirish:{talaba.id}', talaba_id=talaba.id).id
     db.session.commit()
-    flash('Talaba o\'chirildi!', 'info')
+    flash(f'Talaba o\'chirish navbatga qo\'yildi (vazifa #{vazifa_id}).', 'info')
     return redirect(url_for('talabalar_list'))
 
 @app.route('/admin/mentorlar')
 @admin_required
 def mentorlar_list():
-    mentorlar = Mentor.query.all()
-    return render_template('mentorlar_list.html', mentorlar=mentorlar)
+    mentorlar = keyset_sahifa(Mentor.query, Mentor,
+                              {'id': Mentor.id, 'ism': Mentor.ism, 'familiya': Mentor.familiya}, 'id')
+    guruhlar_soni = mentor_guruhlar_soni([mentor.id for mentor in mentorlar])
+    return render_template('mentorlar_list.html', mentorlar=mentorlar, guruhlar_soni=guruhlar_soni)
 
 @app.route('/admin/mentor/<int:id>')
 @admin_required
@@ -368,26 +3579,129 @@ def mentor_detail(id):
 @admin_required
 def mentor_delete(id):
     mentor = Mentor.query.get_or_404(id)
-    user = User.query.get(mentor.user_id)
-    db.session.delete(mentor)
-    db.session.delete(user)
+    vazifa_id = vazifa_qoshish('mentor_ochirish', kalit=f'mentor_ochirish:{mentor.id}', mentor_id=mentor.id).id
     db.session.commit()
-    flash('Mentor o\'chirildi!', 'info')
+    flash(f'Mentor o\'chirish navbatga qo\'yildi (vazifa #{vazifa_id}).', 'info')
     return redirect(url_for('mentorlar_list'))
 
+# ============= VAZIFALAR BOSHQARISH =============
+
+VAZIFA_NOMLARI = {
+    'guruh_ochirish': 'Guruhni o\'chirish',
+    'talaba_ochirish': 'Talabani o\'chirish',
+    'mentor_ochirish': 'Mentorni o\'chirish',
+}
+
+@app.route('/admin/vazifalar')
+@admin_required
+def vazifalar_list():
+    vazifa_ishchilari.ishga_tushirish()  # qayta ishga tushirilgan jarayonda qolib ketgan vazifalar uchun
+    vazifalar = keyset_sahifa(Vazifa.query, Vazifa, VAZIFA_SARALASH, 'yaratilgan_sana', 'desc',
+                              filtrlar=VAZIFA_FILTRLARI)
+    return render_template('vazifalar_list.html', vazifalar=vazifalar, nomlar=VAZIFA_NOMLARI)
+
+@app.route('/admin/vazifa/<int:id>')
+@admin_required
+def vazifa_detail(id):
+    vazifa_ishchilari.ishga_tushirish()
+    vazifa = Vazifa.query.get_or_404(id)
+    natija = json.loads(vazifa.natija) if vazifa.natija else None
+    return render_template('vazifa_detail.html', vazifa=vazifa, natija=natija,
+                           parametrlar=json.loads(vazifa.parametrlar), nomlar=VAZIFA_NOMLARI)
+
+@app.route('/admin/vazifa/qayta/<int:id>', methods=['POST'])
+@admin_required
+def vazifa_qayta(id):
+    vazifa_id = vazifani_qayta_qoshish(Vazifa.query.get_or_404(id)).id
+    db.session.commit()
+    flash('Vazifa qayta navbatga qo\'yildi!', 'success')
+    return redirect(url_for('vazifa_detail', id=vazifa_id))
+
 # ============= ARIZA BOSHQARISH =============
 
 @app.route('/admin/arizalar')
 @admin_required
 def arizalar_list():
-    arizalar = GuruhAriza.query.order_by(GuruhAriza.ariza_sana.desc()).all()
+    arizalar = keyset_sahifa(arizalar_query(), GuruhAriza, ARIZA_SARALASH, 'ariza_sana', 'desc',
+                             filtrlar=ARIZA_FILTRLARI)
     return render_template('arizalar_list.html', arizalar=arizalar)
 
+@app.route('/admin/hodisalar')
+@admin_required
+def admin_hodisalar():
+    """Server-Sent Events: yangi va ko'rib chiqilgan arizalar, dashboard hisoblagichlari"""
+    if not jonli_oqim_mumkinmi():
+        # Sync ishchi oqim davomida boshqa so'rovlarga xizmat qilolmaydi - brauzer /admin/arizalar/holat ni so'raydi
+        return Response('Jonli oqim bu serverda o\'chirilgan\n', 503, mimetype='text/plain')
+    oxirgi_id = request.headers.get('Last-Event-ID', type=int)
+    if oxirgi_id is not None and hodisa_shinasi.malum(oxirgi_id):
+        boshlangich = None  # yo'qotilgan hodisalar buferdan beriladi
+    else:
+        # Birinchi ulanish: bazadagi joriy holat oxirgi hodisa id si bilan
+        oxirgi_id = hodisa_shinasi.oxirgi_id
+        boshlangich = hodisa_shinasi.hodisa({'yangi': [], 'ozgardi': False, **hodisa_shinasi.statistika()},
+                                            oxirgi_id)
+    # Obuna faqat javob yopilganda bekor qilinadi - undan oldingi xato joyni band qilib qoldirmasin
+    if not hodisa_shinasi.obuna_bolish():
+        return Response('Jonli ulanishlar soni chegarada\n', 503, {'Retry-After': '30'}, mimetype='text/plain')
+    try:
+        # stream_with_context siz: oqim so'rov konteksti va DB sessiyasini ushlab turmaydi
+        javob = Response(hodisa_shinasi.oqim(boshlangich, oxirgi_id), mimetype='text/event-stream')
+        javob.call_on_close(hodisa_shinasi.obunani_bekor_qilish)
+    except Exception:
+        hodisa_shinasi.obunani_bekor_qilish()
+        raise
+    javob.headers['Cache-Control'] = 'no-cache'
+    javob.headers['X-Accel-Buffering'] = 'no'  # nginx orqasida buferlanmasin
+    return javob
+
+@app.route('/admin/arizalar/holat')
+@admin_required
+def arizalar_holati():
+    """Oqimsiz jonli hodisalar: ?oxirgi=<ariza id> dan keyingi arizalar va hisoblagichlar (JSON)"""
+    oxirgi = request.args.get('oxirgi', type=int)
+    if oxirgi is None:
+        yangi, oxirgi = [], oxirgi_ariza_id()  # birinchi so'rov: keyingilar uchun boshlang'ich nuqta
+    else:
+        yangi = yangi_ariza_idlari(oxirgi)
+        oxirgi = yangi[-1] if yangi else oxirgi
+    return api_javobi({'oxirgi': oxirgi, 'yangi': yangi, **hodisa_shinasi.statistika()})
+
+@app.route('/admin/eksport/<any(talabalar, guruhlar, arizalar):royxat>.<any(csv, xlsx):format>')
+@admin_required
+def eksport(royxat, format):
+    """Ro'yxatni ro'yxat sahifasidagi filtr va saralash bilan CSV/XLSX qilib oqim bilan yuklash"""
+    sarlavhalar = EKSPORTLAR[royxat][0]
+    qatorlar = eksport_qatorlari(royxat)
+    if format == 'csv':
+        oqim = csv_oqimi(sarlavhalar, qatorlar)
+    else:
+        oqim = xlsx_oqimi(sarlavhalar, qatorlar, royxat)
+    javob = Response(stream_with_context(oqim), content_type=EKSPORT_FORMATLARI[format])
+    fayl_nomi = f'{royxat}_{datetime.now().strftime("%Y%m%d_%H%M")}.{format}'
+    javob.headers['Content-Disposition'] = f'attachment; filename="{fayl_nomi}"'
+    return javob
+
 @app.route('/admin/ariza/<int:id>')
 @admin_required
 def ariza_detail(id):
     ariza = GuruhAriza.query.get_or_404(id)
-    return render_template('ariza_detail.html', ariza=ariza)
+    return render_template('ariza_detail.html', ariza=ariza, navbat=navbatdagi_orinlar([ariza]))
+
+@app.route('/admin/ariza/ustuvorlik/<int:id>', methods=['POST'])
+@admin_required
+def ariza_ustuvorlik(id):
+    ariza = GuruhAriza.query.get_or_404(id)
+    ustuvorlik = request.form.get('ustuvorlik', type=int)
+    if ustuvorlik is None:
+        flash('Ustuvorlik butun son bo\'lishi kerak!', 'danger')
+    elif ariza.holat != 'kutilmoqda':
+        flash('Bu ariza allaqachon ko\'rib chiqilgan!', 'warning')
+    else:
+        ariza.ustuvorlik = ustuvorlik
+        db.session.commit()
+        flash('Arizaning navbatdagi ustuvorligi yangilandi!', 'success')
+    return redirect(url_for('ariza_detail', id=id))
 
 @app.route('/admin/ariza/qabul/<int:id>')
 @admin_required
@@ -398,23 +3712,23 @@ def ariza_qabul(id):
         flash('Bu ariza allaqachon ko\'rib chiqilgan!', 'warning')
         return redirect(url_for('ariza_detail', id=id))
     
-    # Guruh to'lganmi tekshirish
-    talabalar_soni = Talaba.query.filter_by(guruh_id=ariza.guruh_id).count()
-    if talabalar_soni >= ariza.guruh.max_talabalar:
+    # Arizani qabul qilish va guruhdan joy band qilish (bitta tranzaksiyada)
+    natija = ariza_qabul_qilish(ariza)
+    db.session.commit()
+    
+    if natija == 'korib_chiqilgan':
+        flash('Bu ariza allaqachon ko\'rib chiqilgan!', 'warning')
+        return redirect(url_for('ariza_detail', id=id))
+    
+    if natija == 'toldi':
         flash('Guruh to\'lgan! Ariza qabul qilinmadi.', 'danger')
-        ariza.holat = 'qabul_qilinmadi'
-        ariza.javob_sana = datetime.utcnow()
-        ariza.izoh = 'Guruh to\'lgan'
-        db.session.commit()
         return redirect(url_for('ariza_detail', id=id))
     
-    # Talabani guruhga qo'shish
-    ariza.talaba.guruh_id = ariza.guruh_id
-    ariza.holat = 'qabul_qilindi'
-    ariza.javob_sana = datetime.utcnow()
-    ariza.izoh = 'Ariza qabul qilindi va talaba guruhga qo\'shildi'
+    if natija == 'navbatda':
+        flash('Guruh to\'lgan! Ariza kutish ro\'yxatida qoldi - joy bo\'shaganda navbat bo\'yicha qabul qilinadi.',
+              'warning')
+        return redirect(url_for('ariza_detail', id=id))
     
-    db.session.commit()
     flash(f'Ariza qabul qilindi! {ariza.talaba.ism} {ariza.talaba.familiya} {ariza.guruh.nomi} guruhiga qo\'shildi.', 'success')
     return redirect(url_for('ariza_detail', id=id))
 
@@ -435,6 +3749,7 @@ def ariza_rad(id):
         ariza.holat = 'qabul_qilinmadi'
         ariza.javob_sana = datetime.utcnow()
         ariza.izoh = izoh
+        ariza_xabarlari([ariza.id])
         db.session.commit()
         
         if izoh == 'Qabul qilinmadi':
@@ -445,28 +3760,73 @@ def ariza_rad(id):
     
     return render_template('ariza_rad.html', ariza=ariza)
 
+NATIJA_NOMLARI = {
+    'qabul_qilindi': 'Qabul qilindi',
+    'toldi': 'Guruh to\'lgan - rad etildi',
+    'rad_etildi': 'Rad etildi',
+    'korib_chiqilgan': 'Allaqachon ko\'rib chiqilgan',
+    'takroriy': 'Talaba boshqa arizasi orqali qabul qilingan - kutishda qoldi',
+    'navbatda': 'Guruh to\'lgan - kutish ro\'yxatida qoldi',
+    'topilmadi': 'Ariza topilmadi',
+}
+
+@app.route('/admin/arizalar/ommaviy', methods=['POST'])
+@admin_required
+def arizalar_ommaviy():
+    amal = request.form.get('amal')
+    if amal not in ('qabul', 'rad'):
+        flash('Noto\'g\'ri amal!', 'danger')
+        return redirect(url_for('arizalar_list'))
+    
+    ariza_ids = request.form.getlist('ids', type=int)
+    guruh_id = request.form.get('guruh_id', type=int)
+    if ariza_ids:
+        natijalar = arizalarni_ommaviy_korib_chiqish(amal, ariza_ids=ariza_ids, izoh=request.form.get('izoh'))
+    elif guruh_id:
+        natijalar = arizalarni_ommaviy_korib_chiqish(amal, guruh_id=guruh_id, limit=request.form.get('limit', type=int),
+                                                     izoh=request.form.get('izoh'))
+    else:
+        flash('Arizalarni yoki guruhni tanlang!', 'danger')
+        return redirect(url_for('arizalar_list'))
+    db.session.commit()
+    
+    jami = Counter(natija for _, natija in natijalar)
+    flash(f'{len(natijalar)} ta ariza ko\'rib chiqildi: {jami["qabul_qilindi"]} ta qabul qilindi, '
+          f'{jami["toldi"] + jami["rad_etildi"]} ta rad etildi.', 'success')
+    return render_template('arizalar_natija.html', natijalar=natijalar, jami=jami, nomlar=NATIJA_NOMLARI)
+
+@app.route('/admin/arizalar/navbat', methods=['POST'])
+@admin_required
+def arizalar_navbat():
+    guruh_id = request.form.get('guruh_id', type=int)
+    qabul_soni = navbatni_ishlash([guruh_id] if guruh_id else None)
+    db.session.commit()
+    flash(f'Navbat ishlandi: {len(qabul_soni)} ta guruhga {sum(qabul_soni.values())} ta talaba qabul qilindi.',
+          'success')
+    return redirect(url_for('arizalar_list', holat='kutilmoqda'))
+
 # ============= MENTOR ROUTES =============
 
 @app.route('/mentor/dashboard')
 @mentor_required
 def mentor_dashboard():
-    mentor = Mentor.query.filter_by(user_id=session['user_id']).first()
+    mentor = joriy_mentor()
     if not mentor:
         flash('Mentor profili topilmadi!', 'danger')
         return redirect(url_for('index'))
-    mening_guruhlar = Guruh.query.filter_by(mentor_id=mentor.id).all()
+    mening_guruhlar = guruhlar_query().filter_by(mentor_id=mentor.id).all()
     return render_template('mentor_dashboard.html', mentor=mentor, guruhlar=mening_guruhlar)
 
 @app.route('/mentor/profile')
 @mentor_required
 def mentor_profile():
-    mentor = Mentor.query.filter_by(user_id=session['user_id']).first()
+    mentor = joriy_mentor()
     return render_template('mentor_profile.html', mentor=mentor)
 
 @app.route('/mentor/profile/edit', methods=['GET', 'POST'])
 @mentor_required
 def mentor_profile_edit():
-    mentor = Mentor.query.filter_by(user_id=session['user_id']).first()
+    mentor = joriy_mentor()
     if request.method == 'POST':
         mentor.ism = request.form.get('ism')
         mentor.familiya = request.form.get('familiya')
@@ -484,7 +3844,7 @@ def mentor_profile_edit():
 @mentor_required
 def mentor_guruh_detail(id):
     guruh = Guruh.query.get_or_404(id)
-    mentor = Mentor.query.filter_by(user_id=session['user_id']).first()
+    mentor = joriy_mentor()
     
     if guruh.mentor_id != mentor.id and session.get('role') != 'admin':
         flash('Bu guruhga ruxsatingiz yo\'q!', 'danger')
@@ -497,7 +3857,7 @@ def mentor_guruh_detail(id):
 @app.route('/talaba/dashboard')
 @login_required
 def talaba_dashboard():
-    talaba = Talaba.query.filter_by(user_id=session['user_id']).first()
+    talaba = joriy_talaba()
     if not talaba:
         flash('Talaba profili topilmadi!', 'danger')
         return redirect(url_for('index'))
@@ -505,18 +3865,21 @@ def talaba_dashboard():
     # Talabaning arizalarini olish
     arizalar = GuruhAriza.query.filter_by(talaba_id=talaba.id).order_by(GuruhAriza.ariza_sana.desc()).all()
     
-    return render_template('talaba_dashboard.html', talaba=talaba, arizalar=arizalar)
+    yangi_xabarlar = db.session.scalar(db.select(db.func.count(Xabarnoma.id))
+                                       .where(Xabarnoma.user_id == talaba.user_id, Xabarnoma.oqilgan.is_(False)))
+    return render_template('talaba_dashboard.html', talaba=talaba, arizalar=arizalar,
+                           navbat=navbatdagi_orinlar(arizalar), yangi_xabarlar=yangi_xabarlar)
 
 @app.route('/talaba/profile')
 @login_required
 def talaba_profile():
-    talaba = Talaba.query.filter_by(user_id=session['user_id']).first()
+    talaba = joriy_talaba()
     return render_template('talaba_profile.html', talaba=talaba)
 
 @app.route('/talaba/profile/edit', methods=['GET', 'POST'])
 @login_required
 def talaba_profile_edit():
-    talaba = Talaba.query.filter_by(user_id=session['user_id']).first()
+    talaba = joriy_talaba()
     if request.method == 'POST':
         talaba.ism = request.form.get('ism')
         talaba.familiya = request.form.get('familiya')
@@ -531,8 +3894,10 @@ def talaba_profile_edit():
 
 @app.route('/talaba/guruhga-yozilish', methods=['GET', 'POST'])
 @login_required
+@sorov_cheklovi('yozilish_user')
 def guruhga_yozilish():
-    talaba = Talaba.query.filter_by(user_id=session['user_id']).first()
+    # Ariza yuborishda guruh_id kabi qarorga ta'sir qiluvchi maydonlar bazadan yangidan o'qiladi
+    talaba = joriy_talaba(yangilash=request.method == 'POST')
     if not talaba:
         flash('Talaba profili topilmadi!', 'danger')
         return redirect(url_for('talaba_dashboard'))
@@ -550,14 +3915,13 @@ def guruhga_yozilish():
             return redirect(url_for('guruhga_yozilish'))
         
         # Talaba bu guruhga necha marta ariza yuborganini tekshirish
-        ariza_soni = GuruhAriza.query.filter_by(talaba_id=talaba.id, guruh_id=guruh_id).count()
-        if ariza_soni >= 5:
-            flash('Bu guruhga 5 martadan ko\'p ariza yuborish mumkin emas!', 'danger')
+        ariza_soni, qabul_qilingan = talaba_ariza_statistikasi(talaba.id, [guruh.id]).get(guruh.id, (0, False))
+        if ariza_soni >= MAX_ARIZALAR:
+            flash(f'Bu guruhga {MAX_ARIZALAR} martadan ko\'p ariza yuborish mumkin emas!', 'danger')
             return redirect(url_for('guruhga_yozilish'))
         
         # Talaba allaqachon bu guruhga qabul qilinganmi tekshirish
-        qabul_qilingan_ariza = GuruhAriza.query.filter_by(talaba_id=talaba.id, guruh_id=guruh_id, holat='qabul_qilindi').first()
-        if qabul_qilingan_ariza:
+        if qabul_qilingan:
             flash('Bu guruhga allaqachon qabul qilingansiz!', 'warning')
             return redirect(url_for('guruhga_yozilish'))
         
@@ -566,35 +3930,43 @@ def guruhga_yozilish():
             flash('Siz allaqachon boshqa guruhdasiz!', 'warning')
             return redirect(url_for('guruhga_yozilish'))
         
-        # Guruh to'lganmi tekshirish
-        talabalar_soni = Talaba.query.filter_by(guruh_id=guruh_id).count()
-        if talabalar_soni >= guruh.max_talabalar:
+        # Guruh to'lganmi tekshirish (avtomatik qabul guruhlarida ariza kutish ro'yxatiga tushadi)
+        if guruh.talabalar_soni >= guruh.max_talabalar and not guruh.avtomatik_qabul:
             flash('Guruh to\'lgan!', 'warning')
             return redirect(url_for('guruhga_yozilish'))
         
         # Ariza yaratish
         ariza = GuruhAriza(
             talaba_id=talaba.id,
-            guruh_id=guruh_id,
-            holat='kutilmoqda'
+            guruh_id=guruh.id,
+            holat='kutilmoqda',
+            ustuvorlik=ariza_ustuvorligi(talaba, ariza_soni)
         )
         db.session.add(ariza)
-        db.session.commit()
-        flash('Ariza muvaffaqiyatli yuborildi! Administrator javobini kuting.', 'success')
+        db.session.commit()  # avtomatik qabul guruhida navbat shu commit ichida ishlanadi
+        if not guruh.avtomatik_qabul:
+            flash('Ariza muvaffaqiyatli yuborildi! Administrator javobini kuting.', 'success')
+        elif ariza.holat == 'qabul_qilindi':
+            flash(f'Tabriklaymiz! Siz {guruh.nomi} guruhiga qabul qilindingiz.', 'success')
+        elif ariza.holat == 'kutilmoqda':
+            flash(f'Guruh to\'lgan - siz kutish ro\'yxatidasiz '
+                  f'({navbatdagi_orinlar([ariza]).get(ariza.id)}-o\'rin). Joy bo\'shashi bilan qabul qilinasiz.', 'info')
+        else:
+            flash('Ariza yuborildi.', 'info')
         return redirect(url_for('talaba_dashboard'))
     
-    # Faol guruhlarni olish
-    guruhlar = Guruh.query.filter_by(holat='faol').all()
+    # Faol guruhlarni fan va mentor bilan birga olish
+    guruhlar = guruhlar_query().filter_by(holat='faol').order_by(Guruh.id).all()
     
-    # Har bir guruh uchun talabaning ariza sonini hisoblash
+    # Talabaning barcha arizalari statistikasi bitta so'rovda
+    statistika = talaba_ariza_statistikasi(talaba.id)
     guruhlar_with_ariza_count = []
     for guruh in guruhlar:
-        ariza_soni = GuruhAriza.query.filter_by(talaba_id=talaba.id, guruh_id=guruh.id).count()
-        qabul_qilingan = GuruhAriza.query.filter_by(talaba_id=talaba.id, guruh_id=guruh.id, holat='qabul_qilindi').first() is not None
+        ariza_soni, qabul_qilingan = statistika.get(guruh.id, (0, False))
         guruhlar_with_ariza_count.append({
             'guruh': guruh,
             'ariza_soni': ariza_soni,
-            'max_arizalar': 5,
+            'max_arizalar': MAX_ARIZALAR,
             'qabul_qilingan': qabul_qilingan
         })
     
@@ -604,18 +3976,93 @@ def guruhga_yozilish():
 @login_required
 def dars_jadvali(guruh_id):
     guruh = Guruh.query.get_or_404(guruh_id)
-    
-    # Kunlar tartibini belgilash
-    kunlar_tartibi = {
-        'Dushanba': 1, 'Seshanba': 2, 'Chorshanba': 3, 'Payshanba': 4,
-        'Juma': 5, 'Shanba': 6, 'Yakshanba': 7
-    }
-    
-    # Faol jadvallarni kunlar bo'yicha tartiblash
-    jadval = DarsJadvali.query.filter_by(guruh_id=guruh_id, holat='faol').all()
-    jadval = sorted(jadval, key=lambda x: kunlar_tartibi.get(x.kun, 8))
-    
-    return render_template('dars_jadvali.html', guruh=guruh, jadval=jadval)
+    jadval = haftalik_jadvallar.olish('guruh', guruh_id)
+    return render_template('dars_jadvali.html', guruh=guruh, jadval=jadval.darslar,
+                           ics_token=ics_tokeni('guruh', guruh_id))
+
+def haftalik_jadval_sahifasi(jadval, sarlavha):
+    """Haftalik jadval sahifasi: o'zgarmagan bo'lsa shablonni chizmasdan 304"""
+    ics_token = ics_tokeni(jadval.tur, jadval.kalit)
+    # Kutilayotgan flash xabarlari bo'lsa sahifa albatta chiziladi (aks holda xabar yo'qolmaydi, ko'rsatilmaydi)
+    if '_flashes' in session:
+        return render_template('haftalik_jadval.html', jadval=jadval, sarlavha=sarlavha, ics_token=ics_token)
+    # Navigatsiya foydalanuvchi roliga, .ics havolasi uning versiyasiga bog'liq - ETag ham shularga bog'lanadi
+    etag = hashlib.sha1(f'{jadval.etag}:{session.get("user_id")}:{session.get("role")}:{ics_token}'
+                        .encode()).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        javob = Response(status=304)
+    else:
+        javob = Response(render_template('haftalik_jadval.html', jadval=jadval, sarlavha=sarlavha,
+                                         ics_token=ics_token))
+    javob.cache_control.private = True
+    return shartli_javob(javob, etag)
+
+@app.route('/talaba/jadval')
+@login_required
+def talaba_jadvali():
+    talaba = joriy_talaba()
+    if not talaba:
+        flash('Talaba profili topilmadi!', 'danger')
+        return redirect(url_for('index'))
+    if not talaba.guruh_id:
+        flash('Siz hali hech qaysi guruhga qabul qilinmagansiz!', 'info')
+        return redirect(url_for('talaba_dashboard'))
+    return haftalik_jadval_sahifasi(haftalik_jadvallar.olish('guruh', talaba.guruh_id), 'Mening dars jadvalim')
+
+@app.route('/mentor/jadval')
+@mentor_required
+def mentor_jadvali():
+    mentor_id = request.args.get('mentor_id', type=int)
+    if mentor_id and session.get('role') == 'admin':
+        mentor = Mentor.query.get_or_404(mentor_id)
+    else:
+        mentor = joriy_mentor()
+    if not mentor:
+        flash('Mentor profili topilmadi!', 'danger')
+        return redirect(url_for('index'))
+    return haftalik_jadval_sahifasi(haftalik_jadvallar.olish('mentor', mentor.id),
+                                    f'{mentor.ism} {mentor.familiya} - haftalik jadval')
+
+@app.route('/jadval/xona/<path:xona>')
+@mentor_required
+def xona_jadvali(xona):
+    return haftalik_jadval_sahifasi(haftalik_jadvallar.olish('xona', xona), f'{xona} xonasi - haftalik jadval')
+
+@app.route('/jadval/<token>.ics')
+def jadval_ics(token):
+    """iCalendar obunasi: login o'rniga imzolangan token, o'zgarmagan bo'lsa 304"""
+    kalit = ics_tokenini_oqish(token)
+    if kalit is None:
+        return Response('Havola noto\'g\'ri\n', status=404, mimetype='text/plain')
+    jadval = haftalik_jadvallar.olish(*kalit)
+    nomi = 'EduCenter dars jadvali'
+    if jadval.tur == 'guruh' and jadval.darslar:
+        nomi += f' - {jadval.darslar[0].guruh_nomi}'
+    elif jadval.tur == 'xona':
+        nomi += f' - {jadval.kalit}'
+    javob = Response(ics_qatorlari(jadval, nomi), mimetype='text/calendar')
+    javob.headers['Content-Disposition'] = 'inline; filename="jadval.ics"'
+    return shartli_javob(javob, jadval.etag, jadval.oxirgi_ozgarish)
+
+@app.route('/admin/jadval/ics-yangilash', methods=['POST'])
+@admin_required
+def jadval_ics_yangilash():
+    """Tarqalib ketgan .ics havolasini bekor qilib, yangisini berish"""
+    tur = request.form.get('tur')
+    kalit = request.form.get('kalit', '')
+    if tur not in JADVAL_TURLARI or not kalit or (tur != 'xona' and not kalit.isdigit()):
+        flash('Jadval noto\'g\'ri ko\'rsatilgan!', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    if tur != 'xona':
+        kalit = (Guruh if tur == 'guruh' else Mentor).query.get_or_404(int(kalit)).id
+    ics_havolasini_yangilash(tur, kalit)
+    db.session.commit()
+    flash('Kalendar havolasi yangilandi: avvalgi havolalar endi ishlamaydi.', 'success')
+    if tur == 'guruh':
+        return redirect(url_for('dars_jadvali', guruh_id=kalit))
+    if tur == 'mentor':
+        return redirect(url_for('mentor_jadvali', mentor_id=kalit))
+    return redirect(url_for('xona_jadvali', xona=kalit))
 
 @app.route('/admin/jadval/add/<int:guruh_id>', methods=['GET', 'POST'])
 @admin_required
@@ -649,7 +4096,7 @@ def jadval_add(guruh_id):
             
             # Kunlarni aniqlash
             if kun_turi == 'barcha':
-                tanlangan_kunlar = ['Dushanba', 'Seshanba', 'Chorshanba', 'Payshanba', 'Juma', 'Shanba', 'Yakshanba']
+                tanlangan_kunlar = KUNLAR
             elif kun_turi == 'juft':
                 tanlangan_kunlar = ['Dushanba', 'Chorshanba', 'Juma', 'Yakshanba']
             elif kun_turi == 'toq':
@@ -659,12 +4106,19 @@ def jadval_add(guruh_id):
             
             # Har bir kun uchun jadval yaratish
             yaratilgan_jadval = 0
+            band_kunlar = []
             for kun in tanlangan_kunlar:
                 # Shu kunda vaqtlar mos kelmasligini tekshirish
                 existing_jadval = DarsJadvali.query.filter_by(guruh_id=guruh_id, kun=kun, holat='faol').first()
                 if existing_jadval:
                     continue  # Bu kun uchun jadval mavjud, o'tkazib yuborish
                 
+                # Xona yoki mentor shu vaqtda boshqa guruh bilan bandmi
+                konfliktlar = jadval_indeksi.konfliktlar(guruh.id, kun, boshlanish_vaqti, tugash_vaqti, xona)
+                if konfliktlar:
+                    band_kunlar.append(f'{kun}: {konflikt_tavsifi(konfliktlar)}')
+                    continue
+                
                 jadval = DarsJadvali(
                     guruh_id=guruh_id,
                     kun=kun,
@@ -678,6 +4132,8 @@ def jadval_add(guruh_id):
             
             db.session.commit()
             flash(f'{yaratilgan_jadval} ta dars jadvali muvaffaqiyatli qo\'shildi!', 'success')
+            if band_kunlar:
+                flash('Quyidagi kunlar band bo\'lgani uchun qo\'shilmadi: ' + ' | '.join(band_kunlar), 'warning')
             return redirect(url_for('dars_jadvali', guruh_id=guruh_id))
             
         except ValueError:
@@ -687,8 +4143,7 @@ def jadval_add(guruh_id):
             flash(f'Xatolik yuz berdi: {str(e)}', 'danger')
             return redirect(url_for('jadval_add', guruh_id=guruh_id))
     
-    kunlar = ['Dushanba', 'Seshanba', 'Chorshanba', 'Payshanba', 'Juma', 'Shanba', 'Yakshanba']
-    return render_template('jadval_form.html', guruh=guruh, kunlar=kunlar)
+    return render_template('jadval_form.html', guruh=guruh, kunlar=KUNLAR)
 
 @app.route('/admin/jadval/delete/<int:id>')
 @admin_required
@@ -698,6 +4153,7 @@ def jadval_delete(id):
     
     # Jadvalni bekor qilish (o'chirish o'rniga holatini o'zgartirish)
     jadval.holat = 'bekor_qilindi'
+    jadval_xabari(jadval, 'dars_bekor')  # guruh talabalari va mentoriga
     db.session.commit()
     flash('Dars jadvali bekor qilindi!', 'info')
     return redirect(url_for('dars_jadvali', guruh_id=guruh_id))
@@ -708,18 +4164,238 @@ def jadval_restore(id):
     jadval = DarsJadvali.query.get_or_404(id)
     guruh_id = jadval.guruh_id
     
+    # Qayta faollashtirishdan oldin xona va mentor bandligini tekshirish
+    konfliktlar = jadval_indeksi.konfliktlar(guruh_id, jadval.kun, jadval.boshlanish_vaqti, jadval.tugash_vaqti,
+                                             jadval.xona, istisno=jadval.id)
+    if konfliktlar:
+        flash(f'Dars jadvalini faollashtirib bo\'lmaydi: {konflikt_tavsifi(konfliktlar)}', 'danger')
+        return redirect(url_for('dars_jadvali', guruh_id=guruh_id))
+    
     # Jadvalni qayta faollashtirish
     jadval.holat = 'faol'
+    jadval_xabari(jadval, 'dars_tiklandi')
     db.session.commit()
     flash('Dars jadvali qayta faollashtirildi!', 'success')
     return redirect(url_for('dars_jadvali', guruh_id=guruh_id))
 
+@app.route('/admin/jadval/tekshirish')
+@admin_required
+def jadval_tekshirish():
+    """Butun dars jadvalidagi xona va mentor konfliktlari"""
+    if request.args.get('qayta_qurish'):
+        jadval_indeksi.qurish()
+    konfliktlar = jadval_indeksi.barcha_konfliktlar()
+    jadval_ids = {jadval_id for *_, a, b in konfliktlar for jadval_id in (a, b)}
+    darslar = {}
+    for i in range(0, len(jadval_ids), SQL_BOLAK):
+        bolak = list(jadval_ids)[i:i + SQL_BOLAK]
+        darslar.update((jadval.id, jadval) for jadval in DarsJadvali.query.options(
+            joinedload(DarsJadvali.guruh).joinedload(Guruh.mentor)).filter(DarsJadvali.id.in_(bolak)))
+    konfliktlar.sort(key=lambda k: (KUNLAR.index(k[2]) if k[2] in KUNLAR else 7, str(k[1])))
+    return render_template('jadval_tekshirish.html', konfliktlar=konfliktlar, darslar=darslar,
+                           darslar_soni=len(jadval_indeksi.darslar))
+
+# ============= XABARLAR QUTISI =============
+
+@app.route('/xabarlar')
+@login_required
+def xabarlar():
+    xabarlar = keyset_sahifa(Xabarnoma.query.filter_by(user_id=session['user_id']), Xabarnoma,
+                             {'id': Xabarnoma.id}, 'id', 'desc')
+    yangi = {xabar.id for xabar in xabarlar if not xabar.oqilgan}
+    # Sahifa commitdan oldin render qilinadi: commit obyektlarni eskirtiradi va har biri qayta o'qilardi
+    javob = render_template('xabarlar.html', xabarlar=xabarlar, yangi=yangi)
+    if yangi:
+        _bolaklab_yangilash(Xabarnoma, list(yangi), oqilgan=True)
+        db.session.commit()
+    return javob
+
+# ============= API ROUTES =============
+
+API_MANBA_QOIDASI = f'/api/{API_VERSIYASI}/<any({", ".join(API_MANBALARI)}):nomi>'
+
+@app.route(API_MANBA_QOIDASI)
+@api_login_required
+def api_royxat(nomi):
+    """Manba ro'yxati: ?fields=, filtrlar, ?sort=&dir=, ?limit=&after= (keyset kursor)"""
+    manba = API_MANBALARI[nomi]
+    try:
+        nomlar = api_maydon_nomlari(manba)
+    except ValueError as e:
+        return api_xato(str(e), 400)
+    natijalar, keyingi, limit = api_sahifasi(manba, nomlar)
+    return api_javobi({'natijalar': natijalar, 'keyingi': keyingi, 'limit': limit})
+
+@app.route(f'{API_MANBA_QOIDASI}/<int:id>')
+@api_login_required
+def api_obyekt(nomi, id):
+    manba = API_MANBALARI[nomi]
+    try:
+        nomlar = api_maydon_nomlari(manba)
+    except ValueError as e:
+        return api_xato(str(e), 400)
+    row = db.session.execute(api_sorovi(manba, nomlar).where(manba.model.id == id)).first()
+    if row is None:
+        return api_xato('Topilmadi', 404)
+    return api_javobi(dict(zip(nomlar, row)))
+
+@app.route(f'/api/{API_VERSIYASI}/qidiruv')
+def api_qidiruv():
+    """?q= bo'yicha [{tur, id, nomi}, ...] - faqat admin uchun"""
+    if 'user_id' not in session:
+        return api_xato('Avtorizatsiya talab qilinadi', 401)
+    if session.get('role') != 'admin':
+        return api_xato('Ruxsat yo\'q', 403)
+    tur = request.args.get('tur')
+    limit = max(1, min(request.args.get('limit', QIDIRUV_LIMITI, type=int), MAX_SAHIFA_HAJMI))
+    natijalar = qidirish(request.args.get('q', ''), [tur] if tur else None, limit)
+    return api_javobi({'natijalar': [
+        {'tur': tur, 'id': obyekt.id,
+         'nomi': f'{obyekt.ism} {obyekt.familiya}' if tur in ('talaba', 'mentor') else obyekt.nomi}
+        for tur, obyekt in natijalar]})
+
+# ============= MONITORING =============
+
+@app.route('/admin/instrumentatsiya')
+@admin_required
+def instrumentatsiya():
+    return render_template('instrumentatsiya.html', hisobot=sorov_statistikasi.hisobot(),
+                           yoqilgan=app.config['INSTRUMENTATSIYA'], fragmentlar=fragment_keshi.holat())
+
+@app.route('/admin/instrumentatsiya/tozalash')
+@admin_required
+def instrumentatsiya_tozalash():
+    sorov_statistikasi.tozalash()
+    fragment_keshi.tozalash(faqat_hisob=True)
+    flash('Statistika tozalandi!', 'info')
+    return redirect(url_for('instrumentatsiya'))
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus uchun: Bearer token yoki admin sessiyasi
+    token = app.config['METRICS_TOKEN']
+    if not (token and request.headers.get('Authorization') == f'Bearer {token}') \
+            and session.get('role') != 'admin':
+        return Response('Ruxsat yo\'q\n', status=403, mimetype='text/plain')
+    return Response(sorov_statistikasi.prometheus() + fragment_keshi.prometheus(),
+                    mimetype='text/plain; version=0.0.4')
+
 # ============= DATABASE INIT =============
 
+def sxemani_yangilash():
+    """Jadvallarni yaratish va eski bazaga yetishmayotgan ustun/indekslarni qo'shish.
+
+    db.create_all() faqat yangi jadvallarni yaratadi, mavjudlariga tegmaydi.
+    Qo'shilgan ustunlar ro'yxatini ((jadval, ustun), ...) qaytaradi.
+    """
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    qoshilgan = []
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            mavjud = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in mavjud:
+                    continue
+                ddl = (f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN '
+                       f'{preparer.format_column(column)} {column.type.compile(db.engine.dialect)}')
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                    if not column.nullable:
+                        ddl += ' NOT NULL'
+                conn.execute(db.text(ddl))
+                qoshilgan.append((table.name, column.name))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        if qidiruv_jadvalini_yaratish(conn):
+            qidiruv_indeksini_qurish(conn)
+            qoshilgan.append((QIDIRUV_JADVALI, 'fts5'))
+    return qoshilgan
+
+def talabalar_sonini_hisoblash():
+    """Guruh.talabalar_soni ni Talaba jadvalidan bitta UPDATE bilan qayta hisoblash"""
+    soni = (db.select(db.func.count(Talaba.id))
+            .where(Talaba.guruh_id == Guruh.id)
+            .scalar_subquery())
+    result = db.session.execute(db.update(Guruh).values(talabalar_soni=soni))
+    db.session.commit()
+    return result.rowcount
+
+@app.cli.command('navbatni-ishlash')
+@click.option('--guruh', 'guruh_id', type=int, default=None, help='Faqat shu guruh (aks holda barcha avtomatik guruhlar)')
+def navbatni_ishlash_buyrugi(guruh_id):
+    """Avtomatik qabul guruhlaridagi bo'sh joylarni navbat bo'yicha to'ldirish"""
+    boshlanish = perf_counter()
+    qabul_soni = navbatni_ishlash([guruh_id] if guruh_id else None)
+    db.session.commit()
+    print(f'{len(qabul_soni)} ta guruhga {sum(qabul_soni.values())} ta talaba qabul qilindi '
+          f'({perf_counter() - boshlanish:.2f} soniya)')
+
+@app.cli.command('vazifa-ishchisi')
+@click.option('--ishchilar', type=int, default=2, show_default=True, help='Ishchi oqimlar soni')
+def vazifa_ishchisi(ishchilar):
+    """Fon vazifalarini bajaruvchi alohida jarayon (Ctrl+C - to'xtatish)"""
+    vazifa_ishchilari.ishga_tushirish(ishchilar)
+    print(f'{ishchilar} ta vazifa ishchisi ishlamoqda (PID {os.getpid()})')
+    try:
+        while True:
+            sleep(3600)
+    except KeyboardInterrupt:
+        print('To\'xtatilmoqda: joriy vazifalar yakunlanishi kutiladi...')
+        vazifa_ishchilari.toxtatish()
+
+@app.cli.command('xabar-dispetcheri')
+def xabar_dispetcheri_buyrugi():
+    """Outbox xabarlarini kanallarga yetkazuvchi alohida jarayon (Ctrl+C - to'xtatish)"""
+    xabar_dispetcheri.ishga_tushirish(majburiy=True)
+    print(f'Xabar dispetcheri ishlamoqda (PID {os.getpid()}), kanallar: {", ".join(app.config["XABAR_KANALLARI"])}')
+    try:
+        while True:
+            sleep(3600)
+    except KeyboardInterrupt:
+        print('To\'xtatilmoqda: joriy partiya yakunlanishi kutiladi...')
+        xabar_dispetcheri.toxtatish()
+
+@app.cli.command()
+def migrate_db():
+    """Mavjud bazani joriy modellarga moslashtirish"""
+    qoshilgan = sxemani_yangilash()
+    for jadval, ustun in qoshilgan:
+        if jadval == QIDIRUV_JADVALI:
+            print('Qidiruv indeksi yaratildi')
+        else:
+            print(f'Ustun qo\'shildi: {jadval}.{ustun}')
+    if ('guruh', 'talabalar_soni') in qoshilgan:
+        talabalar_sonini_hisoblash()
+    print('Ma\'lumotlar bazasi yangilandi!')
+
+@app.cli.command()
+def query_plans():
+    """Asosiy so'rovlarning SQLite bajarilish rejasini ko'rsatish"""
+    if db.engine.dialect.name != 'sqlite':
+        print('Bu buyruq faqat SQLite uchun')
+        return
+    sorovlar = {
+        'talaba profili': Talaba.query.filter_by(user_id=1),
+        'mentor profili': Mentor.query.filter_by(user_id=1),
+        'guruh talabalari': Talaba.query.filter_by(guruh_id=1),
+        'mentor guruhlari': Guruh.query.filter_by(mentor_id=1),
+        'faol guruhlar': Guruh.query.filter_by(holat='faol'),
+        'talaba arizalari': GuruhAriza.query.filter_by(talaba_id=1, guruh_id=1, holat='qabul_qilindi'),
+        'kutilayotgan arizalar': GuruhAriza.query.filter_by(holat='kutilmoqda').order_by(GuruhAriza.ariza_sana.desc()),
+        'guruh jadvali': DarsJadvali.query.filter_by(guruh_id=1, kun='Dushanba', holat='faol'),
+    }
+    for nomi, query in sorovlar.items():
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        print(f'-- {nomi}')
+        for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')):
+            print(f'   {row[-1]}')
+
 @app.cli.command()
 def init_db():
     """Ma'lumotlar bazasini yaratish"""
-    db.create_all()
+    sxemani_yangilash()
     
     # Eski admin foydalanuvchisini o'chirish (agar mavjud bo'lsa)
     old_admin = User.query.filter_by(username='admin').first()
@@ -738,9 +4414,986 @@ def init_db():
     
     print('Ma\'lumotlar bazasi yaratildi!')
 
+@app.cli.command()
+def sync_talabalar_soni():
+    """Guruh.talabalar_soni hisoblagichini Talaba jadvalidan qayta hisoblash"""
+    sxemani_yangilash()
+    print(f'{talabalar_sonini_hisoblash()} ta guruh hisoblagichi yangilandi')
+
+@app.cli.command()
+def qidiruv_indeksi():
+    """FTS5 qidiruv indeksini yaratish va qayta qurish"""
+    with db.engine.begin() as conn:
+        if conn.dialect.name != 'sqlite':
+            print('Qidiruv indeksi faqat SQLite uchun (boshqa bazalarda LIKE ishlatiladi)')
+            return
+        qidiruv_jadvalini_yaratish(conn)
+        if not qidiruv_yoqilganmi(conn):
+            print('SQLite FTS5 kengaytmasisiz yig\'ilgan')
+            return
+        boshlanish = perf_counter()
+        soni = qidiruv_indeksini_qurish(conn)
+    print(f'{soni} ta obyekt {perf_counter() - boshlanish:.1f} soniyada indekslandi')
+
+@app.cli.command()
+@click.argument('fayl', type=click.Path(exists=True, dir_okay=False))
+@click.option('--jarayonlar', default=None, type=int, help='Parol xeshlash jarayonlari (standart: IMPORT_JARAYONLARI)')
+@click.option('--xesh-usuli', default=None, help='Parol xeshlash usuli (standart: PAROL_XESH_USULI)')
+@click.option('--tekshirish', is_flag=True, help='Faqat tekshirish, bazaga yozmaslik')
+def import_talabalar(fayl, jarayonlar, xesh_usuli, tekshirish):
+    """CSV fayldan talabalarni ommaviy qo'shish (username,email,parol,ism,familiya[,telefon,manzil,tug_sana])"""
+    sxemani_yangilash()
+    with open(fayl, encoding='utf-8-sig', newline='') as f:
+        natija = talabalarni_import_qilish(f, jarayonlar=jarayonlar, xesh_usuli=xesh_usuli,
+                                           faqat_tekshirish=tekshirish)
+    for qator, xabar in natija.xatolar:
+        print(f'{qator}-qator: {xabar}')
+    if natija.xatolar_soni > len(natija.xatolar):
+        print(f'... yana {natija.xatolar_soni - len(natija.xatolar)} ta xato')
+    amal = 'yaroqli' if tekshirish else 'qo\'shildi'
+    print(f'{natija.qatorlar} ta qator, {natija.qoshilgan} ta {amal}, {natija.xatolar_soni} ta xato; '
+          f'{natija.davomiylik:.2f} soniya ({natija.tezlik:.0f} qator/soniya)')
+
+# ============= JADVAL YECHUVCHI =============
+# Faol guruhlarni xona va vaqtlarga avtomatik joylashtirish. Har bir guruh
+# haftalik darslari juft (Du/Chor/Ju) yoki toq (Se/Pay/Sha) kunlarda bir xil
+# vaqtda o'tadigan "blok"larga bo'linadi. Avval ochko'z (greedy) joylashtirish,
+# so'ng vaqt chegarasigacha min-conflicts lokal qidiruvi ishlaydi.
+
+class JadvalYechuvchi:
+    """Xona, mentor va guruh bandligini hisobga olib bloklarni joylashtiradi"""
+
+    def __init__(self, bloklar, xonalar, kun_naqshlari, vaqtlar_soni, seed=42,
+                 band_xonalar=(), band_mentorlar=()):
+        # bloklar: [(guruh_id, mentor_id, kunlar_soni), ...]
+        self.bloklar = bloklar
+        self.xonalar = sorted(xonalar)
+        self.kun_naqshlari = kun_naqshlari
+        self.vaqtlar = range(vaqtlar_soni)
+        self.rnd = random.Random(seed)
+        self.joylashuv = {}  # blok -> (naqsh, vaqt, xona)
+        self.xona_band = {(xona, kun, vaqt): None for xona, kun, vaqt in band_xonalar}
+        self.mentor_band = {(mentor, kun, vaqt): None for mentor, kun, vaqt in band_mentorlar}
+        self.guruh_band = {}
+        self.iteratsiyalar = 0
+
+    def _kunlar(self, blok, naqsh):
+        return self.kun_naqshlari[naqsh][:self.bloklar[blok][2]]
+
+    def _katakchalar(self, blok, naqsh, vaqt, xona):
+        guruh_id, mentor_id, _ = self.bloklar[blok]
+        for kun in self._kunlar(blok, naqsh):
+            yield self.xona_band, (xona, kun, vaqt)
+            if mentor_id:
+                yield self.mentor_band, (mentor_id, kun, vaqt)
+            yield self.guruh_band, (guruh_id, kun)
+
+    def _toqnashuvlar(self, blok, naqsh, vaqt, xona):
+        """Joylashuvga xalaqit beradigan bloklar; None - o'zgarmas band (masalan, boshqa guruh darsi)"""
+        natija = set()
+        for jadval, kalit in self._katakchalar(blok, naqsh, vaqt, xona):
+            if kalit in jadval and jadval[kalit] != blok:
+                natija.add(jadval[kalit])
+        return natija
+
+    def _joylash(self, blok, joy):
+        self.joylashuv[blok] = joy
+        for jadval, kalit in self._katakchalar(blok, *joy):
+            jadval[kalit] = blok
+
+    def _olib_tashlash(self, blok):
+        joy = self.joylashuv.pop(blok)
+        for jadval, kalit in self._katakchalar(blok, *joy):
+            del jadval[kalit]
+
+    def _joylar(self, blok):
+        naqshlar = list(self.kun_naqshlari)
+        vaqtlar = list(self.vaqtlar)
+        self.rnd.shuffle(naqshlar)
+        self.rnd.shuffle(vaqtlar)
+        for naqsh in naqshlar:
+            for vaqt in vaqtlar:
+                yield naqsh, vaqt
+
+    def _bosh_joy(self, blok):
+        for naqsh, vaqt in self._joylar(blok):
+            guruh_id, mentor_id, _ = self.bloklar[blok]
+            kunlar = self._kunlar(blok, naqsh)
+            if any((guruh_id, kun) in self.guruh_band or (mentor_id and (mentor_id, kun, vaqt) in self.mentor_band)
+                   for kun in kunlar):
+                continue
+            for xona in self.xonalar:
+                if not any((xona, kun, vaqt) in self.xona_band for kun in kunlar):
+                    return naqsh, vaqt, xona
+        return None
+
+    def _eng_yaxshi_joy(self, blok, tabu):
+        """Eng kam blokni siqib chiqaradigan joy (o'zgarmas bandlik bilan to'qnashmaydigan)"""
+        eng_yaxshi, eng_kam = None, None
+        for naqsh, vaqt in self._joylar(blok):
+            for xona in self.xonalar:
+                joy = (naqsh, vaqt, xona)
+                if (blok, joy) in tabu:
+                    continue
+                toqnashuvlar = self._toqnashuvlar(blok, *joy)
+                if None in toqnashuvlar:
+                    continue
+                if eng_kam is None or len(toqnashuvlar) < eng_kam:
+                    eng_yaxshi, eng_kam = (joy, toqnashuvlar), len(toqnashuvlar)
+                    if eng_kam <= 1:
+                        return eng_yaxshi
+        return eng_yaxshi
+
+    def yechish(self, vaqt_chegarasi):
+        tugash = monotonic() + vaqt_chegarasi
+        # Qiyin bloklar (ko'p kunli, band mentorli) birinchi joylashtiriladi
+        mentor_yuki = Counter(mentor_id for _, mentor_id, _ in self.bloklar if mentor_id)
+        tartib = sorted(range(len(self.bloklar)),
+                        key=lambda b: (-self.bloklar[b][2], -mentor_yuki.get(self.bloklar[b][1], 0), b))
+        joylanmagan = []
+        for blok in tartib:
+            joy = self._bosh_joy(blok)
+            if joy:
+                self._joylash(blok, joy)
+            else:
+                joylanmagan.append(blok)
+
+        eng_yaxshi = (len(joylanmagan), dict(self.joylashuv))
+        tabu = deque(maxlen=50)
+        while joylanmagan and monotonic() < tugash:
+            self.iteratsiyalar += 1
+            blok = joylanmagan.pop(self.rnd.randrange(len(joylanmagan)))
+            topildi = self._eng_yaxshi_joy(blok, set(tabu))
+            if topildi is None:
+                joylanmagan.append(blok)
+                continue
+            joy, toqnashuvlar = topildi
+            for boshqa in toqnashuvlar:
+                tabu.append((boshqa, self.joylashuv[boshqa]))
+                self._olib_tashlash(boshqa)
+            self._joylash(blok, joy)
+            for boshqa in toqnashuvlar:
+                bosh_joy = self._bosh_joy(boshqa)
+                if bosh_joy:
+                    self._joylash(boshqa, bosh_joy)
+                else:
+                    joylanmagan.append(boshqa)
+            if len(joylanmagan) < eng_yaxshi[0]:
+                eng_yaxshi = (len(joylanmagan), dict(self.joylashuv))
+
+        if len(joylanmagan) > eng_yaxshi[0]:
+            return eng_yaxshi[1]
+        return dict(self.joylashuv)
+
+def _xonalar_royxati(matn):
+    """'101-110,201,Lab' ko'rinishidagi matnni xonalar ro'yxatiga aylantirish"""
+    xonalar = []
+    for qism in (matn or '').split(','):
+        qism = qism.strip()
+        if not qism:
+            continue
+        boshi, _, oxiri = qism.partition('-')
+        if oxiri and boshi.isdigit() and oxiri.isdigit():
+            xonalar.extend(str(x) for x in range(int(boshi), int(oxiri) + 1))
+        else:
+            xonalar.append(qism)
+    return xonalar
+
+@app.cli.command()
+@click.option('--xonalar', default=None, help="Xonalar: '101-120,201-220'. Berilmasa mavjud jadvaldagi xonalar")
+@click.option('--haftalar', default=12, help='Kurs davomiyligi (hafta): Fan.davomiyligi haftalarga bo\'linadi')
+@click.option('--vaqt', 'vaqt_chegarasi', default=60.0, help='Lokal qidiruv uchun vaqt chegarasi (soniya)')
+@click.option('--seed', default=42, help='Tasodifiy sonlar generatori uchun seed')
+@click.option('--saqlash', is_flag=True, help='Natijani bazaga yozish (aks holda faqat hisobot)')
+def solve_timetable(xonalar, haftalar, vaqt_chegarasi, seed, saqlash):
+    """Faol guruhlar uchun konfliktsiz dars jadvalini avtomatik tuzish"""
+    boshlanish = monotonic()
+    dars_daqiqasi = _daqiqa(DARS_VAQTLARI[0][1]) - _daqiqa(DARS_VAQTLARI[0][0])
+    guruhlar = db.session.execute(
+        db.select(Guruh.id, Guruh.mentor_id, Fan.davomiyligi).join(Fan, Guruh.fan_id == Fan.id)
+        .where(Guruh.holat == 'faol').order_by(Guruh.id)).all()
+    faol_guruh_ids = {guruh_id for guruh_id, _, _ in guruhlar}
+
+    xona_royxati = _xonalar_royxati(xonalar) or sorted(
+        {xona for xona in db.session.scalars(db.select(DarsJadvali.xona).distinct()) if xona})
+    if not xona_royxati:
+        print('Xonalar topilmadi: --xonalar parametrini bering')
+        return
+
+    bloklar = []
+    for guruh_id, mentor_id, davomiyligi in guruhlar:
+        # Haftalik darslar soni: 1 dan 6 gacha, har bir blokda ko'pi bilan 3 kun
+        darslar = min(6, max(1, ceil(davomiyligi * 60 / haftalar / dars_daqiqasi))) if davomiyligi else 3
+        while darslar > 0:
+            bloklar.append((guruh_id, mentor_id, min(3, darslar)))
+            darslar -= 3
+
+    # Faol bo'lmagan guruhlarning faol darslari o'zgarmas bandlik sifatida qoladi
+    vaqt_indeksi = {boshlanish_vaqti: i for i, (boshlanish_vaqti, _) in enumerate(DARS_VAQTLARI)}
+    band_xonalar, band_mentorlar = [], []
+    for xona, kun, boshlanish_vaqti, mentor_id in db.session.execute(
+            db.select(DarsJadvali.xona, DarsJadvali.kun, DarsJadvali.boshlanish_vaqti, Guruh.mentor_id)
+            .join(Guruh, DarsJadvali.guruh_id == Guruh.id)
+            .where(DarsJadvali.holat == 'faol', Guruh.holat != 'faol')):
+        if boshlanish_vaqti in vaqt_indeksi:
+            band_xonalar.append((xona, kun, vaqt_indeksi[boshlanish_vaqti]))
+            if mentor_id:
+                band_mentorlar.append((mentor_id, kun, vaqt_indeksi[boshlanish_vaqti]))
+
+    yechuvchi = JadvalYechuvchi(bloklar, xona_royxati, {'juft': JUFT_KUNLAR, 'toq': TOQ_KUNLAR},
+                                len(DARS_VAQTLARI), seed=seed,
+                                band_xonalar=band_xonalar, band_mentorlar=band_mentorlar)
+    joylashuv = yechuvchi.yechish(vaqt_chegarasi)
+    joylanmagan = sorted({bloklar[blok][0] for blok in range(len(bloklar)) if blok not in joylashuv})
+    print(f'{len(guruhlar)} ta guruh, {len(bloklar)} ta blok, {len(xona_royxati)} ta xona')
+    print(f'Joylashtirildi: {len(joylashuv)} ta blok, joylanmadi: {len(bloklar) - len(joylashuv)} ta '
+          f'({yechuvchi.iteratsiyalar} iteratsiya, {monotonic() - boshlanish:.1f} soniya)')
+    if joylanmagan:
+        print(f'Joy topilmagan guruhlar: {", ".join(map(str, joylanmagan[:50]))}'
+              f'{" ..." if len(joylanmagan) > 50 else ""}')
+
+    if not saqlash:
+        print('Bazaga yozish uchun --saqlash parametrini bering')
+        return
+    hozir = datetime.utcnow()
+    faol_ids = sorted(faol_guruh_ids)
+    for i in range(0, len(faol_ids), SQL_BOLAK):
+        db.session.execute(
+            db.update(DarsJadvali)
+            .where(DarsJadvali.guruh_id.in_(faol_ids[i:i + SQL_BOLAK]), DarsJadvali.holat == 'faol')
+            .values(holat='bekor_qilindi'))
+    rows = []
+    for blok, (naqsh, vaqt, xona) in joylashuv.items():
+        boshlanish_vaqti, tugash_vaqti = DARS_VAQTLARI[vaqt]
+        for kun in yechuvchi._kunlar(blok, naqsh):
+            rows.append({'guruh_id': bloklar[blok][0], 'kun': kun, 'boshlanish_vaqti': boshlanish_vaqti,
+                         'tugash_vaqti': tugash_vaqti, 'xona': xona, 'holat': 'faol', 'yaratilgan_sana': hozir})
+    for bolak in _boluklar(rows, 10000):
+        db.session.execute(db.insert(DarsJadvali), bolak)
+    db.session.commit()
+    print(f'{len(rows)} ta dars jadvali yozildi')
+
+# ============= SINOV MA'LUMOTLARI VA BENCHMARK =============
+
+ISMLAR = ['Azamat', 'Bekzod', 'Dilnoza', 'Jasur', 'Kamola', 'Laylo', 'Madina', 'Nodir',
+          'Otabek', 'Sardor', 'Shahzoda', 'Temur', 'Umida', 'Zarina', 'Javohir', 'Malika']
+FAMILIYALAR = ['Aliyev', 'Karimov', 'Rahimov', 'Tojiyev', 'Yusupov', 'Qodirov', 'Nazarov',
+               'Ergashev', 'Sobirov', 'Usmonov', 'Xolmatov', 'Mirzayev']
+FAN_NOMLARI = ['Python', 'Matematika', 'Ingliz tili', 'Fizika', 'Kimyo', 'Biologiya',
+               'Frontend', 'Backend', 'Grafik dizayn', 'Rus tili', 'Tarix', 'Mobil dasturlash']
+MUTAXASSISLIKLAR = ['Dasturlash', 'Aniq fanlar', 'Tillar', 'Tabiiy fanlar', 'Dizayn']
+
+def _boluklar(iterable, hajm):
+    bolak = []
+    for item in iterable:
+        bolak.append(item)
+        if len(bolak) >= hajm:
+            yield bolak
+            bolak = []
+    if bolak:
+        yield bolak
+
+def _ommaviy_qoshish(model, rows, hajm=10000, ids=False):
+    """Qatorlarni executemany bilan bo'laklab qo'shish; ids=True bo'lsa yangi id lar qaytadi"""
+    yangi_ids = []
+    for bolak in _boluklar(rows, hajm):
+        if ids:
+            stmt = db.insert(model).returning(model.id, sort_by_parameter_order=True)
+            yangi_ids.extend(db.session.scalars(stmt, bolak))
+        else:
+            db.session.execute(db.insert(model), bolak)
+        db.session.commit()
+    return yangi_ids
+
+@app.cli.command()
+@click.option('--fanlar', default=50, help='Fanlar soni')
+@click.option('--mentorlar', default=500, help='Mentorlar soni')
+@click.option('--guruhlar', default=2000, help='Guruhlar soni')
+@click.option('--talabalar', default=100000, help='Talabalar soni')
+@click.option('--arizalar', default=1000000, help='Arizalar soni')
+@click.option('--seed', default=42, help='Tasodifiy sonlar generatori uchun seed')
+def seed_data(fanlar, mentorlar, guruhlar, talabalar, arizalar, seed):
+    """Sinov uchun katta hajmdagi ma'lumotlar yaratish"""
+    rnd = random.Random(seed)
+    sxemani_yangilash()
+    boshlanish = monotonic()
+    # Barcha foydalanuvchilar uchun bitta xesh: 100k marta hisoblash juda sekin
+    parol_xeshi = generate_password_hash('parol123', app.config['PAROL_XESH_USULI'])
+    belgi = (db.session.scalar(db.select(db.func.max(User.id))) or 0) + 1  # takroriy ishga tushirish uchun
+    hozir = datetime.utcnow()
+
+    fan_ids = _ommaviy_qoshish(Fan, ({
+        'nomi': f'{rnd.choice(FAN_NOMLARI)} {i + 1}',
+        'tavsif': 'Sinov uchun yaratilgan fan',
+        'davomiyligi': rnd.choice([36, 48, 72, 96]),
+        'narxi': rnd.choice([300000, 450000, 600000, 800000]),
+    } for i in range(fanlar)), ids=True)
+    print(f'{len(fan_ids)} ta fan')
+
+    def foydalanuvchilar(role, soni):
+        return _ommaviy_qoshish(User, ({
+            'username': f'{role}_{belgi}_{i}',
+            'email': f'{role}_{belgi}_{i}@sinov.uz',
+            'password_hash': parol_xeshi,
+            'role': role,
+            'created_at': hozir,
+        } for i in range(soni)), ids=True)
+
+    mentor_ids = _ommaviy_qoshish(Mentor, ({
+        'user_id': user_id,
+        'ism': rnd.choice(ISMLAR),
+        'familiya': rnd.choice(FAMILIYALAR),
+        'telefon': f'+99890{rnd.randint(1000000, 9999999)}',
+        'mutaxassislik': rnd.choice(MUTAXASSISLIKLAR),
+        'tajriba_yili': rnd.randint(1, 20),
+    } for user_id in foydalanuvchilar('mentor', mentorlar)), ids=True)
+    print(f'{len(mentor_ids)} ta mentor')
+
+    guruh_rows = [{
+        'nomi': f'G-{belgi}-{i + 1}',
+        'fan_id': rnd.choice(fan_ids),
+        'mentor_id': rnd.choice(mentor_ids) if mentor_ids else None,
+        'boshlanish_sana': (hozir - timedelta(days=rnd.randint(0, 180))).date(),
+        'max_talabalar': rnd.choice([12, 15, 20, 25, 30]),
+        'holat': rnd.choices(['faol', 'tugallangan', 'rejalashtirilgan'], [8, 1, 1])[0],
+    } for i in range(guruhlar)]
+    guruh_ids = _ommaviy_qoshish(Guruh, guruh_rows, ids=True)
+    bosh_joy = {guruh_id: row['max_talabalar'] for guruh_id, row in zip(guruh_ids, guruh_rows)}
+    print(f'{len(guruh_ids)} ta guruh')
+
+    # Talabalarning ~60% i bo'sh joyi bor guruhga biriktiriladi
+    talaba_guruhi = []
+    for _ in range(talabalar):
+        guruh_id = None
+        if guruh_ids and rnd.random() < 0.6:
+            for _ in range(3):
+                nomzod = rnd.choice(guruh_ids)
+                if bosh_joy[nomzod] > 0:
+                    bosh_joy[nomzod] -= 1
+                    guruh_id = nomzod
+                    break
+        talaba_guruhi.append(guruh_id)
+    talaba_ids = _ommaviy_qoshish(Talaba, ({
+        'user_id': user_id,
+        'ism': rnd.choice(ISMLAR),
+        'familiya': rnd.choice(FAMILIYALAR),
+        'telefon': f'+99891{rnd.randint(1000000, 9999999)}',
+        'guruh_id': guruh_id,
+    } for user_id, guruh_id in zip(foydalanuvchilar('talaba', talabalar), talaba_guruhi)), ids=True)
+    print(f'{len(talaba_ids)} ta talaba')
+
+    def ariza_qatorlari():
+        # Guruhdagi har bir talaba uchun bitta qabul qilingan ariza, qolganlari tasodifiy
+        qabul_qilinganlar = [(t, g) for t, g in zip(talaba_ids, talaba_guruhi) if g][:arizalar]
+        for talaba_id, guruh_id in qabul_qilinganlar:
+            sana = hozir - timedelta(minutes=rnd.randint(0, 525600))
+            yield {'talaba_id': talaba_id, 'guruh_id': guruh_id, 'holat': 'qabul_qilindi',
+                   'ariza_sana': sana, 'javob_sana': sana + timedelta(days=1),
+                   'izoh': 'Ariza qabul qilindi va talaba guruhga qo\'shildi'}
+        for _ in range(arizalar - len(qabul_qilinganlar)):
+            holat = rnd.choices(['kutilmoqda', 'qabul_qilinmadi'], [3, 1])[0]
+            sana = hozir - timedelta(minutes=rnd.randint(0, 525600))
+            yield {'talaba_id': rnd.choice(talaba_ids), 'guruh_id': rnd.choice(guruh_ids), 'holat': holat,
+                   'ariza_sana': sana,
+                   'javob_sana': sana + timedelta(days=1) if holat == 'qabul_qilinmadi' else None,
+                   'izoh': 'Qabul qilinmadi' if holat == 'qabul_qilinmadi' else None}
+    if talaba_ids and guruh_ids:
+        _ommaviy_qoshish(GuruhAriza, ariza_qatorlari())
+        print(f'{arizalar} ta ariza')
+
+    def jadval_qatorlari():
+        for guruh_id in guruh_ids:
+            boshlanish_vaqti, tugash_vaqti = rnd.choice(DARS_VAQTLARI)
+            xona = f'{rnd.randint(1, 4)}{rnd.randint(1, 20):02d}'
+            for kun in rnd.choice([JUFT_KUNLAR, TOQ_KUNLAR]):
+                yield {'guruh_id': guruh_id, 'kun': kun, 'boshlanish_vaqti': boshlanish_vaqti,
+                       'tugash_vaqti': tugash_vaqti, 'xona': xona, 'holat': 'faol', 'yaratilgan_sana': hozir}
+    _ommaviy_qoshish(DarsJadvali, jadval_qatorlari())
+    print(f'{len(guruh_ids) * 3} ta dars jadvali')
+
+    talabalar_sonini_hisoblash()
+    with db.engine.begin() as conn:
+        print(f'{qidiruv_indeksini_qurish(conn)} ta obyekt qidiruv indeksiga yozildi')
+    print(f'Sinov ma\'lumotlari {monotonic() - boshlanish:.1f} soniyada yaratildi')
+
+def _persentil(qiymatlar, p):
+    tartiblangan = sorted(qiymatlar)
+    indeks = max(0, min(len(tartiblangan) - 1, round(p / 100 * len(tartiblangan) + 0.5) - 1))
+    return tartiblangan[indeks]
+
+# Benchmark holatni o'zgartiruvchi sahifalarni va tugamaydigan oqimlarni chaqirmaydi
+BENCHMARK_OTKAZIB_YUBORISH = ('static', 'logout', 'delete', 'qabul', 'restore', 'tozalash', 'hodisalar')
+
+BENCHMARK_MODELLARI = {
+    'fan': Fan, 'guruh': Guruh, 'talaba': Talaba, 'mentor': Mentor, 'ariza': GuruhAriza, 'jadval': DarsJadvali,
+    'vazifa': Vazifa,
+}
+
+def _benchmark_sahifalari():
+    """(endpoint, rol, url) ro'yxati: url_map dagi har bir GET sahifa namuna id lar bilan"""
+    admin = User.query.filter_by(role='admin').first()
+    mentor = Mentor.query.join(Guruh, Guruh.mentor_id == Mentor.id).first()
+    talaba = Talaba.query.first()
+    foydalanuvchilar = {'admin': admin.id if admin else None,
+                        'mentor': mentor.user_id if mentor else None,
+                        'talaba': talaba.user_id if talaba else None}
+    mentor_guruhi = Guruh.query.filter_by(mentor_id=mentor.id).first() if mentor else None
+
+    sahifalar = []
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or any(soz in rule.endpoint for soz in BENCHMARK_OTKAZIB_YUBORISH):
+            continue
+        rol = next((r for r in ('admin', 'mentor', 'talaba') if rule.rule.startswith(f'/{r}/')), 'admin')
+        values = {}
+        for arg in rule.arguments:
+            if arg == 'token':  # imzolangan .ics havolasi
+                guruh = Guruh.query.first()
+                if guruh is None:
+                    break
+                values[arg] = ics_tokeni('guruh', guruh.id)
+                continue
+            if arg == 'guruh_id' or (rol == 'mentor' and 'guruh' in rule.endpoint):
+                obj = mentor_guruhi if rol == 'mentor' else Guruh.query.first()
+            else:
+                model = next((m for prefix, m in BENCHMARK_MODELLARI.items() if rule.endpoint.startswith(prefix)), None)
+                obj = model.query.first() if model else None
+            if obj is None:
+                break
+            values[arg] = obj.id
+        else:
+            with app.test_request_context():
+                sahifalar.append((rule.endpoint, rol, url_for(rule.endpoint, **values)))
+    return sorted(sahifalar), foydalanuvchilar
+
+@app.cli.command()
+@click.option('--takror', default=20, help='Har bir sahifa necha marta so\'raladi')
+@click.option('--sahifa', 'filtr', default=None, help='Faqat nomida shu matn bo\'lgan endpointlar')
+def benchmark(takror, filtr):
+    """Har bir sahifa uchun p50/p95/p99 kechikish, SQL so'rovlar soni va xotira cho'qqisi"""
+    sahifalar, foydalanuvchilar = _benchmark_sahifalari()
+    sorovlar = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: sorovlar.append(1))
+    clients = {}
+    for rol, user_id in foydalanuvchilar.items():
+        if user_id is None:
+            continue
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['role'] = rol
+        clients[rol] = client
+
+    print(f'{"endpoint":<28} {"holat":>5} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"SQL":>5} {"xotira KiB":>11}')
+    for endpoint, rol, url in sahifalar:
+        if filtr and filtr not in endpoint:
+            continue
+        client = clients.get(rol)
+        if client is None:
+            print(f'{endpoint:<28} {rol} foydalanuvchisi topilmadi')
+            continue
+        client.get(url)  # isitish
+        vaqtlar, sorov_sonlari = [], []
+        for _ in range(takror):
+            sorovlar.clear()
+            boshlanish = perf_counter()
+            response = client.get(url)
+            vaqtlar.append((perf_counter() - boshlanish) * 1000)
+            sorov_sonlari.append(len(sorovlar))
+        tracemalloc.start()
+        client.get(url)
+        _, xotira = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{endpoint:<28} {response.status_code:>5} {_persentil(vaqtlar, 50):>8.1f} '
+              f'{_persentil(vaqtlar, 95):>8.1f} {_persentil(vaqtlar, 99):>8.1f} '
+              f'{max(sorov_sonlari):>5} {xotira / 1024:>11.0f}')
+
+def _yozish_ishchisi(args):
+    """bench_writes uchun alohida jarayon: har bir ariza alohida tranzaksiyada yoziladi"""
+    yozuvlar, talaba_ids, guruh_ids, seed = args
+    rnd = random.Random(seed)
+    xatolar = 0
+    with app.app_context():
+        for _ in range(yozuvlar):
+            try:
+                db.session.add(GuruhAriza(talaba_id=rnd.choice(talaba_ids), guruh_id=rnd.choice(guruh_ids),
+                                          izoh='benchmark'))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                xatolar += 1
+    return xatolar
+
+@app.cli.command()
+@click.option('--jarayonlar', default=4, help='Parallel yozuvchi jarayonlar soni')
+@click.option('--yozuvlar', default=500, help='Har bir jarayon yozadigan arizalar soni')
+def bench_writes(jarayonlar, yozuvlar):
+    """Bir nechta jarayondan bir vaqtda yozish tezligini o'lchash"""
+    talaba_ids = db.session.scalars(db.select(Talaba.id).limit(1000)).all()
+    guruh_ids = db.session.scalars(db.select(Guruh.id).limit(1000)).all()
+    if not talaba_ids or not guruh_ids:
+        print('Avval seed-data buyrug\'ini ishga tushiring')
+        return
+    db.engine.dispose()
+    boshlanish = perf_counter()
+    with multiprocessing.get_context('spawn').Pool(jarayonlar) as pool:
+        xatolar = sum(pool.map(_yozish_ishchisi, [(yozuvlar, talaba_ids, guruh_ids, i) for i in range(jarayonlar)]))
+    davomiylik = perf_counter() - boshlanish
+    jami = jarayonlar * yozuvlar - xatolar
+    print(f'{jami} ta yozuv {davomiylik:.2f} soniyada: {jami / davomiylik:.0f} yozuv/soniya, {xatolar} ta xato')
+    db.session.execute(db.delete(GuruhAriza).where(GuruhAriza.izoh == 'benchmark'))
+    db.session.commit()
+
+@app.cli.command()
+@click.option('--arizalar', default=5000, help='Navbatga qo\'yiladigan arizalar soni')
+@click.option('--joylar', default=500, help='Sinov guruhining sig\'imi')
+@click.option('--bittalab', default=500, help='Bitta-bitta yuboriladigan arizalar soni')
+def bench_navbat(arizalar, joylar, bittalab):
+    """Qabul navbati: ommaviy ishlash, joy bo'shaganda ko'chirish va bitta-bitta arizalar tezligi (rollback)"""
+    fan = Fan.query.first()
+    talaba_ids = db.session.scalars(db.select(Talaba.id).where(Talaba.guruh_id.is_(None))
+                                    .order_by(Talaba.id).limit(arizalar + bittalab)).all()
+    if fan is None or len(talaba_ids) < 2:
+        print('Avval seed-data buyrug\'ini ishga tushiring')
+        return
+    navbat_ids, bitta_ids = talaba_ids[:arizalar], talaba_ids[arizalar:]
+    guruh = Guruh(nomi='bench-navbat', fan_id=fan.id, max_talabalar=joylar, avtomatik_qabul=True)
+    db.session.add(guruh)
+    db.session.flush()
+    hozir = datetime.utcnow()
+    rnd = random.Random(0)
+    db.session.execute(db.insert(GuruhAriza), [
+        {'talaba_id': talaba_id, 'guruh_id': guruh.id, 'holat': 'kutilmoqda', 'ustuvorlik': rnd.choice((0, 0, 0, 1)),
+         'ariza_sana': hozir + timedelta(milliseconds=i)} for i, talaba_id in enumerate(navbat_ids)])
+    try:
+        boshlanish = perf_counter()
+        qabul = navbatni_ishlash([guruh.id])[guruh.id]
+        davomiylik = perf_counter() - boshlanish
+        print(f'Ommaviy: {len(navbat_ids)} ta arizadan {qabul} tasi {davomiylik * 1000:.0f} ms da qabul qilindi '
+              f'({len(navbat_ids) / davomiylik:.0f} ariza/soniya)')
+
+        # Joy bo'shashi: qabul qilingan talabalarni bittadan chiqarib, navbatdan keyingisini olish
+        qabul_qilinganlar = db.session.scalars(db.select(Talaba.id).where(Talaba.guruh_id == guruh.id)
+                                               .limit(min(100, qabul))).all()
+        vaqtlar = []
+        for talaba_id in qabul_qilinganlar:
+            boshlanish = perf_counter()
+            db.session.execute(db.update(Talaba).where(Talaba.id == talaba_id).values(guruh_id=None))
+            joy_bosatish(guruh.id)
+            navbatni_ishlash(db.session.info.pop('navbat_guruhlari'))
+            vaqtlar.append((perf_counter() - boshlanish) * 1000)
+        if vaqtlar:
+            print(f'Joy bo\'shaganda ko\'chirish: p50 {_persentil(vaqtlar, 50):.2f} ms, '
+                  f'p95 {_persentil(vaqtlar, 95):.2f} ms ({len(vaqtlar)} marta)')
+
+        # Bitta-bitta arizalar: har biri flush + navbatni ishlash (commitsiz)
+        guruh.max_talabalar = joylar + len(bitta_ids) // 2
+        db.session.flush()
+        boshlanish = perf_counter()
+        for talaba_id in bitta_ids:
+            db.session.add(GuruhAriza(talaba_id=talaba_id, guruh_id=guruh.id, holat='kutilmoqda'))
+            db.session.flush()
+            navbatni_ishlash(db.session.info.pop('navbat_guruhlari'))
+        if bitta_ids:
+            davomiylik = perf_counter() - boshlanish
+            print(f'Bitta-bitta: {len(bitta_ids)} ta ariza {davomiylik * 1000:.0f} ms da '
+                  f'({len(bitta_ids) / davomiylik:.0f} ariza/soniya)')
+    finally:
+        db.session.rollback()
+
+@app.cli.command()
+@click.option('--arizalar', default=20000, help='Sinov guruhidagi arizalar soni')
+@click.option('--talabalar', default=2000, help='Sinov guruhidagi talabalar soni')
+@click.option('--darslar', default=50, help='Sinov guruhidagi darslar soni')
+def bench_vazifalar(arizalar, talabalar, darslar):
+    """Guruhni o'chirish: bitta tranzaksiyada va fon vazifasida bolaklab (yozish qulfi davomiyligi)"""
+    app.config['VAZIFA_ISHCHILARI'] = 0  # vazifa shu oqimda bajariladi va o'lchanadi
+    fan = Fan.query.first()
+    talaba_ids = db.session.scalars(db.select(Talaba.id).where(Talaba.guruh_id.is_(None))
+                                    .order_by(Talaba.id).limit(talabalar)).all()
+    if fan is None or not talaba_ids:
+        print('Avval seed-data buyrug\'ini ishga tushiring')
+        return
+
+    def sinov_guruhi():
+        guruh = Guruh(nomi='bench-vazifalar', fan_id=fan.id, max_talabalar=len(talaba_ids),
+                      talabalar_soni=len(talaba_ids))
+        db.session.add(guruh)
+        db.session.flush()
+        hozir = datetime.utcnow()
+        db.session.execute(db.insert(GuruhAriza), [
+            {'talaba_id': talaba_ids[i % len(talaba_ids)], 'guruh_id': guruh.id, 'holat': 'qabul_qilinmadi',
+             'ariza_sana': hozir} for i in range(arizalar)])
+        if darslar:
+            db.session.execute(db.insert(DarsJadvali), [
+                {'guruh_id': guruh.id, 'kun': KUNLAR[i % len(KUNLAR)], 'boshlanish_vaqti': time(8 + i % 12),
+                 'tugash_vaqti': time(9 + i % 12), 'xona': f'bench-{i}', 'holat': 'faol'} for i in range(darslar)])
+        _bolaklab_yangilash(Talaba, talaba_ids, guruh_id=guruh.id)
+        guruh_id = guruh.id
+        db.session.commit()
+        return guruh_id
+
+    # Avvalgi usul: hammasi so'rov oqimida, bitta yozish tranzaksiyasida
+    guruh_id = sinov_guruhi()
+    boshlanish = perf_counter()
+    DarsJadvali.query.filter_by(guruh_id=guruh_id).delete(synchronize_session=False)
+    GuruhAriza.query.filter_by(guruh_id=guruh_id).delete(synchronize_session=False)
+    Talaba.query.filter_by(guruh_id=guruh_id).update({'guruh_id': None}, synchronize_session=False)
+    db.session.delete(db.session.get(Guruh, guruh_id))
+    db.session.commit()
+    print(f'Bitta tranzaksiyada: {(perf_counter() - boshlanish) * 1000:.0f} ms '
+          f'(so\'rov va yozish qulfi shuncha davom etadi)')
+
+    guruh_id = sinov_guruhi()
+    boshlanish = perf_counter()
+    vazifa_id = vazifa_qoshish('guruh_ochirish', kalit=f'guruh_ochirish:{guruh_id}', guruh_id=guruh_id).id
+    db.session.commit()
+    navbatga = perf_counter() - boshlanish
+    boshlanish = perf_counter()
+    bizning = None
+    while db.session.get(Vazifa, vazifa_id, populate_existing=True).holat in VAZIFA_FAOL_HOLATLAR:
+        jarayon = vazifani_bajarish('bench-vazifalar')
+        if jarayon is None:
+            sleep(0.1)  # qayta urinish kechikishi
+        elif jarayon.vazifa_id == vazifa_id:
+            bizning = jarayon
+    davomiylik = perf_counter() - boshlanish
+    vazifa = db.session.get(Vazifa, vazifa_id)
+    print(f'Fon vazifasi: so\'rov {navbatga * 1000:.1f} ms, bajarilishi {davomiylik * 1000:.0f} ms, '
+          f'holat: {vazifa.holat}, {vazifa.jarayon} qator')
+    if bizning is not None:
+        print(f'  {bizning.bolaklar} ta bolak (VAZIFA_BOLAK={app.config["VAZIFA_BOLAK"]}), '
+              f'eng uzun yozish tranzaksiyasi {bizning.eng_uzun_bolak * 1000:.1f} ms')
+
+class _WebhookQabulQiluvchi(BaseHTTPRequestHandler):
+    """bench-xabarlar uchun lokal webhook: kelgan xabarlarni sanaydi"""
+    soni = 0
+
+    def do_POST(self):
+        tana = self.rfile.read(int(self.headers['Content-Length']))
+        type(self).soni += len(json.loads(tana))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+async def _smtp_qabul_qiluvchi(reader, writer, hisob):
+    """bench-xabarlar uchun lokal SMTP (MailHog o'rnida): xatlarni qabul qilib hisob.value ga sanaydi"""
+    writer.write(b'220 localhost\r\n')
+    xat_ichida = False
+    while line := await reader.readline():
+        if xat_ichida:
+            if line == b'.\r\n':
+                xat_ichida = False
+                hisob.value += 1
+                writer.write(b'250 OK\r\n')
+        elif line[:4].upper() == b'DATA':
+            xat_ichida = True
+            writer.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+        elif line[:4].upper() == b'QUIT':
+            writer.write(b'221 Bye\r\n')
+            break
+        else:
+            writer.write(b'250 OK\r\n')
+        await writer.drain()
+    writer.close()
+
+def _smtp_sinov_serveri(port_navbati, hisob):
+    # Alohida jarayonda: SMTP server dispetcher bilan bitta GIL ni talashmaydi
+    async def ishlash():
+        server = await asyncio.start_server(partial(_smtp_qabul_qiluvchi, hisob=hisob), '127.0.0.1', 0)
+        port_navbati.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+    asyncio.run(ishlash())
+
+@app.cli.command()
+@click.option('--talabalar', default=2000, help='Dars bekor qilinadigan guruhdagi talabalar soni')
+def bench_xabarlar(talabalar):
+    """Dars bekor qilinganda guruhga xabar: outbox yozish vaqti va ichki/email/webhook yetkazish tezligi"""
+    fan = Fan.query.first()
+    talaba_ids = db.session.scalars(db.select(Talaba.id).where(Talaba.guruh_id.is_(None))
+                                    .order_by(Talaba.id).limit(talabalar)).all()
+    if fan is None or not talaba_ids:
+        print('Avval seed-data buyrug\'ini ishga tushiring')
+        return
+    guruh = Guruh(nomi='bench-xabarlar', fan_id=fan.id, max_talabalar=len(talaba_ids),
+                  talabalar_soni=len(talaba_ids))
+    db.session.add(guruh)
+    db.session.flush()
+    jadval = DarsJadvali(guruh_id=guruh.id, kun='Shanba', boshlanish_vaqti=time(8), tugash_vaqti=time(9))
+    db.session.add(jadval)
+    _bolaklab_yangilash(Talaba, talaba_ids, guruh_id=guruh.id)
+    db.session.commit()
+    guruh_id, jadval_id = guruh.id, jadval.id
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _WebhookQabulQiluvchi)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port_navbati, xatlar = multiprocessing.Queue(), multiprocessing.Value('i', 0)
+    smtp = multiprocessing.Process(target=_smtp_sinov_serveri, args=(port_navbati, xatlar), daemon=True)
+    smtp.start()
+    app.config.update(XABAR_KANALLARI=['ichki', 'email', 'webhook'], XABAR_DISPETCHER=False,
+                      XABAR_WEBHOOK_URL=f'http://127.0.0.1:{httpd.server_address[1]}/',
+                      XABAR_SMTP=f'127.0.0.1:{port_navbati.get(timeout=10)}')
+    oxirgi_id = db.session.scalar(db.select(db.func.max(ChiquvchiXabar.id))) or 0
+    try:
+        # So'rov ichidagi qism: jadval_delete bilan bir xil
+        boshlanish = perf_counter()
+        jadval = db.session.get(DarsJadvali, jadval_id)
+        jadval.holat = 'bekor_qilindi'
+        soni = jadval_xabari(jadval, 'dars_bekor')
+        db.session.commit()
+        print(f'Outbox: {soni} ta qator (3 kanal) so\'rov tranzaksiyasida {(perf_counter() - boshlanish) * 1000:.1f} ms')
+
+        async def yetkazish():
+            semaforlar = {}
+            boshlanish = perf_counter()
+            partiyalar = 0
+            while await xabarlar_partiyasini_yuborish(f'bench-xabarlar:{partiyalar}', semaforlar):
+                partiyalar += 1
+            return perf_counter() - boshlanish, partiyalar
+
+        davomiylik, partiyalar = asyncio.run(yetkazish())
+        holatlar = db.session.execute(
+            db.select(ChiquvchiXabar.kanal, ChiquvchiXabar.holat, db.func.count(ChiquvchiXabar.id))
+            .where(ChiquvchiXabar.id > oxirgi_id).group_by(ChiquvchiXabar.kanal, ChiquvchiXabar.holat)).all()
+        print(f'Yetkazish: {partiyalar} ta partiya, {davomiylik:.2f} soniya ({soni / davomiylik:.0f} xabar/soniya)')
+        print('  ' + ', '.join(f'{kanal}/{holat}: {n}' for kanal, holat, n in holatlar))
+        print(f'  SMTP qabul qildi: {xatlar.value}, webhook qabul qildi: {_WebhookQabulQiluvchi.soni}')
+    finally:
+        httpd.shutdown()
+        smtp.terminate()
+        db.session.rollback()
+        ChiquvchiXabar.query.filter(ChiquvchiXabar.id > oxirgi_id).delete(synchronize_session=False)
+        Xabarnoma.query.filter(Xabarnoma.matn.like('bench-xabarlar:%')).delete(synchronize_session=False)
+        _bolaklab_yangilash(Talaba, talaba_ids, guruh_id=None)
+        db.session.delete(db.session.get(Guruh, guruh_id))
+        db.session.commit()
+
+@app.cli.command()
+@click.option('--parallel', default='1,2,4,8,16', help='Vergul bilan ajratilgan parallel mijozlar soni')
+@click.option('--sorovlar', default=32, help='Har bir parallellik darajasidagi login so\'rovlari soni')
+def bench_login(parallel, sorovlar):
+    """Turli parallellikda login/soniya, kechikish va 503 (navbat to'la) javoblari soni"""
+    username = 'bench_login'
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        user = User(username=username, email='bench_login@sinov.uz', role='talaba')
+        db.session.add(user)
+    user.set_password('parol123')
+    db.session.commit()
+    print(f'Usul: {app.config["PAROL_XESH_USULI"]}, ishchilar: {app.config["PAROL_XESH_ISHCHILARI"]}, '
+          f'navbat: {app.config["PAROL_XESH_NAVBATI"]}')
+    print(f'{"parallel":>8} {"login/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"503":>5}')
+    for n in [int(x) for x in parallel.split(',')]:
+        vaqtlar, holatlar = [], Counter()
+
+        def mijoz(soni):
+            client = app.test_client()
+            for _ in range(soni):
+                boshlanish = perf_counter()
+                response = client.post('/login', data={'username': username, 'password': 'parol123'})
+                vaqtlar.append((perf_counter() - boshlanish) * 1000)
+                holatlar[response.status_code] += 1
+
+        oqimlar = [threading.Thread(target=mijoz, args=(max(1, sorovlar // n),)) for _ in range(n)]
+        boshlanish = perf_counter()
+        for oqim in oqimlar:
+            oqim.start()
+        for oqim in oqimlar:
+            oqim.join()
+        davomiylik = perf_counter() - boshlanish
+        print(f'{n:>8} {len(vaqtlar) / davomiylik:>9.1f} {_persentil(vaqtlar, 50):>8.1f} '
+              f'{_persentil(vaqtlar, 95):>8.1f} {holatlar[503]:>5}')
+    db.session.delete(user)
+    db.session.commit()
+
+# API manbasi -> xuddi shu ro'yxatni ko'rsatuvchi HTML sahifa
+API_HTML_SAHIFALARI = {
+    'talabalar': '/admin/talabalar', 'mentorlar': '/admin/mentorlar', 'fanlar': '/admin/fanlar',
+    'guruhlar': '/admin/guruhlar', 'arizalar': '/admin/arizalar',
+}
+
+@app.cli.command()
+@click.option('--takror', default=20, help='Har bir URL necha marta so\'raladi')
+@click.option('--limit', default=SAHIFA_HAJMI, help='API sahifa hajmi')
+def bench_api(takror, limit):
+    """JSON API va HTML ro'yxat sahifalari: p50/p95 kechikish, SQL soni, javob hajmi va 304 vaqti"""
+    admin = User.query.filter_by(role='admin').first()
+    if admin is None:
+        print('Admin foydalanuvchisi topilmadi')
+        return
+    sorovlar = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: sorovlar.append(1))
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin.id
+        sess['role'] = 'admin'
+    print(f'JSON: {"orjson" if orjson is not None else "json"}')
+    print(f'{"url":<36} {"p50 ms":>8} {"p95 ms":>8} {"SQL":>5} {"KiB":>7} {"304 ms":>8}')
+    for nomi, sahifa in API_HTML_SAHIFALARI.items():
+        for url in (f'/api/{API_VERSIYASI}/{nomi}?limit={limit}', sahifa):
+            response = client.get(url)  # isitish
+            vaqtlar, sorov_sonlari = [], []
+            for _ in range(takror):
+                sorovlar.clear()
+                boshlanish = perf_counter()
+                response = client.get(url)
+                vaqtlar.append((perf_counter() - boshlanish) * 1000)
+                sorov_sonlari.append(len(sorovlar))
+            qayta = ''
+            if response.headers.get('ETag'):
+                boshlanish = perf_counter()
+                client.get(url, headers={'If-None-Match': response.headers['ETag']})
+                qayta = f'{(perf_counter() - boshlanish) * 1000:.1f}'
+            print(f'{url:<36} {_persentil(vaqtlar, 50):>8.1f} {_persentil(vaqtlar, 95):>8.1f} '
+                  f'{max(sorov_sonlari):>5} {len(response.data) / 1024:>7.1f} {qayta:>8}')
+
+def _rss_choqqisi_mib():
+    """Jarayonning eng yuqori RSS i (MiB) yoki Windowsda None"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linuxda KiB
+
+@app.cli.command()
+@click.option('--royxat', type=click.Choice(list(EKSPORTLAR)), default='arizalar', help='Eksport qilinadigan ro\'yxat')
+@click.option('--format', 'fmt', type=click.Choice(list(EKSPORT_FORMATLARI)), default='csv', help='Fayl formati')
+def bench_export(royxat, fmt):
+    """Eksport tezligi (qator/soniya), birinchi baytgacha vaqt va RSS cho'qqisi"""
+    admin = User.query.filter_by(role='admin').first()
+    if admin is None:
+        print('Admin foydalanuvchisi topilmadi')
+        return
+    qatorlar_soni = db.session.scalar(db.select(db.func.count()).select_from(EKSPORTLAR[royxat][2]))
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin.id
+        sess['role'] = 'admin'
+    rss_oldin = _rss_choqqisi_mib()
+    boshlanish = perf_counter()
+    response = client.get(f'/admin/eksport/{royxat}.{fmt}', buffered=False)
+    birinchi_bayt, hajm = None, 0
+    for bolak in response.response:
+        if birinchi_bayt is None:
+            birinchi_bayt = perf_counter() - boshlanish
+        hajm += len(bolak)
+    response.close()
+    davomiylik = perf_counter() - boshlanish
+    print(f'{qatorlar_soni} ta qator, {hajm / 1024 / 1024:.1f} MiB, {davomiylik:.2f} soniya: '
+          f'{qatorlar_soni / davomiylik:.0f} qator/soniya')
+    print(f'Birinchi baytgacha: {(birinchi_bayt or 0) * 1000:.1f} ms')
+    if rss_oldin is not None:
+        print(f'RSS cho\'qqisi: {_rss_choqqisi_mib():.0f} MiB (eksportdan oldin {rss_oldin:.0f} MiB)')
+
+class _JimSorovIshlovchisi(WSGIRequestHandler):
+    """bench-sse serveri: har bir ulanish logga yozilmaydi"""
+
+    def log_request(self, *args):
+        pass
+
+async def _sse_mijozi(port, cookie, ulanganlar, kelganlar):
+    """bench-sse uchun: /admin/hodisalar ga ulanib yangi arizalar kelgan vaqtini yozadi; status kodi"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        # HTTP/1.0: dev server oqimni chunked qilmaydi, hodisalar to'g'ridan-to'g'ri o'qiladi
+        writer.write(f'GET /admin/hodisalar HTTP/1.0\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n'
+                     'Accept: text/event-stream\r\n\r\n'.encode())
+        status = int((await reader.readuntil(b'\r\n\r\n')).split(b' ', 2)[1])
+        if status != 200:
+            return status
+        await reader.readuntil(b'\n\n')  # retry va joriy holat
+        ulanganlar.append(perf_counter())
+        while True:
+            blok = await reader.readuntil(b'\n\n')
+            vaqt = perf_counter()
+            for qator in blok.split(b'\n'):
+                if qator.startswith(b'data: '):
+                    for ariza_id in json.loads(qator[6:])['yangi']:
+                        kelganlar.setdefault(ariza_id, []).append(vaqt)
+    finally:
+        writer.close()
+
+@app.cli.command()
+@click.option('--mijozlar', default='10,100,500', help='Bir vaqtda ulangan admin brauzerlar soni (vergul bilan)')
+@click.option('--hodisalar', default=20, help='Har bir darajada yaratiladigan yangi arizalar soni')
+def bench_sse(mijozlar, hodisalar):
+    """Bitta ishchi jarayonga ulangan SSE mijozlari: hodisa yetib kelish kechikishi va tarqatish SQL soni"""
+    admin = User.query.filter_by(role='admin').first()
+    talaba = Talaba.query.first()
+    guruh = Guruh.query.filter_by(avtomatik_qabul=False).first()
+    if admin is None or talaba is None or guruh is None:
+        print('Avval seed-data buyrug\'ini ishga tushiring')
+        return
+    talaba_id, guruh_id = talaba.id, guruh.id
+    darajalar = [int(x) for x in mijozlar.split(',')]
+    # Uzilgan ulanishlar keyingi darajadan oldin tez bo'shashi uchun ping tezroq
+    app.config.update(SSE_MAKS_ULANISHLAR=max(darajalar), SSE_PING=1)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin.id
+        sess['role'] = 'admin'
+    cookie_nomi = app.config['SESSION_COOKIE_NAME']
+    cookie = f'{cookie_nomi}={client.get_cookie(cookie_nomi).value}'
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_JimSorovIshlovchisi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sorovlar = Counter()
+
+    def sanash(*args):
+        sorovlar[threading.current_thread().name] += 1
+
+    def ariza_qoshish():
+        with app.app_context():
+            ariza = GuruhAriza(talaba_id=talaba_id, guruh_id=guruh_id, izoh='bench-sse')
+            db.session.add(ariza)
+            db.session.flush()
+            boshlanish = perf_counter()
+            db.session.commit()
+            return ariza.id, boshlanish
+
+    async def olchash(n):
+        ulanganlar, kelganlar = [], {}
+        boshlanish = perf_counter()
+        mijozlar = [asyncio.create_task(_sse_mijozi(server.port, cookie, ulanganlar, kelganlar)) for _ in range(n)]
+        while len(ulanganlar) + sum(m.done() for m in mijozlar) < n:
+            await asyncio.sleep(0.01)
+        ulanish = perf_counter() - boshlanish
+        rad = sum(m.done() and not m.cancelled() and m.exception() is None and m.result() != 200 for m in mijozlar)
+        kechikishlar, toliq = [], []
+        sorovlar.clear()
+        for _ in range(hodisalar):
+            ariza_id, boshlanish = await asyncio.to_thread(ariza_qoshish)
+            muddat = perf_counter() + 10
+            while len(kelganlar.get(ariza_id, ())) < len(ulanganlar) and perf_counter() < muddat:
+                await asyncio.sleep(0.001)
+            vaqtlar = [(vaqt - boshlanish) * 1000 for vaqt in kelganlar.get(ariza_id, ())]
+            kechikishlar.extend(vaqtlar)
+            toliq.append(max(vaqtlar, default=10000))
+        for mijoz in mijozlar:
+            mijoz.cancel()
+        await asyncio.gather(*mijozlar, return_exceptions=True)
+        return len(ulanganlar), rad, ulanish, kechikishlar, toliq
+
+    event.listen(db.engine, 'before_cursor_execute', sanash)
+    print(f'{"mijozlar":>8} {"ulangan":>8} {"503":>5} {"ulanish s":>10} {"p50 ms":>8} {"p95 ms":>8} '
+          f'{"hammaga ms":>11} {"SQL/hodisa":>11} {"oqimlar":>8}')
+    try:
+        for n in darajalar:
+            ulangan, rad, ulanish, kechikishlar, toliq = asyncio.run(olchash(n))
+            oqimlar = threading.active_count()
+            print(f'{n:>8} {ulangan:>8} {rad:>5} {ulanish:>10.2f} {_persentil(kechikishlar, 50):>8.1f} '
+                  f'{_persentil(kechikishlar, 95):>8.1f} {_persentil(toliq, 95):>11.1f} '
+                  f'{sorovlar["hodisa-shinasi"] / hodisalar:>11.1f} {oqimlar:>8}')
+            muddat = perf_counter() + 10
+            while hodisa_shinasi.obunachilar and perf_counter() < muddat:
+                sleep(0.1)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', sanash)
+        server.shutdown()
+        GuruhAriza.query.filter_by(izoh='bench-sse').delete(synchronize_session=False)
+        db.session.commit()
+
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        sxemani_yangilash()
         
         # Eski admin foydalanuvchisini o'chirish (agar mavjud bo'lsa)
         old_admin = User.query.filter_by(username='admin').first()
@@ -0,0 +1,130 @@
+import os
+from itertools import count
+
+# Sozlamalar app import qilinishidan oldin o'qiladi: xotiradagi baza, fon oqimlarisiz
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['VAZIFA_ISHCHILARI'] = '0'
+os.environ['XABAR_DISPETCHER'] = '0'
+os.environ['PAROL_XESH_USULI'] = 'pbkdf2:sha256:1000'
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+import app as ilova
+from app import app as flask_app, db
+
+
+def keshlarni_tozalash():
+    """Jarayon ichidagi keshlar: har bir test yangi bazada, id lar qaytadan boshlanadi"""
+    ilova.statistika_keshi().delete(ilova.STATISTIKA_KALITI)
+    ilova.profil_keshi.tozalash()
+    ilova.fragment_keshi.tozalash()
+    ilova.haftalik_jadvallar.tozalash()
+    ilova.jadval_indeksi.eskirgan_deb_belgilash()
+    ilova._qidiruv_jadvallari.clear()
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        ilova.sxemani_yangilash()
+        yield flask_app
+        db.session.remove()
+        db.engine.dispose()  # xotiradagi baza ulanish yopilganda yo'qoladi
+    keshlarni_tozalash()
+
+
+@pytest.fixture
+def fayl_app(tmp_path):
+    """Fayldagi SQLite bazasiga ulangan ilova: oqimlar alohida ulanishlarda parallel yozadi.
+
+    Modellar va hodisalar umumiy `db` da, shuning uchun ikkinchi Flask ilovasi
+    faqat boshqa engine beradi; har bir oqim o'z app_context ini ochadi.
+    """
+    url = f'sqlite:///{tmp_path / "sinov.db"}'
+    ilova_fayl = Flask(__name__)
+    ilova_fayl.config.update(flask_app.config, TESTING=True, SQLALCHEMY_DATABASE_URI=url,
+                             SQLALCHEMY_ENGINE_OPTIONS=ilova.engine_sozlamalari(url))
+    db.init_app(ilova_fayl)
+    with ilova_fayl.app_context():
+        ilova.sxemani_yangilash()
+    yield ilova_fayl
+    with ilova_fayl.app_context():
+        db.engine.dispose()
+    keshlarni_tozalash()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def kirish(client):
+    """kirish(user_id, role) - test client sessiyasiga foydalanuvchini yozish"""
+    def _kirish(user_id, role):
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['role'] = role
+        return client
+    return _kirish
+
+
+@pytest.fixture
+def sql_sorovlar(app):
+    """Bajarilgan SQL so'rovlar ro'yxati (before_cursor_execute)"""
+    sorovlar = []
+
+    def _yozish(conn, cursor, statement, parameters, context, executemany):
+        sorovlar.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _yozish)
+    yield sorovlar
+    event.remove(db.engine, 'before_cursor_execute', _yozish)
+
+
+class Malumotlar:
+    """Sinov obyektlari: har biri sessiyaga qo'shiladi, commit chaqiruvchida"""
+
+    def __init__(self):
+        self._raqam = count(1)
+
+    def foydalanuvchi(self, role):
+        n = next(self._raqam)
+        user = ilova.User(username=f'{role}{n}', email=f'{role}{n}@sinov.uz', password_hash='-', role=role)
+        db.session.add(user)
+        return user
+
+    def fan(self, **values):
+        fan = ilova.Fan(nomi=f'Fan {next(self._raqam)}', **values)
+        db.session.add(fan)
+        return fan
+
+    def mentor(self, **values):
+        mentor = ilova.Mentor(user=self.foydalanuvchi('mentor'), ism='Mentor', familiya=f'M{next(self._raqam)}',
+                              **values)
+        db.session.add(mentor)
+        return mentor
+
+    def guruh(self, fan, mentor=None, **values):
+        guruh = ilova.Guruh(nomi=f'G-{next(self._raqam)}', fan=fan, mentor=mentor, **values)
+        db.session.add(guruh)
+        return guruh
+
+    def talaba(self, guruh=None, **values):
+        talaba = ilova.Talaba(user=self.foydalanuvchi('talaba'), ism='Talaba', familiya=f'T{next(self._raqam)}',
+                              guruh=guruh, **values)
+        db.session.add(talaba)
+        return talaba
+
+    def ariza(self, talaba, guruh, **values):
+        ariza = ilova.GuruhAriza(talaba=talaba, guruh=guruh, **values)
+        db.session.add(ariza)
+        return ariza
+
+
+@pytest.fixture
+def malumot():
+    return Malumotlar()
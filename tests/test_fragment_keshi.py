@@ -0,0 +1,19 @@
+"""Fragment keshi so'rov va ilova kontekstidan tashqarida (CLI benchmark, ishchi) ham ishlaydi"""
+import pytest
+
+import app as ilova
+from app import app as flask_app
+
+
+@pytest.fixture
+def qayta_yuklash(monkeypatch):
+    monkeypatch.setattr(flask_app.jinja_env, 'auto_reload', True)
+    yield
+    ilova.fragment_keshi.tozalash()
+
+
+def test_fragment_kontekstsiz(qayta_yuklash):
+    shablon = flask_app.jinja_env.from_string("{% call fragment('sinov', 1) %}{{ 2 + 2 }}{% endcall %}")
+    assert shablon.render() == '4'
+    assert shablon.render() == '4'
+    assert ilova.fragment_keshi.hisob['sinov']['hit'] == 1
@@ -0,0 +1,82 @@
+"""Bir guruhga parallel qabul qilish: talabalar_soni max_talabalar dan oshmaydi va Talaba jadvaliga mos"""
+import random
+import threading
+
+import app as ilova
+from app import db
+
+OQIMLAR = 8
+MAX_TALABALAR = 5
+
+
+def guruhlar_holati():
+    haqiqiy = ilova.guruh_talabalar_soni()
+    return [(guruh.id, guruh.talabalar_soni, guruh.max_talabalar, haqiqiy.get(guruh.id, 0))
+            for guruh in ilova.Guruh.query.order_by(ilova.Guruh.id)]
+
+
+def parallel_ishlatish(fayl_app, vazifalar):
+    """Har bir vazifa o'z oqimida, o'z app_context/sessiyasida; barchasi bir vaqtda boshlanadi"""
+    tayyor = threading.Barrier(len(vazifalar))
+    xatolar = []
+
+    def ishlash(vazifa):
+        with fayl_app.app_context():
+            tayyor.wait()
+            try:
+                vazifa()
+            except Exception as xato:  # assert oqimda emas, asosiy testda tekshiriladi
+                xatolar.append(xato)
+                db.session.rollback()
+
+    oqimlar = [threading.Thread(target=ishlash, args=(vazifa,)) for vazifa in vazifalar]
+    for oqim in oqimlar:
+        oqim.start()
+    for oqim in oqimlar:
+        oqim.join()
+    assert not xatolar, xatolar
+
+
+def test_parallel_qabul_guruhni_toldirib_yubormaydi(fayl_app, malumot):
+    rnd = random.Random(1)
+    with fayl_app.app_context():
+        fan = malumot.fan()
+        guruh = malumot.guruh(fan, max_talabalar=MAX_TALABALAR)
+        talabalar = [malumot.talaba() for _ in range(OQIMLAR * 3)]
+        # Ikkinchi guruhda hammaga joy bor: talabalar birinchi guruhdan ko'chib, joy bo'shatadi
+        boshqa = malumot.guruh(fan, max_talabalar=len(talabalar))
+        # Har bir talaba ikkala guruhga ariza bergan: bir talabani ikki guruhga bir vaqtda qabul qilish poygasi
+        arizalar = [(malumot.ariza(talaba, guruh), malumot.ariza(talaba, boshqa)) for talaba in talabalar]
+        db.session.commit()
+        guruh_id = guruh.id
+        juftlar = [(a.id, b.id) for a, b in arizalar]
+
+    def yakka_qabul(ariza_ids):
+        def vazifa():
+            for ariza_id in ariza_ids:
+                ilova.ariza_qabul_qilish(db.session.get(ilova.GuruhAriza, ariza_id))
+                db.session.commit()
+        return vazifa
+
+    def ommaviy_qabul(**kwargs):
+        def vazifa():
+            ilova.arizalarni_ommaviy_korib_chiqish('qabul', **kwargs)
+            db.session.commit()
+        return vazifa
+
+    vazifalar = []
+    for i in range(OQIMLAR):
+        qism = juftlar[i::OQIMLAR]
+        ids = [rnd.choice(juft) for juft in qism] + [juft[i % 2] for juft in qism]
+        vazifalar.append(yakka_qabul(ids))
+    vazifalar.append(ommaviy_qabul(guruh_id=guruh_id))
+    vazifalar.append(ommaviy_qabul(ariza_ids=[b for _, b in juftlar]))
+    vazifalar.append(ommaviy_qabul(ariza_ids=[rnd.choice(juft) for juft in juftlar]))
+    parallel_ishlatish(fayl_app, vazifalar)
+
+    with fayl_app.app_context():
+        holat = guruhlar_holati()
+        assert sum(soni for _, soni, _, _ in holat) > 0
+        for guruh_id, soni, max_talabalar, haqiqiy in holat:
+            assert soni <= max_talabalar, (guruh_id, soni, max_talabalar)
+            assert soni == haqiqiy, (guruh_id, soni, haqiqiy)
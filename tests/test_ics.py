@@ -0,0 +1,42 @@
+"""Jadval .ics havolalari: yangilangandan keyin avval berilgan havolalar ishlamaydi"""
+import pytest
+
+import app as ilova
+from app import db
+
+
+@pytest.fixture
+def guruh_id(app, malumot):
+    guruh = malumot.guruh(malumot.fan())
+    db.session.commit()
+    return guruh.id
+
+
+def test_yangilash_eski_havolani_bekor_qiladi(client, kirish, malumot, guruh_id):
+    eski = ilova.ics_tokeni('guruh', guruh_id)
+    assert client.get(f'/jadval/{eski}.ics').status_code == 200
+
+    admin = malumot.foydalanuvchi('admin')
+    db.session.commit()
+    javob = kirish(admin.id, 'admin').post('/admin/jadval/ics-yangilash', data={'tur': 'guruh', 'kalit': guruh_id})
+    assert javob.status_code == 302
+
+    yangi = ilova.ics_tokeni('guruh', guruh_id)
+    assert yangi != eski
+    assert client.get(f'/jadval/{eski}.ics').status_code == 404
+    assert client.get(f'/jadval/{yangi}.ics').status_code == 200
+
+
+def test_versiyasiz_havola_birinchi_yangilashgacha_ishlaydi(client, guruh_id):
+    eski = ilova._ics_serializer().dumps(['guruh', guruh_id])
+    assert client.get(f'/jadval/{eski}.ics').status_code == 200
+    ilova.ics_havolasini_yangilash('guruh', guruh_id)
+    db.session.commit()
+    assert client.get(f'/jadval/{eski}.ics').status_code == 404
+
+
+def test_xona_havolasini_faqat_admin_yangilaydi(kirish, malumot, app):
+    mentor = malumot.mentor()
+    db.session.commit()
+    kirish(mentor.user_id, 'mentor').post('/admin/jadval/ics-yangilash', data={'tur': 'xona', 'kalit': '101'})
+    assert ilova.ics_versiyasi('xona', '101') == 0
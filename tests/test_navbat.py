@@ -0,0 +1,30 @@
+"""To'lgan avtomatik qabul guruhi: yakka va ommaviy qabul bir xil qoida bilan arizani navbatda qoldiradi"""
+import pytest
+
+import app as ilova
+from app import db
+
+
+@pytest.fixture
+def toliq_guruh_arizasi(app, malumot):
+    guruh = malumot.guruh(malumot.fan(), max_talabalar=1, talabalar_soni=1, avtomatik_qabul=True)
+    malumot.talaba(guruh)
+    ariza = malumot.ariza(malumot.talaba(), guruh)
+    db.session.commit()
+    return ariza
+
+
+def test_yakka_qabul_navbatda_qoldiradi(toliq_guruh_arizasi):
+    ariza = toliq_guruh_arizasi
+    assert ilova.ariza_qabul_qilish(ariza) == 'navbatda'
+    db.session.commit()
+    db.session.refresh(ariza)
+    assert (ariza.holat, ariza.javob_sana, ariza.talaba.guruh_id) == ('kutilmoqda', None, None)
+
+
+def test_ommaviy_qabul_navbatda_qoldiradi(toliq_guruh_arizasi):
+    ariza = toliq_guruh_arizasi
+    assert ilova.arizalarni_ommaviy_korib_chiqish('qabul', ariza_ids=[ariza.id]) == [(ariza.id, 'navbatda')]
+    db.session.commit()
+    db.session.refresh(ariza)
+    assert (ariza.holat, ariza.javob_sana, ariza.talaba.guruh_id) == ('kutilmoqda', None, None)
@@ -0,0 +1,59 @@
+"""Ro'yxat sahifalari qatorlar sonidan qat'i nazar bir xil sonli SQL so'rov yuboradi (N+1 yo'q)"""
+import pytest
+
+import app as ilova
+from app import db
+
+SAHIFALAR = [
+    ('admin', '/admin/guruhlar'),
+    ('admin', '/admin/talabalar'),
+    ('admin', '/admin/mentorlar'),
+    ('admin', '/admin/arizalar'),
+    ('mentor', '/mentor/dashboard'),
+]
+
+
+def qatorlar_qoshish(malumot, mentor_id, soni):
+    """Har bir qator: yangi fan, guruh (yarmi asosiy mentorda, qolgani yangi mentorda), talaba va arizalar"""
+    for i in range(soni):
+        if i % 2 == 0:
+            guruh = malumot.guruh(malumot.fan(), mentor_id=mentor_id)
+        else:
+            guruh = malumot.guruh(malumot.fan(), malumot.mentor())
+        talaba = malumot.talaba(guruh)
+        malumot.ariza(talaba, guruh, holat='qabul_qilindi')
+        malumot.ariza(malumot.talaba(), guruh)
+    db.session.commit()
+    ilova.talabalar_sonini_hisoblash()
+
+
+def sorovlar_soni(client, url, sql_sorovlar):
+    db.session.remove()  # sahifa obyektlarni identity map dan emas, bazadan o'qisin
+    client.get(url)  # isitish: profil va statistika keshlari
+    db.session.remove()
+    ilova.fragment_keshi.tozalash()  # keshlangan qatorlar munosabatlardagi so'rovlarni yashirmasin
+    sql_sorovlar.clear()
+    javob = client.get(url)
+    assert javob.status_code == 200, url
+    return len(sql_sorovlar)
+
+
+@pytest.fixture
+def foydalanuvchilar(malumot):
+    admin = malumot.foydalanuvchi('admin')
+    mentor = malumot.mentor()
+    db.session.commit()
+    return {'admin': (admin.id, 'admin'), 'mentor': (mentor.user_id, 'mentor')}, mentor.id
+
+
+@pytest.mark.parametrize('rol,url', SAHIFALAR)
+def test_sql_soni_qatorlar_soniga_bogliq_emas(client, kirish, malumot, sql_sorovlar, foydalanuvchilar, rol, url):
+    users, mentor_id = foydalanuvchilar
+    kirish(*users[rol])
+
+    qatorlar_qoshish(malumot, mentor_id, 2)
+    kam = sorovlar_soni(client, url, sql_sorovlar)
+    qatorlar_qoshish(malumot, mentor_id, 20)
+    kop = sorovlar_soni(client, url, sql_sorovlar)
+
+    assert kam == kop, f'{url}: 2 qatorda {kam} ta, 22 qatorda {kop} ta SQL'